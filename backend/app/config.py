@@ -14,13 +14,94 @@ class Settings(BaseSettings):
     )
 
     # ── LLM Provider ──────────────────────────────────────────────
-    LLM_PROVIDER: str = "ollama"
+    LLM_PROVIDER: str = "ollama"  # ollama | ollama_cloud | openrouter | openai | fake
     OPENROUTER_API_KEY: str = ""
     OPENROUTER_MODEL: str = "gpt-oss:120b-cloud"
     OPENAI_API_KEY: str = ""
     OLLAMA_API_KEY: str = ""
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "mistral"
+    OLLAMA_CLOUD_BASE_URL: str = "https://ollama.com"  # "ollama_cloud" provider (uses OLLAMA_API_KEY)
+    OLLAMA_CLOUD_MODEL: str = "gpt-oss:120b"
+    LLM_MAX_CONTINUATIONS: int = 2  # follow-up requests for a response cut off at max_tokens
+    LLM_STREAM_USAGE: bool = True  # ask for token usage on streams; disable for servers without stream_options
+    LLM_MAX_TOKENS: int = 8192  # ceiling for any single response
+
+    # ── Fake LLM provider (LLM_PROVIDER=fake; load tests and CI) ──
+    FAKE_LLM_MODEL: str = "fake-studyai"
+    FAKE_LLM_SEED: int = 0  # same seed + same prompt = same answer
+    FAKE_LLM_TTFT_SECONDS: float = 0.3
+    FAKE_LLM_TOKENS_PER_SECOND: float = 60.0
+    FAKE_LLM_ERROR_RATE: float = 0.0  # fraction of requests answered with FAKE_LLM_ERROR_STATUS
+    FAKE_LLM_ERROR_STATUS: int = 500  # 429 adds Retry-After: 1
+    FAKE_LLM_TRUNCATION_RATE: float = 0.0  # fraction of responses stopped half-way (finish_reason "length")
+
+    # ── LLM cassettes (record / replay) ───────────────────────────
+    LLM_CASSETTE_MODE: str = "off"  # off | record | replay | auto (replay if recorded, else record)
+    LLM_CASSETTE_DIR: str = "llm_cassettes"  # one <sha256>.json.gz per distinct request; relative to backend/
+    LLM_CASSETTE_TIME_SCALE: float = 1.0  # replay timing × this; 0 = no delays
+
+    @property
+    def LLM_CASSETTE_DIR_RESOLVED(self) -> str:
+        """Cassette directory: LLM_CASSETTE_DIR, a relative path taken from the backend directory."""
+        return str(Path(__file__).resolve().parents[1] / self.LLM_CASSETTE_DIR)
+
+    # ── LLM worker processes ──────────────────────────────────────
+    LLM_WORKER_MODE: str = "inline"  # inline (API event loop) | process (non-streaming generation in worker processes)
+    LLM_WORKER_PROCESSES: int = 2  # per API worker; LLM_MAX_CONCURRENCY is split between them
+
+    # ── Generation jobs (?async=true) ─────────────────────────────
+    JOB_STORE: str = "memory"  # in-process; jobs are only visible to the worker that accepted them
+    JOB_MAX_CONCURRENCY: int = 16  # jobs generating at once per worker; the rest stay queued
+    JOB_RESULT_TTL_SECONDS: int = 3600  # finished jobs are kept this long
+    JOB_STORE_MAX_ENTRIES: int = 10000
+
+    # ── Batch generation (POST /learn/batch, /quiz/batch) ─────────
+    BATCH_MAX_TOPICS: int = 100  # topics per request
+    BATCH_MAX_CONCURRENCY: int = 4  # uncached topics generating at once per request
+
+    # ── Output sizing ─────────────────────────────────────────────
+    LLM_ADAPTIVE_MAX_TOKENS: bool = True  # size max_tokens per call from the requested output; off = LLM_MAX_TOKENS
+    LLM_MAX_TOKENS_HEADROOM: float = 1.5  # max_tokens = estimated output × this
+    LLM_MIN_MAX_TOKENS: int = 1024
+    LESSON_QUIZ_PER_SUB_TOPIC: int = 10  # lowered for topics whose lesson would not fit LLM_MAX_TOKENS
+    LESSON_CODE_PER_SUB_TOPIC: int = 2
+
+    # ── Multi-provider routing ────────────────────────────────────
+    LLM_PROVIDERS: str = ""  # e.g. "ollama,ollama_cloud,openrouter"; empty = LLM_PROVIDER only
+    LLM_ROUTER_WINDOW: int = 100  # recent calls per provider behind p50/p95 and error rate
+    LLM_CIRCUIT_FAILURES: int = 5  # consecutive failures that open a provider's circuit
+    LLM_CIRCUIT_OPEN_SECONDS: float = 30.0  # then one trial call decides whether it closes
+    LLM_HEDGE_ENABLED: bool = False  # interactive non-streaming calls only; costs a duplicate call
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 2.0  # hedge after max(this, primary p95)
+
+    # ── Model tiers (per-endpoint models, latency SLOs) ───────────
+    # tier -> {provider: model}, e.g. {"fast": {"ollama": "llama3.2:3b"}, "large": {"ollama": "qwen2.5:32b"}};
+    # a provider a tier does not list serves its default model (OLLAMA_MODEL, ...)
+    LLM_MODEL_TIERS: dict[str, dict[str, str]] = {}
+    LLM_ENDPOINT_TIERS: dict[str, str] = {"quiz": "fast", "more_context": "fast"}  # others "default"; lesson_* follow "lesson"
+    LLM_TIER_SLO_P95_SECONDS: dict[str, float] = {}  # endpoint -> SLO, e.g. {"lesson": 90, "lesson_stream": 5} (stream: TTFT)
+    LLM_TIER_DOWNGRADE: dict[str, str] = {"default": "fast", "large": "fast"}  # tier served while an endpoint's SLO is breached
+    LLM_TIER_SLO_WINDOW: int = 50  # recent calls per endpoint behind the p95
+    LLM_TIER_SLO_MIN_CALLS: int = 10  # calls needed before the SLO is checked
+    LLM_TIER_DOWNGRADE_SECONDS: float = 300.0  # then the primary tier is tried again with a fresh window
+
+    # ── LLM HTTP client pool ──────────────────────────────────────
+    LLM_HTTP_MAX_CONNECTIONS: int = 20
+    LLM_HTTP_MAX_KEEPALIVE: int = 10
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # seconds an idle connection is kept
+    LLM_HTTP_CONNECT_TIMEOUT: float = 10.0
+    LLM_HTTP_READ_TIMEOUT: float = 300.0  # long lessons can take minutes
+
+    # ── LLM Admission Control ─────────────────────────────────────
+    LLM_MAX_CONCURRENCY: dict[str, int] = {"ollama": 4, "ollama_cloud": 8, "openrouter": 16}  # in-flight calls per provider
+    LLM_DEFAULT_MAX_CONCURRENCY: int = 8  # providers not listed above
+    LLM_QUEUE_TIMEOUT_INTERACTIVE: float = 15.0  # seconds queued before 503; 0 = wait indefinitely
+    LLM_QUEUE_TIMEOUT_QUIZ: float = 30.0
+    LLM_QUEUE_TIMEOUT_BACKGROUND: float = 0.0
+    LLM_MAX_RETRIES: int = 3  # on 429 / 5xx
+    LLM_BACKOFF_BASE_SECONDS: float = 1.0
+    LLM_BACKOFF_MAX_SECONDS: float = 30.0  # a longer provider Retry-After fails fast with 503
 
     # ── LangSmith ─────────────────────────────────────────────────
     LANGCHAIN_API_KEY: str = ""
@@ -53,26 +134,67 @@ class Settings(BaseSettings):
 
     @property
     def LLM_API_KEY(self) -> str:
-        if self.LLM_PROVIDER == "openrouter":
-            return self.OPENROUTER_API_KEY
-        return self.OPENAI_API_KEY
+        return self.provider_api_key(self.LLM_PROVIDER)
 
     @property
     def LLM_BASE_URL(self) -> str | None:
-        if self.LLM_PROVIDER == "openrouter":
+        return self.provider_base_url(self.LLM_PROVIDER)
+
+    @property
+    def LLM_MODEL(self) -> str:
+        return self.provider_model(self.LLM_PROVIDER)
+
+    @property
+    def LLM_PROVIDER_LIST(self) -> list[str]:
+        """Providers the router may use, in order of preference."""
+        providers = [p.strip() for p in self.LLM_PROVIDERS.split(",") if p.strip()]
+        return providers or [self.LLM_PROVIDER]
+
+    def provider_api_key(self, provider: str) -> str:
+        if provider == "openrouter":
+            return self.OPENROUTER_API_KEY
+        elif provider == "ollama":
+            # Use Ollama API key if provided, otherwise use dummy key for local
+            return self.OLLAMA_API_KEY or "no-key-required"
+        elif provider == "ollama_cloud":
+            return self.OLLAMA_API_KEY
+        elif provider == "fake":
+            return "fake"
+        return self.OPENAI_API_KEY
+
+    def provider_base_url(self, provider: str) -> str | None:
+        if provider == "openrouter":
             return "https://openrouter.ai/api/v1"
-        elif self.LLM_PROVIDER == "ollama":
+        elif provider == "ollama":
             # Ollama uses OpenAI-compatible API at /v1 endpoint
             base = self.OLLAMA_BASE_URL.rstrip("/")
-            return f"{base}/v1" 
+            return f"{base}/v1"
+        elif provider == "ollama_cloud":
+            return f"{self.OLLAMA_CLOUD_BASE_URL.rstrip('/')}/v1"
+        elif provider == "fake":
+            return "http://fake-llm/v1"  # never resolved – answered in process by FakeLLMTransport
         return None
 
-    @property
-    def LLM_MODEL(self) -> str:
-        if self.LLM_PROVIDER == "openrouter":
+    def endpoint_tier(self, endpoint: str) -> str:
+        """Primary model tier of an LLM endpoint (lesson, lesson_section, lesson_stream, quiz, more_context)."""
+        tier = self.LLM_ENDPOINT_TIERS.get(endpoint)
+        if tier is None and endpoint.startswith("lesson_"):
+            tier = self.LLM_ENDPOINT_TIERS.get("lesson")
+        return tier or "default"
+
+    def tier_model(self, tier: str, provider: str) -> str:
+        """Model a provider serves for ``tier``; its default model if the tier does not name one."""
+        return self.LLM_MODEL_TIERS.get(tier, {}).get(provider) or self.provider_model(provider)
+
+    def provider_model(self, provider: str) -> str:
+        if provider == "openrouter":
             return self.OPENROUTER_MODEL
-        elif self.LLM_PROVIDER == "ollama":
+        elif provider == "ollama":
             return self.OLLAMA_MODEL
+        elif provider == "ollama_cloud":
+            return self.OLLAMA_CLOUD_MODEL
+        elif provider == "fake":
+            return self.FAKE_LLM_MODEL
         return "gpt-4o"
 
     # ── App ────────────────────────────────────────────────────────
@@ -80,6 +202,50 @@ class Settings(BaseSettings):
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = True
 
+    # ── Lesson Cache ──────────────────────────────────────────────
+    LESSON_CACHE_MAX_ENTRIES: int = 512  # in-process LRU in front of Postgres
+    LESSON_CACHE_TTL_SECONDS: int = 3600
+
+    # ── More-context (follow-up questions) ────────────────────────
+    MORE_CONTEXT_CACHE_ENABLED: bool = True
+    MORE_CONTEXT_CACHE_THRESHOLD: float = 0.85  # cosine similarity of hashed n-gram TF-IDF vectors
+    MORE_CONTEXT_CACHE_MAX_PER_TOPIC: int = 200
+    MORE_CONTEXT_CACHE_MAX_TOPICS: int = 1000
+    MORE_CONTEXT_TOKEN_BUDGET: int = 1200  # lesson context in the prompt, best BM25 sections first
+
+    # ── Lesson Fan-out ────────────────────────────────────────────
+    LESSON_FANOUT_ENABLED: bool = False  # POST /learn: one request per section, merged (LearnRequest.fanout overrides)
+    LESSON_FANOUT_MAX_PARTS: int = 6  # sub-topics are grouped into at most this many sections
+    LESSON_FANOUT_RETRIES: int = 2  # per failed or non-JSON section
+
+    # ── Lesson Streaming ──────────────────────────────────────────
+    STREAM_HUB_MAX_BACKLOG_CHARS: int = 262144  # per shared stream; late joiners need the backlog
+    STREAM_DISCONNECT_GRACE_SECONDS: float = 0.0  # keep generating this long for a reconnect; 0 = cancel at once
+    STREAM_FIRST_READ_TIMEOUT_SECONDS: float = 10.0  # a new stream nobody has started reading by then is cancelled
+    STREAM_RESUME_GRACE_SECONDS: float = 120.0  # keep finished streams for Last-Event-ID resumes
+    STREAM_REPLAY_CHUNK_CHARS: int = 0  # >0 splits cached explanations into deltas of this size
+    SSE_FRAME_WINDOW_MS: int = 50  # coalesce explanation tokens for up to this long …
+    SSE_FRAME_MAX_BYTES: int = 512  # … or until this many bytes are buffered
+    SSE_HEARTBEAT_SECONDS: float = 15.0  # comment line sent while the model is silent
+
+    # ── Quiz Bank ─────────────────────────────────────────────────
+    QUIZ_BANK_TARGET_SIZE: int = 20  # questions per topic × difficulty before generation stops
+    QUIZ_BANK_BATCH_SIZE: int = 10  # questions asked for per LLM call
+
+    # ── Pre-generation (python pregenerate.py / POST /admin/pregenerate) ──
+    PREGEN_LEVELS: str = "beginner,intermediate,advanced"  # lesson user levels, comma-separated
+    PREGEN_QUIZ_DIFFICULTIES: str = "intermediate"
+    PREGEN_CONCURRENCY: int = 4
+    PREGEN_REQUESTS_PER_MINUTE: float = 30.0  # provider rate limit; 0 = unlimited
+    PREGEN_CHECKPOINT_PATH: str = "pregen_checkpoint.txt"  # finished cache keys, one per line; relative to backend/
+
+    @property
+    def PREGEN_CHECKPOINT_PATH_RESOLVED(self) -> str:
+        """Checkpoint file: PREGEN_CHECKPOINT_PATH, a relative path taken from the backend directory."""
+        if not self.PREGEN_CHECKPOINT_PATH:
+            return ""
+        return str(Path(__file__).resolve().parents[1] / self.PREGEN_CHECKPOINT_PATH)
+
     # ── CSV Data Path ─────────────────────────────────────────────
     CSV_PATH: str = ""  # Optional override (e.g. /app/AI_ML_Syllabus_Structured.csv in Docker)
 
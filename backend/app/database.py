@@ -2,6 +2,7 @@
 
 import ssl
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
@@ -42,10 +43,25 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+# Columns added after the initial schema – create_all() does not alter existing tables.
+_SCHEMA_UPGRADES = [
+    "ALTER TABLE generated_contents ADD COLUMN IF NOT EXISTS cache_key VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_generated_contents_cache_key ON generated_contents (cache_key)",
+    "ALTER TABLE generated_contents ADD COLUMN IF NOT EXISTS provider VARCHAR(50)",
+    "ALTER TABLE generated_contents ADD COLUMN IF NOT EXISTS endpoint VARCHAR(50)",
+    "ALTER TABLE generated_contents ADD COLUMN IF NOT EXISTS ttft_ms INTEGER",
+    "ALTER TABLE generated_contents ADD COLUMN IF NOT EXISTS latency_ms INTEGER",
+    "ALTER TABLE generated_contents ADD COLUMN IF NOT EXISTS estimated_tokens INTEGER",
+    "ALTER TABLE quiz_items ADD COLUMN IF NOT EXISTS model_tier VARCHAR(50)",
+]
+
+
 async def create_tables():
     """Create all tables (run once on startup)."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        for stmt in _SCHEMA_UPGRADES:
+            await conn.execute(text(stmt))
 
 
 async def dispose_engine():
@@ -7,16 +7,22 @@ Monolith MVP collapsing Syllabus + LLM Orchestrator + Content services.
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.config import settings
 from app.database import create_tables, dispose_engine
+from app.services import job_service
+from app.services.admission import AdmissionRejected
+from app.services.llm_clients import close_registry, init_registry
+from app.services.llm_workers import start_pool as start_llm_workers, stop_pool as stop_llm_workers
+from app.services.pregen_service import cancel_job as cancel_pregeneration
 from app.models import *  # noqa: F401,F403 – register all models with Base.metadata
 from app.utils.csv_loader import seed_from_csv
 
 # ── Routers ──────────────────────────────────────────────────────────
-from app.routers import admin, auth, dashboard, health, learn, progress, quiz, syllabus
+from app.routers import admin, auth, dashboard, health, jobs, learn, progress, quiz, syllabus
 
 logger = logging.getLogger("studyai")
 logging.basicConfig(
@@ -39,9 +45,25 @@ async def lifespan(app: FastAPI):
     await seed_from_csv()
     logger.info("✅ Syllabus data seeded")
 
+    # 3. Long-lived, pooled LLM clients
+    init_registry()
+    logger.info("✅ LLM client pool ready")
+
+    # 4. Optional LLM worker processes (LLM_WORKER_MODE=process)
+    if start_llm_workers() is not None:
+        logger.info("✅ %d LLM worker processes started", settings.LLM_WORKER_PROCESSES)
+
     yield  # ── app is running ──
 
     # Shutdown
+    if await cancel_pregeneration():
+        logger.info("🛑 Pre-generation job cancelled")
+    cancelled = await job_service.cancel_all()
+    if cancelled:
+        logger.info("🛑 %d generation job(s) cancelled", cancelled)
+    await stop_llm_workers()
+    await close_registry()
+    logger.info("🛑 LLM client pool closed")
     await dispose_engine()
     logger.info("🛑 Database connections closed")
 
@@ -65,6 +87,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ── LLM provider saturated → 503 with Retry-After ─────────────────────
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 # ── Include routers ─────────────────────────────────────────────────
 API_PREFIX = "/api/v1"
 
@@ -73,6 +105,7 @@ app.include_router(auth.router, prefix=API_PREFIX)
 app.include_router(syllabus.router, prefix=API_PREFIX)
 app.include_router(learn.router, prefix=API_PREFIX)
 app.include_router(quiz.router, prefix=API_PREFIX)
+app.include_router(jobs.router, prefix=API_PREFIX)
 app.include_router(progress.router, prefix=API_PREFIX)
 app.include_router(dashboard.router, prefix=API_PREFIX)
 app.include_router(admin.router, prefix=API_PREFIX)
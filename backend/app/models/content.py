@@ -2,7 +2,7 @@
 
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
@@ -17,10 +17,16 @@ class GeneratedContent(Base):
     id = Column(Integer, primary_key=True, index=True)
     topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False, index=True)
     content_type = Column(String(50), nullable=False, default="lesson")  # lesson | quiz
+    cache_key = Column(String(64), nullable=True, index=True)  # hash of the generation context
     content_json = Column(JSONB, nullable=False)  # full structured response
     model_used = Column(String(100), nullable=True)
+    provider = Column(String(50), nullable=True)
+    endpoint = Column(String(50), nullable=True)  # lesson | lesson_stream | lesson_fanout | quiz
     prompt_tokens = Column(Integer, nullable=True)
     completion_tokens = Column(Integer, nullable=True)
+    estimated_tokens = Column(Integer, nullable=True)  # completion tokens expected by output_sizing
+    ttft_ms = Column(Integer, nullable=True)  # streamed lessons only
+    latency_ms = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # relationships
@@ -30,6 +36,32 @@ class GeneratedContent(Base):
         return f"<GeneratedContent id={self.id} topic_id={self.topic_id} type='{self.content_type}'>"
 
 
+class QuizItem(Base):
+    """One multiple-choice question in the quiz bank, unique per topic by normalised question text."""
+
+    __tablename__ = "quiz_items"
+    __table_args__ = (
+        UniqueConstraint("topic_id", "text_hash", name="uq_quiz_items_topic_hash"),
+        Index("ix_quiz_items_topic_difficulty", "topic_id", "difficulty"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    topic_id = Column(Integer, ForeignKey("topics.id"), nullable=False)
+    sub_topic_id = Column(Integer, ForeignKey("sub_topics.id"), nullable=True, index=True)
+    difficulty = Column(String(50), nullable=False)
+    question = Column(Text, nullable=False)
+    options = Column(JSONB, nullable=False)
+    correct_index = Column(Integer, nullable=False)
+    explanation = Column(Text, nullable=False, default="")
+    text_hash = Column(String(64), nullable=False)  # sha256 of the normalised question text
+    model_used = Column(String(100), nullable=True)
+    model_tier = Column(String(50), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<QuizItem id={self.id} topic_id={self.topic_id} difficulty='{self.difficulty}'>"
+
+
 class UserProgress(Base):
     """Tracks what topics a user has studied."""
 
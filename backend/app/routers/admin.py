@@ -1,13 +1,16 @@
-"""Admin REST endpoints – user management (admin only)."""
+"""Admin REST endpoints – user management, cache pre-generation and LLM usage (admin only)."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.dependencies import get_admin_user
 from app.models.user import User
-from app.schemas.admin import AdminCreateUserRequest, AdminUserOut, AdminUserProgressOut
+from app.schemas.admin import AdminCreateUserRequest, AdminUserOut, AdminUserProgressOut, PregenerateRequest
+from app.services import content_service, pregen_service
 from app.services.admin_service import (
     create_user,
     deactivate_user,
@@ -88,3 +91,45 @@ async def admin_delete_user(
     if not ok:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deactivated"}
+
+
+@router.post("/pregenerate", status_code=status.HTTP_202_ACCEPTED)
+async def admin_start_pregeneration(
+    body: PregenerateRequest | None = None,
+    _admin_id: str = Depends(get_admin_user),
+):
+    """Start pre-generating lessons and quizzes in the background. Resumes from the checkpoint."""
+    options = body.model_dump() if body else {}
+    try:
+        job = pregen_service.start_job(pregen_service.new_job(**options))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return job.progress()
+
+
+@router.get("/pregenerate")
+async def admin_pregeneration_status(_admin_id: str = Depends(get_admin_user)):
+    """Progress of the current (or last) pre-generation job."""
+    job = pregen_service.get_job()
+    if job is None:
+        raise HTTPException(status_code=404, detail="No pre-generation job has been started")
+    return job.progress()
+
+
+@router.delete("/pregenerate")
+async def admin_cancel_pregeneration(_admin_id: str = Depends(get_admin_user)):
+    """Cancel the running pre-generation job. Finished items stay cached."""
+    if not await pregen_service.cancel_job():
+        raise HTTPException(status_code=404, detail="No pre-generation job is running")
+    return pregen_service.get_job().progress()
+
+
+@router.get("/llm-usage")
+async def admin_llm_usage(
+    hours: int = Query(24 * 7, ge=1, description="Look back this many hours"),
+    _admin_id: str = Depends(get_admin_user),
+    session: AsyncSession = Depends(get_db),
+):
+    """Tokens, latency and generation speed of saved content, per endpoint and per model."""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    return {"hours": hours, **await content_service.usage_summary(session, since)}
@@ -6,6 +6,12 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database import get_db
+from app.services import admission, job_service, llm_usage, llm_workers, model_tiers
+from app.services.cache_service import lesson_cache
+from app.services.llm_router import get_router
+from app.services.more_context_service import more_context_cache
+from app.services.stream_hub import lesson_stream_hub
+from app.utils import metrics
 
 router = APIRouter(tags=["Health"])
 
@@ -27,4 +33,24 @@ async def health_check(session: AsyncSession = Depends(get_db)):
         "database": "connected" if db_ok else "disconnected",
         "llm_provider": settings.LLM_PROVIDER,
         "llm_model": settings.LLM_MODEL,
+        "llm_providers": get_router().stats(),
+    }
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """In-process counters (cache hits/misses etc.) since this worker started."""
+    return {
+        **metrics.snapshot(),
+        "rates_per_sec": metrics.rates(),
+        "histograms": metrics.histograms(),
+        "llm_admission": admission.stats(),
+        "llm_providers": get_router().stats(),
+        "llm_usage": llm_usage.summary(),
+        "llm_tiers": model_tiers.stats(),
+        "lesson_cache_entries": len(lesson_cache),
+        "more_context_cache": more_context_cache.stats(),
+        "live_lesson_streams": len(lesson_stream_hub),
+        "jobs": job_service.stats(),
+        "llm_workers": await llm_workers.stats(),  # in process mode, LLM calls are counted per worker here
     }
@@ -0,0 +1,50 @@
+"""Job endpoints – status, result and completion events of ``?async=true`` generations."""
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.config import settings
+from app.schemas.job import JobOut
+from app.services import job_service
+from app.services.job_store import Job
+from app.utils.sse import HEARTBEAT, SSE_HEADERS, format_event
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def accepted(request: Request, job: Job) -> JSONResponse:
+    """202 response for a newly submitted job, with its status URL in ``Location``."""
+    return JSONResponse(
+        status_code=202,
+        content=JobOut.from_job(job).model_dump(mode="json"),
+        headers={"Location": str(request.url_for("get_job", job_id=job.id))},
+    )
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: str):
+    """Status of a generation job, with the result (or error) once it has finished."""
+    job = await job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobOut.from_job(job)
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events for a job: ``status`` on every change, then ``done`` or ``error``.
+
+    Every event carries the full job (as from GET /jobs/{job_id}); the stream ends with the job.
+    """
+    if await job_service.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        async for job in job_service.watch(job_id, settings.SSE_HEARTBEAT_SECONDS):
+            if job is None:
+                yield HEARTBEAT
+                continue
+            event = {"succeeded": "done", "running": "status", "queued": "status"}.get(job.status, "error")
+            yield format_event(event, JobOut.from_job(job).model_dump(mode="json"))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
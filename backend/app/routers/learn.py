@@ -1,62 +1,120 @@
 """Learn endpoints – generate lessons via LLM (streaming + non-streaming)."""
 
-import json
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from collections.abc import AsyncGenerator
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
+from app.config import settings
 from app.database import get_db
-from app.schemas.content import CachedContentOut, LearnRequest, LessonContent, MoreContextRequest, MoreContextResponse
-from app.services import syllabus_service, content_service
-from app.services.llm_service import generate_lesson, generate_more_context, stream_lesson
+from app.routers.jobs import accepted
+from app.schemas.content import (
+    CachedContentOut,
+    LearnBatchRequest,
+    LearnRequest,
+    LessonContent,
+    MoreContextRequest,
+    MoreContextResponse,
+)
+from app.schemas.job import JobOut
+from app.schemas.syllabus import TopicDetail
+from app.services import batch_service, content_service, job_service, lesson_service, more_context_service, syllabus_service
+from app.services.admission import AdmissionRejected, Priority
+from app.services.stream_hub import BroadcastStream, StreamLagError, lesson_stream_hub
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+from app.utils.json_stream import LessonStreamParser, lesson_events
+from app.utils.ndjson import NDJSON_HEADERS, NDJSON_MEDIA_TYPE, ndjson_lines
+from app.utils.sse import SSE_HEADERS, format_event, frame_events, make_event_id, parse_event_id, skip_events
 
 router = APIRouter(prefix="/learn", tags=["Learn"])
 
+# Stream id used in SSE event ids of lessons replayed from the cache.
+CACHE_STREAM_ID = "cache"
+
+
+# Declared before /{topic_id}, which would otherwise match "batch".
+@router.post("/batch", response_class=StreamingResponse)
+async def teach_topics(
+    body: LearnBatchRequest,
+    refresh: bool = Query(False, description="Ignore cached lessons and regenerate"),
+    session: AsyncSession = Depends(get_db),
+):
+    """Lessons for a list of topics or a whole unit, streamed as NDJSON as each one finishes.
+
+    Cached lessons come first; the rest are generated at most BATCH_MAX_CONCURRENCY
+    at a time. Each line is a ``topic`` item (``cached`` / ``generated`` with the
+    lesson as ``result``, or ``failed`` with ``error``); the last is a ``summary``.
+    """
+    topic_ids = await batch_service.topic_ids(session, body)
+    if topic_ids is None:
+        raise HTTPException(status_code=404, detail="Unit not found")
+    if len(topic_ids) > settings.BATCH_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_TOPICS} topics per batch")
+    lesson = body.lesson_request()
+
+    async def build(job_session: AsyncSession, topic: TopicDetail) -> LessonContent:
+        return await _lesson_response(job_session, topic, lesson, refresh, Priority.BACKGROUND)
+
+    async def cached_ids(job_session: AsyncSession, ids: list[int]) -> set[int]:
+        return await lesson_service.cached_topic_ids(job_session, ids, lesson)
 
-@router.post("/{topic_id}", response_model=LessonContent)
+    lines = ndjson_lines(batch_service.run("lesson", topic_ids, build, None if refresh else cached_ids))
+    return StreamingResponse(
+        lines, media_type=NDJSON_MEDIA_TYPE, headers=NDJSON_HEADERS, background=BackgroundTask(lines.aclose)
+    )
+
+
+@router.post(
+    "/{topic_id}",
+    response_model=LessonContent,
+    responses={202: {"model": JobOut, "description": "Generation job accepted (``?async=true``)"}},
+)
 async def teach_topic(
     topic_id: int,
     body: LearnRequest,
+    request: Request,
+    refresh: bool = Query(False, description="Ignore cached lessons and regenerate"),
+    run_async: bool = Query(False, alias="async", description="Return 202 with a job id instead of waiting"),
     session: AsyncSession = Depends(get_db),
 ):
-    """Generate a full lesson for a topic (non-streaming)."""
+    """Generate a full lesson for a topic (non-streaming), served from cache when possible.
+
+    With ``?async=true`` the lesson is generated in the background: the response
+    is 202 with a job, and GET /jobs/{id} (or its ``/events``) returns the lesson.
+    """
     topic = await syllabus_service.get_topic_detail(session, topic_id)
     if topic is None:
         raise HTTPException(status_code=404, detail="Topic not found")
 
-    sub_topics_to_use = [s.content for s in topic.sub_topics]
-    if body.sub_topic_id is not None:
-        focused = next((s for s in topic.sub_topics if s.id == body.sub_topic_id), None)
-        if focused:
-            sub_topics_to_use = [focused.content]
-
-    result = await generate_lesson(
-        main_topic=topic.main_topic_name,
-        unit_name=topic.unit_name,
-        topic_title=topic.title,
-        sub_topics=sub_topics_to_use,
-        user_level=body.user_level,
-        focus_areas=body.focus_areas,
-        include_code=body.include_code,
-        include_quiz=body.include_quiz,
-    )
+    async def build(job_session: AsyncSession) -> LessonContent:
+        return await _lesson_response(job_session, topic, body, refresh)
+
+    if run_async:
+        return accepted(request, await job_service.submit("lesson", topic_id, build))
+    return await build(session)
 
-    # Cache the result
-    await content_service.save_content(
-        session=session,
-        topic_id=topic_id,
-        content_type="lesson",
-        content_json=result,
-        model_used=None,
-    )
+
+async def _lesson_response(
+    session: AsyncSession,
+    topic: TopicDetail,
+    body: LearnRequest,
+    refresh: bool,
+    priority: Priority = Priority.INTERACTIVE,
+) -> LessonContent:
+    result = await lesson_service.get_or_generate_lesson(session, topic, body, refresh=refresh, priority=priority)
 
     # Add topic context to response
     response_data = {
         **result,
-        "topic_id": topic_id,
+        "topic_id": topic.id,
         "topic_title": topic.title,
         # Map LLM response fields to schema fields
-        "key_points": result.get("key_concepts", []),
+        "key_points": result.get("key_points", result.get("key_concepts", [])),
         "code_examples": result.get("code_examples", []),
         "further_reading": result.get("resources", result.get("further_reading", [])),
     }
@@ -70,61 +128,141 @@ async def generate_more_context_endpoint(
     body: MoreContextRequest,
     session: AsyncSession = Depends(get_db),
 ):
-    """Generate additional context based on user's follow-up question (uses existing lesson)."""
+    """Generate additional context based on user's follow-up question (uses existing lesson).
+
+    Questions similar enough to one already answered for this topic get the stored answer.
+    """
     if not body.question or not body.question.strip():
         raise HTTPException(status_code=400, detail="question is required")
     topic = await syllabus_service.get_topic_detail(session, topic_id)
     if topic is None:
         raise HTTPException(status_code=404, detail="Topic not found")
-    existing_explanation = body.existing_explanation
-    if not existing_explanation:
-        cached = await content_service.list_content_for_topic(session, topic_id)
-        if cached:
-            latest = max(cached, key=lambda c: c.created_at)
-            existing_explanation = latest.content_json.get("explanation", "")
-    if not existing_explanation:
-        existing_explanation = f"Topic: {topic.title}. Sub-topics: {', '.join(s.content for s in topic.sub_topics)}"
-    result = await generate_more_context(
-        topic_title=topic.title,
-        existing_explanation=existing_explanation,
-        user_question=body.question.strip(),
+    result = await more_context_service.get_or_generate_more_context(
+        session, topic, body.question.strip(), existing_explanation=body.existing_explanation
     )
-    return MoreContextResponse(explanation=result["explanation"], code_examples=result.get("code_examples", []))
+    return MoreContextResponse(**result)
 
 
 @router.get("/{topic_id}/stream")
 async def stream_teach_topic(
     topic_id: int,
     user_level: str = Query("intermediate", description="beginner/intermediate/advanced"),
+    refresh: bool = Query(False, description="Ignore the cached lesson and regenerate"),
+    last_event_id: str | None = Header(None, alias="Last-Event-ID"),
     session: AsyncSession = Depends(get_db),
 ):
-    """Stream a lesson via Server-Sent Events."""
+    """Stream a lesson via Server-Sent Events.
+
+    Events: ``explanation_delta``, ``key_point``, ``code_example``, ``quiz_item``,
+    ``math_formula``, ``further_reading`` and finally ``done`` with the full lesson,
+    or ``error`` if generation fails (with ``retry_after`` if the LLM provider is saturated).
+    A cached lesson is replayed as the same events without calling the LLM.
+
+    Every frame has an id; reconnecting with ``Last-Event-ID`` resumes after it.
+    If the stream can no longer be resumed, a ``reset`` event is sent first and
+    the lesson starts over.
+    """
     topic = await syllabus_service.get_topic_detail(session, topic_id)
     if topic is None:
         raise HTTPException(status_code=404, detail="Topic not found")
 
-    async def event_generator():
-        async for chunk in stream_lesson(
-            main_topic=topic.main_topic_name,
-            unit_name=topic.unit_name,
-            topic_title=topic.title,
-            sub_topics=[s.content for s in topic.sub_topics],
-            user_level=user_level,
-        ):
-            yield f"data: {json.dumps({'token': chunk})}\n\n"
-        yield "data: [DONE]\n\n"
+    resume = parse_event_id(last_event_id)
+    key = lesson_service.stream_cache_key(topic_id, user_level)
+    stream = None if refresh else lesson_stream_hub.get(key)
+
+    if resume and stream is not None and resume[0] == stream.id and stream.offset == 0:
+        metrics.incr("learn_stream.resumed")
+        return _live_stream_response(stream, start_seq=resume[1])
+
+    cached = None if refresh else await lesson_service.get_cached_lesson(session, key)
+    if cached is not None:
+        start_seq = resume[1] if resume and resume[0] == CACHE_STREAM_ID else 0
+        if start_seq:
+            metrics.incr("learn_stream.resumed")
+
+        async def replay_generator():
+            if resume and not start_seq:
+                yield format_event("reset", {})
+            events = lesson_events(cached, settings.STREAM_REPLAY_CHUNK_CHARS)
+            for seq, (event, data) in enumerate(events, start=1):
+                if seq > start_seq:
+                    yield format_event(event, data, make_event_id(CACHE_STREAM_ID, seq))
 
+        return StreamingResponse(replay_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    # Concurrent viewers of the same lesson share one upstream stream.
+    stream = lesson_service.open_lesson_stream(topic, user_level, key, fresh=refresh)
+    return _live_stream_response(stream, start_seq=0, reset=resume is not None)
+
+
+def _live_stream_response(stream: BroadcastStream, start_seq: int, reset: bool = False) -> StreamingResponse:
+    """SSE response following a shared upstream stream, skipping ``start_seq`` events."""
+    tokens = stream.subscribe()
+
+    async def lesson_stream_events():
+        # Emit typed events as soon as each part of the lesson JSON is complete.
+        parser = LessonStreamParser()
+        finished = False
+        try:
+            async for chunk in tokens:
+                for event in parser.feed(chunk):
+                    yield event
+            for event in parser.close():
+                yield event
+            finished = True
+        # Headers are already sent, so failures are reported in-band rather than by dropping the body.
+        except AdmissionRejected as exc:
+            yield "error", {"detail": str(exc), "retry_after": exc.retry_after}
+            finished = True
+        except StreamLagError:
+            metrics.incr("learn_stream.errors")
+            yield "error", {"detail": "Fell too far behind the live lesson stream – reconnect to continue"}
+            finished = True
+        except Exception:
+            logger.exception("Lesson stream %s failed", stream.key[:12])
+            metrics.incr("learn_stream.errors")
+            yield "error", {"detail": "Lesson generation failed"}
+            finished = True
+        finally:
+            if not finished:
+                metrics.incr("learn_stream.client_disconnects")
+            # Leaving the shared stream cancels the upstream call if we were its last viewer.
+            await tokens.aclose()
+
+    # A resuming client re-parses the stored tokens from the start (so parser
+    # state matches) but only receives events after the one it last saw.
+    events = skip_events(lesson_stream_events(), start_seq) if start_seq else lesson_stream_events()
+    # Coalesce per-token events into fewer frames; heartbeat while the model warms up.
+    body = frame_events(
+        events,
+        window_ms=settings.SSE_FRAME_WINDOW_MS,
+        max_bytes=settings.SSE_FRAME_MAX_BYTES,
+        heartbeat_seconds=settings.SSE_HEARTBEAT_SECONDS,
+        stream_id=stream.id,
+        start_seq=start_seq,
+    )
+    if reset:
+        body = _prefixed(format_event("reset", {}), body)
     return StreamingResponse(
-        event_generator(),
+        body,
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+        headers=SSE_HEADERS,
+        # On disconnect Starlette cancels the send loop but leaves the generator
+        # suspended; closing it here releases the subscription immediately.
+        background=BackgroundTask(body.aclose),
     )
 
 
+async def _prefixed(first: str, frames: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """Send ``first`` (outside the numbered event sequence), then ``frames``."""
+    try:
+        yield first
+        async for frame in frames:
+            yield frame
+    finally:
+        await frames.aclose()
+
+
 @router.get("/{topic_id}/cached", response_model=list[CachedContentOut])
 async def get_cached_lessons(
     topic_id: int,
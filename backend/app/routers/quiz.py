@@ -1,47 +1,107 @@
-"""Quiz endpoints – generate quizzes via LLM."""
+"""Quiz endpoints – quizzes sampled from the per-topic question bank."""
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
+from app.config import settings
 from app.database import get_db
-from app.schemas.content import QuizResponse
-from app.services import syllabus_service, content_service
-from app.services.llm_service import generate_quiz
+from app.routers.jobs import accepted
+from app.schemas.content import QuizBatchRequest, QuizResponse
+from app.schemas.job import JobOut
+from app.schemas.syllabus import TopicDetail
+from app.services import batch_service, job_service, quiz_service, syllabus_service
+from app.services.admission import Priority
+from app.utils.ndjson import NDJSON_HEADERS, NDJSON_MEDIA_TYPE, ndjson_lines
 
 router = APIRouter(prefix="/quiz", tags=["Quiz"])
 
 
-@router.post("/{topic_id}", response_model=QuizResponse)
+# Declared before /{topic_id}, which would otherwise match "batch".
+@router.post("/batch", response_class=StreamingResponse)
+async def create_quizzes(
+    body: QuizBatchRequest,
+    refresh: bool = Query(False, description="Generate new questions into each bank first"),
+    session: AsyncSession = Depends(get_db),
+):
+    """Quizzes for a list of topics or a whole unit, streamed as NDJSON as each one finishes.
+
+    Topics whose bank already holds ``num_questions`` questions come first; the
+    rest are generated at most BATCH_MAX_CONCURRENCY at a time. Lines as for
+    POST /learn/batch, with the quiz as ``result``.
+    """
+    topic_ids = await batch_service.topic_ids(session, body)
+    if topic_ids is None:
+        raise HTTPException(status_code=404, detail="Unit not found")
+    if len(topic_ids) > settings.BATCH_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_MAX_TOPICS} topics per batch")
+
+    async def build(job_session: AsyncSession, topic: TopicDetail) -> QuizResponse:
+        return await _quiz_response(
+            job_session, topic, body.num_questions, body.difficulty, None, refresh, Priority.BACKGROUND
+        )
+
+    async def cached_ids(job_session: AsyncSession, ids: list[int]) -> set[int]:
+        return await quiz_service.cached_topic_ids(job_session, ids, body.difficulty, body.num_questions)
+
+    lines = ndjson_lines(batch_service.run("quiz", topic_ids, build, None if refresh else cached_ids))
+    return StreamingResponse(
+        lines, media_type=NDJSON_MEDIA_TYPE, headers=NDJSON_HEADERS, background=BackgroundTask(lines.aclose)
+    )
+
+
+@router.post(
+    "/{topic_id}",
+    response_model=QuizResponse,
+    responses={202: {"model": JobOut, "description": "Generation job accepted (``?async=true``)"}},
+)
 async def create_quiz(
     topic_id: int,
+    request: Request,
     num_questions: int = 5,
     difficulty: str = "intermediate",
+    sub_topic_id: int | None = Query(None, description="Only questions on this sub-topic"),
+    refresh: bool = Query(False, description="Generate new questions into the bank first"),
+    run_async: bool = Query(False, alias="async", description="Return 202 with a job id instead of waiting"),
     session: AsyncSession = Depends(get_db),
 ):
-    """Generate a multiple-choice quiz for a topic."""
+    """Multiple-choice quiz for a topic, sampled from the question bank (generated when it runs short).
+
+    With ``?async=true`` the response is 202 with a job; GET /jobs/{id} returns the quiz.
+    """
     topic = await syllabus_service.get_topic_detail(session, topic_id)
     if topic is None:
         raise HTTPException(status_code=404, detail="Topic not found")
+    if sub_topic_id is not None and all(s.id != sub_topic_id for s in topic.sub_topics):
+        raise HTTPException(status_code=404, detail="Sub-topic not found in this topic")
+
+    async def build(job_session: AsyncSession) -> QuizResponse:
+        return await _quiz_response(job_session, topic, num_questions, difficulty, sub_topic_id, refresh)
+
+    if run_async:
+        return accepted(request, await job_service.submit("quiz", topic_id, build))
+    return await build(session)
 
-    result = await generate_quiz(
-        topic_title=topic.title,
-        sub_topics=[s.content for s in topic.sub_topics],
-        num_questions=num_questions,
-    )
 
-    # Cache quiz
-    await content_service.save_content(
-        session=session,
-        topic_id=topic_id,
-        content_type="quiz",
-        content_json=result,
-        model_used=None,
+async def _quiz_response(
+    session: AsyncSession,
+    topic: TopicDetail,
+    num_questions: int,
+    difficulty: str,
+    sub_topic_id: int | None,
+    refresh: bool,
+    priority: Priority = Priority.QUIZ,
+) -> QuizResponse:
+    result = await quiz_service.get_or_generate_quiz(
+        session, topic, num_questions=num_questions, difficulty=difficulty, sub_topic_id=sub_topic_id,
+        refresh=refresh, priority=priority,
     )
 
     # Add topic context to response
     response_data = {
         **result,
-        "topic_id": topic_id,
+        "topic_id": topic.id,
         "topic_title": topic.title,
     }
     
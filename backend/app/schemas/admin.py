@@ -29,3 +29,14 @@ class AdminUserProgressOut(BaseModel):
     completed: int
     total: int
     completed_topics: list[dict]  # [{topic_id, title, unit_name, completed_at}]
+
+
+class PregenerateRequest(BaseModel):
+    """Options for a pre-generation job; unset fields use the PREGEN_* settings."""
+    levels: list[str] | None = None
+    kinds: list[str] | None = None  # "lesson" and/or "quiz"
+    quiz_difficulties: list[str] | None = None
+    concurrency: int | None = None
+    requests_per_minute: float | None = None
+    topic_ids: list[int] | None = None
+    limit: int | None = None
@@ -3,7 +3,7 @@
 from datetime import datetime
 from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
 
 # ── Learn Request / Response ──────────────────────────────────────
@@ -14,6 +14,31 @@ class LearnRequest(BaseModel):
     include_code: bool = True
     include_quiz: bool = True
     sub_topic_id: int | None = None  # When set, focus generation on this specific sub-topic only
+    fanout: bool | None = None  # Generate sections in parallel and merge; None = LESSON_FANOUT_ENABLED
+
+
+class BatchTopics(BaseModel):
+    """Topics of a batch request: ``topic_ids``, or every topic of ``unit_id``."""
+    topic_ids: list[int] = []
+    unit_id: int | None = None
+
+    @model_validator(mode="after")
+    def _one_source(self) -> "BatchTopics":
+        if bool(self.topic_ids) == (self.unit_id is not None):
+            raise ValueError("Give either topic_ids or unit_id")
+        return self
+
+
+class LearnBatchRequest(BatchTopics):
+    """Lessons for several topics with the same options (POST /learn/batch)."""
+    user_level: str = "beginner"
+    focus_areas: list[str] = []
+    include_code: bool = True
+    include_quiz: bool = True
+    fanout: bool | None = None
+
+    def lesson_request(self) -> LearnRequest:
+        return LearnRequest(**self.model_dump(exclude={"topic_ids", "unit_id"}))
 
 
 class LessonContent(BaseModel):
@@ -27,6 +52,8 @@ class LessonContent(BaseModel):
     quiz: list[dict[str, Any]] = []  # [{question, options, correct, explanation}]
     further_reading: list[str] = []
     model_used: str | None = None
+    model_tier: str | None = None  # see LLM_ENDPOINT_TIERS
+    truncated: bool = False  # cut off at the output limit and repaired; not cached
 
 
 # ── More Context (follow-up) ───────────────────────────────────────
@@ -40,10 +67,15 @@ class MoreContextResponse(BaseModel):
     """Additional context generated from user's follow-up question."""
     explanation: str
     code_examples: list[dict[str, str]] = []
+    cached: bool = False  # answered from the semantic cache
+    similarity: float | None = None  # to the closest question already answered for this topic
+    model_tier: str | None = None
 
 
 # ── Quiz ──────────────────────────────────────────────────────────
 class QuizQuestion(BaseModel):
+    id: int | None = None  # quiz bank item
+    sub_topic_id: int | None = None
     question: str
     options: list[str]
     correct_index: int
@@ -54,16 +86,30 @@ class QuizResponse(BaseModel):
     topic_id: int
     topic_title: str
     questions: list[QuizQuestion]
-    model_used: str | None = None
+    model_used: str | None = None  # most common among the questions
+    model_tier: str | None = None
 
 
 # ── Cached Content ────────────────────────────────────────────────
+class QuizBatchRequest(BatchTopics):
+    """Quizzes for several topics with the same options (POST /quiz/batch)."""
+    num_questions: int = 5
+    difficulty: str = "intermediate"
+
+
 class CachedContentOut(BaseModel):
     id: int
     topic_id: int
     content_type: str
     content_json: dict[str, Any]
     model_used: str | None
+    provider: str | None = None
+    endpoint: str | None = None
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    estimated_tokens: int | None = None
+    ttft_ms: int | None = None
+    latency_ms: int | None = None
     created_at: datetime
 
     model_config = {"from_attributes": True}
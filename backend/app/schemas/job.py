@@ -0,0 +1,38 @@
+"""Schemas for asynchronous generation jobs."""
+
+from datetime import datetime, timezone
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.services.job_store import Job
+
+
+class JobOut(BaseModel):
+    """State of a generation job; ``result`` is the endpoint's normal response body once it succeeded."""
+    id: str
+    kind: str  # lesson | quiz
+    topic_id: int
+    status: str  # queued | running | succeeded | failed | cancelled
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    result: dict[str, Any] | None = None
+    error: dict[str, Any] | None = None  # {status_code, detail, retry_after?}
+
+    @classmethod
+    def from_job(cls, job: Job) -> "JobOut":
+        def ts(value: float | None) -> datetime | None:
+            return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+
+        return cls(
+            id=job.id,
+            kind=job.kind,
+            topic_id=job.topic_id,
+            status=job.status,
+            created_at=ts(job.created_at),
+            started_at=ts(job.started_at),
+            finished_at=ts(job.finished_at),
+            result=job.result,
+            error=job.error,
+        )
@@ -0,0 +1,272 @@
+"""Admission control for LLM calls – per-provider concurrency caps, priority queueing and 429 backoff.
+
+Every upstream call takes a slot from its provider's ``AdmissionController``.
+When all slots are busy, callers wait in a priority queue (interactive lessons
+before quizzes before background pre-generation). A caller that waits longer
+than its priority's queue timeout gets ``AdmissionRejected``, which the API
+turns into ``503`` with ``Retry-After``.
+
+Rate-limit (429) and 5xx responses are retried with exponential backoff,
+honouring the provider's ``Retry-After`` header. The slot is released while
+backing off, and a 429 pauses new calls to that provider for the same delay.
+"""
+
+import asyncio
+import email.utils
+import heapq
+import itertools
+import logging
+import math
+import random
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import TypeVar
+
+import openai
+
+from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Queue depth seen by each queued caller on arrival.
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+_HOLD_EWMA_ALPHA = 0.2
+
+
+class Priority(IntEnum):
+    """Lower values are admitted first."""
+    INTERACTIVE = 0  # lessons, lesson streams, follow-up questions
+    QUIZ = 1
+    BACKGROUND = 2  # pre-generation
+
+
+class AdmissionRejected(Exception):
+    """The provider is saturated; the client should retry after ``retry_after`` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class AdmissionController:
+    """Concurrency cap plus priority wait queue for one provider."""
+
+    def __init__(self, provider: str, max_concurrency: int):
+        self.provider = provider
+        self.max_concurrency = max(max_concurrency, 1)
+        self.active = 0
+        self.cooldown_until = 0.0  # monotonic time before which new calls wait (provider Retry-After)
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._avg_hold = 1.0  # EWMA of slot hold time, for Retry-After estimates
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    def retry_after_estimate(self) -> float:
+        """Rough seconds until a newly queued call would be admitted."""
+        drain = self._avg_hold * (self.queued + 1) / self.max_concurrency
+        return max(drain, self.cooldown_until - time.monotonic())
+
+    async def acquire(self, priority: Priority, timeout: float | None = None) -> None:
+        """Take a slot, queueing by priority. Raises AdmissionRejected after ``timeout`` seconds."""
+        name = priority.name.lower()
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            metrics.observe(f"admission.wait_seconds.{name}", 0.0)
+            return
+
+        metrics.observe(f"admission.queue_depth.{self.provider}", self.queued, DEPTH_BUCKETS)
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+        started = time.monotonic()
+        try:
+            done, _ = await asyncio.wait({fut}, timeout=timeout)
+        except asyncio.CancelledError:
+            self._abandon(fut)
+            raise
+        if not done:
+            self._abandon(fut)
+            metrics.incr(f"admission.{self.provider}.rejected")
+            raise AdmissionRejected(
+                f"LLM provider {self.provider} is busy – {self.queued} requests queued",
+                retry_after=self.retry_after_estimate(),
+            )
+        metrics.observe(f"admission.wait_seconds.{name}", time.monotonic() - started)
+
+    def release(self) -> None:
+        """Return a slot, handing it straight to the highest-priority waiter."""
+        self.active -= 1
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                self.active += 1
+                fut.set_result(None)
+                break
+
+    def _abandon(self, fut: asyncio.Future) -> None:
+        if fut.done() and not fut.cancelled():
+            # The slot was handed over just as we gave up – pass it on.
+            self.release()
+        else:
+            fut.cancel()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, timeout: float | None = None):
+        """Hold a slot for the duration of the block."""
+        await self.acquire(priority, timeout)
+        metrics.incr(f"admission.{self.provider}.admitted")
+        started = time.monotonic()
+        try:
+            delay = self.cooldown_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield
+        finally:
+            held = time.monotonic() - started
+            self._avg_hold += _HOLD_EWMA_ALPHA * (held - self._avg_hold)
+            self.release()
+
+    def cool_down(self, seconds: float) -> None:
+        """Hold back new calls to this provider for ``seconds``."""
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": self.queued,
+            "cooldown_seconds": round(max(self.cooldown_until - time.monotonic(), 0), 1),
+        }
+
+
+_controllers: dict[str, AdmissionController] = {}
+
+
+def get_controller(provider: str) -> AdmissionController:
+    """Return the controller for ``provider``, sized from LLM_MAX_CONCURRENCY."""
+    controller = _controllers.get(provider)
+    if controller is None:
+        controller = _controllers[provider] = AdmissionController(provider, _limit(provider))
+    return controller
+
+
+def _limit(provider: str) -> int:
+    return settings.LLM_MAX_CONCURRENCY.get(provider, settings.LLM_DEFAULT_MAX_CONCURRENCY)
+
+
+def resize() -> None:
+    """Apply a changed LLM_MAX_CONCURRENCY to the controllers already created."""
+    for provider, controller in _controllers.items():
+        controller.max_concurrency = max(_limit(provider), 1)
+
+
+def stats() -> dict[str, dict]:
+    """Current slots and queue length per provider (for GET /metrics)."""
+    return {provider: c.stats() for provider, c in sorted(_controllers.items())}
+
+
+def queue_timeout(priority: Priority) -> float | None:
+    """Queue-time limit for a priority; None means wait indefinitely."""
+    seconds = {
+        Priority.INTERACTIVE: settings.LLM_QUEUE_TIMEOUT_INTERACTIVE,
+        Priority.QUIZ: settings.LLM_QUEUE_TIMEOUT_QUIZ,
+        Priority.BACKGROUND: settings.LLM_QUEUE_TIMEOUT_BACKGROUND,
+    }[priority]
+    return seconds if seconds > 0 else None
+
+
+def _retry_after_header(exc: openai.APIStatusError) -> float | None:
+    """Seconds from a ``retry-after-ms`` / ``retry-after`` header (number or HTTP date)."""
+    headers = exc.response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(exc: openai.APIStatusError, attempt: int) -> tuple[float, bool]:
+    """Delay before the next attempt, and whether the provider asked for it explicitly."""
+    requested = _retry_after_header(exc)
+    if requested is not None:
+        return requested, True
+    delay = min(settings.LLM_BACKOFF_BASE_SECONDS * 2 ** attempt, settings.LLM_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0), False
+
+
+async def _handle_retryable(
+    controller: AdmissionController,
+    exc: openai.APIStatusError,
+    attempt: int,
+) -> None:
+    """Back off after a 429 / 5xx, or raise AdmissionRejected once retrying is pointless."""
+    delay, requested = _backoff(exc, attempt)
+    rate_limited = isinstance(exc, openai.RateLimitError)
+    if rate_limited:
+        metrics.incr(f"admission.{controller.provider}.rate_limited")
+        if requested:
+            controller.cool_down(delay)
+    if attempt >= settings.LLM_MAX_RETRIES or delay > settings.LLM_BACKOFF_MAX_SECONDS:
+        reason = "rate limited" if rate_limited else f"unavailable ({exc.status_code})"
+        raise AdmissionRejected(f"LLM provider {controller.provider} is {reason}", retry_after=delay) from exc
+    metrics.incr(f"admission.{controller.provider}.retries")
+    logger.warning(
+        "LLM provider %s returned %s – retrying in %.1fs (attempt %d/%d)",
+        controller.provider, exc.status_code, delay, attempt + 1, settings.LLM_MAX_RETRIES,
+    )
+    await asyncio.sleep(delay)
+
+
+async def call(provider: str, priority: Priority, fn: Callable[[], Awaitable[T]]) -> T:
+    """Run one upstream call under admission control, retrying 429 / 5xx with backoff."""
+    controller = get_controller(provider)
+    timeout = queue_timeout(priority)
+    attempt = 0
+    while True:
+        try:
+            async with controller.slot(priority, timeout):
+                return await fn()
+        except (openai.RateLimitError, openai.InternalServerError) as exc:
+            await _handle_retryable(controller, exc, attempt)
+            attempt += 1
+
+
+async def stream(
+    provider: str,
+    priority: Priority,
+    open_stream: Callable[[], AsyncIterator[T]],
+) -> AsyncGenerator[T, None]:
+    """Like ``call`` for a streamed response; the slot is held until the stream ends.
+
+    Only failures before the first chunk are retried – a partial answer cannot be.
+    """
+    controller = get_controller(provider)
+    timeout = queue_timeout(priority)
+    attempt = 0
+    while True:
+        started = False
+        try:
+            async with controller.slot(priority, timeout):
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+        except (openai.RateLimitError, openai.InternalServerError) as exc:
+            if started:
+                raise
+            await _handle_retryable(controller, exc, attempt)
+            attempt += 1
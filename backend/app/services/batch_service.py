@@ -0,0 +1,114 @@
+"""Batch generation – lessons or quizzes for a list of topics or a whole unit.
+
+``POST /learn/batch`` and ``POST /quiz/batch`` check every topic against the
+cache first (one query) and answer the hits at once. Misses are generated at
+most BATCH_MAX_CONCURRENCY at a time per request, each with its own DB session,
+at ``Priority.BACKGROUND`` so that students' requests are admitted first. Each
+topic is reported as soon as it finishes, followed by a summary.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.schemas.content import BatchTopics
+from app.schemas.syllabus import TopicDetail
+from app.services import syllabus_service
+from app.services.admission import AdmissionRejected
+from app.services.job_service import failure
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+TopicBuilder = Callable[[AsyncSession, TopicDetail], Awaitable[BaseModel]]
+CacheCheck = Callable[[AsyncSession, list[int]], Awaitable[set[int]]]
+
+
+async def topic_ids(session: AsyncSession, body: BatchTopics) -> list[int] | None:
+    """The requested topic ids without duplicates, in order; None if ``unit_id`` does not exist."""
+    if body.unit_id is not None:
+        return await syllabus_service.list_unit_topic_ids(session, body.unit_id)
+    return list(dict.fromkeys(body.topic_ids))
+
+
+async def _attempt(kind: str, topic: TopicDetail, status: str, build: Callable[[], Awaitable[BaseModel]]) -> dict[str, Any]:
+    try:
+        result = await build()
+    except Exception as exc:
+        if not isinstance(exc, (AdmissionRejected, HTTPException)):
+            logger.exception("Batch %s for topic_id=%d failed", kind, topic.id)
+        return {"type": "topic", "topic_id": topic.id, "status": "failed", "error": failure(exc)}
+    return {"type": "topic", "topic_id": topic.id, "status": status, "result": result.model_dump(mode="json")}
+
+
+async def run(
+    kind: str,
+    topic_ids: list[int],
+    build: TopicBuilder,
+    cached_ids: CacheCheck | None,
+) -> AsyncGenerator[dict[str, Any], None]:
+    """Yield one ``topic`` item per topic as it finishes – cached ones first – then a ``summary``.
+
+    ``cached_ids`` returns the topics that ``build`` can answer from the cache
+    (None: treat every topic as a miss, e.g. on refresh). Stopping the iteration
+    cancels the generations still running.
+    """
+    started = time.monotonic()
+    counts = {"cached": 0, "generated": 0, "failed": 0}
+
+    async with async_session() as session:
+        topics = await syllabus_service.get_topic_details(session, topic_ids)
+        cached = await cached_ids(session, list(topics)) if cached_ids is not None and topics else set()
+        for topic_id in topic_ids:
+            if topic_id not in topics:
+                counts["failed"] += 1
+                yield {
+                    "type": "topic", "topic_id": topic_id, "status": "failed",
+                    "error": {"status_code": 404, "detail": "Topic not found"},
+                }
+            elif topic_id in cached:
+                item = await _attempt(kind, topics[topic_id], "cached", lambda: build(session, topics[topic_id]))
+                counts[item["status"]] += 1
+                yield item
+
+    slots = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+
+    async def generate(topic: TopicDetail) -> dict[str, Any]:
+        async with slots:
+            async with async_session() as job_session:
+                return await _attempt(kind, topic, "generated", lambda: build(job_session, topic))
+
+    pending = {
+        asyncio.create_task(generate(topics[topic_id]))
+        for topic_id in topic_ids
+        if topic_id in topics and topic_id not in cached
+    }
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = task.result()
+                counts[item["status"]] += 1
+                yield item
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    elapsed = time.monotonic() - started
+    for status, n in counts.items():
+        metrics.incr(f"batch.{kind}.{status}", n)
+    metrics.observe(f"batch.{kind}.seconds", elapsed)
+    logger.info(
+        "Batch %s: %d topics, %d cached, %d generated, %d failed in %.1f s",
+        kind, len(topic_ids), counts["cached"], counts["generated"], counts["failed"], elapsed,
+    )
+    yield {"type": "summary", "topics": len(topic_ids), **counts, "elapsed_ms": round(elapsed * 1000)}
@@ -0,0 +1,108 @@
+"""In-process LRU cache with TTL, plus generation cache-key helpers."""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.config import settings
+from app.services.prompt_templates import PROMPT_VERSION
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after ``ttl_seconds``.
+
+    Not thread-safe; intended for use from a single asyncio event loop.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any | None:
+        """Return the cached value, or None if missing / expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Insert or replace a value, evicting the least recently used entry if full."""
+        if self.max_entries <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def make_key(*parts: Any) -> str:
+    """Hash arbitrary JSON-serialisable parts into a stable 64-char hex key."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def normalise_focus_areas(focus_areas: list[str] | None) -> list[str]:
+    """Lower-case, de-duplicate and sort focus areas so equivalent requests share a key."""
+    return sorted({f.strip().lower() for f in (focus_areas or []) if f and f.strip()})
+
+
+def lesson_cache_key(
+    topic_id: int,
+    sub_topic_id: int | None,
+    user_level: str,
+    focus_areas: list[str] | None,
+    include_code: bool,
+    include_quiz: bool,
+    model: str | None = None,
+) -> str:
+    """Cache key covering everything that influences a generated lesson."""
+    return make_key(
+        "lesson",
+        topic_id,
+        sub_topic_id,
+        user_level.strip().lower(),
+        normalise_focus_areas(focus_areas),
+        include_code,
+        include_quiz,
+        model or settings.tier_model(settings.endpoint_tier("lesson"), settings.LLM_PROVIDER),
+        PROMPT_VERSION,
+    )
+
+
+def quiz_cache_key(
+    topic_id: int,
+    difficulty: str,
+    model: str | None = None,
+) -> str:
+    """Key of the quiz-bank batches generated for a topic and difficulty."""
+    return make_key(
+        "quiz",
+        topic_id,
+        difficulty.strip().lower(),
+        model or settings.tier_model(settings.endpoint_tier("quiz"), settings.LLM_PROVIDER),
+        PROMPT_VERSION,
+    )
+
+
+# Shared in-process cache for finished lessons and quizzes (sits in front of Postgres).
+lesson_cache = TTLCache(
+    max_entries=settings.LESSON_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LESSON_CACHE_TTL_SECONDS,
+)
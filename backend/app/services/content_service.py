@@ -1,12 +1,14 @@
 """Content service – save & retrieve LLM-generated content from Postgres."""
 
 import logging
+from datetime import datetime
 from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.content import GeneratedContent
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -17,13 +19,24 @@ async def save_content(
     content_type: str,
     content_json: dict[str, Any],
     model_used: str | None = None,
+    cache_key: str | None = None,
+    usage: dict[str, Any] | None = None,
 ) -> GeneratedContent:
-    """Persist generated content to the database."""
+    """Persist generated content to the database, with the LLM call's ``usage`` accounting if known."""
+    usage = usage or {}
     record = GeneratedContent(
         topic_id=topic_id,
         content_type=content_type,
         content_json=content_json,
         model_used=model_used,
+        cache_key=cache_key,
+        provider=usage.get("provider"),
+        endpoint=usage.get("endpoint"),
+        prompt_tokens=usage.get("prompt_tokens"),
+        completion_tokens=usage.get("completion_tokens"),
+        estimated_tokens=usage.get("estimated_tokens"),
+        ttft_ms=metrics.ms(usage.get("ttft_seconds")),
+        latency_ms=metrics.ms(usage.get("latency_seconds")),
     )
     session.add(record)
     await session.commit()
@@ -51,6 +64,49 @@ async def get_cached_content(
     return result.scalars().first()
 
 
+async def get_content_by_key(
+    session: AsyncSession,
+    cache_key: str,
+) -> GeneratedContent | None:
+    """Retrieve the most recent content generated for an exact cache key."""
+    stmt = (
+        select(GeneratedContent)
+        .where(GeneratedContent.cache_key == cache_key)
+        .order_by(GeneratedContent.created_at.desc())
+        .limit(1)
+    )
+    result = await session.execute(stmt)
+    return result.scalars().first()
+
+
+async def list_content_by_key(
+    session: AsyncSession,
+    cache_key: str,
+    limit: int,
+) -> list[GeneratedContent]:
+    """Return the newest ``limit`` rows stored under a cache key, newest first."""
+    stmt = (
+        select(GeneratedContent)
+        .where(GeneratedContent.cache_key == cache_key)
+        .order_by(GeneratedContent.created_at.desc())
+        .limit(limit)
+    )
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def existing_cache_keys(
+    session: AsyncSession,
+    cache_keys: list[str],
+) -> set[str]:
+    """Return the subset of ``cache_keys`` that already have stored content."""
+    if not cache_keys:
+        return set()
+    stmt = select(GeneratedContent.cache_key).where(GeneratedContent.cache_key.in_(cache_keys)).distinct()
+    result = await session.execute(stmt)
+    return set(result.scalars().all())
+
+
 async def list_content_for_topic(
     session: AsyncSession,
     topic_id: int,
@@ -63,3 +119,49 @@ async def list_content_for_topic(
     )
     result = await session.execute(stmt)
     return list(result.scalars().all())
+
+
+async def usage_summary(session: AsyncSession, since: datetime) -> dict[str, list[dict]]:
+    """Token and latency totals of content generated since ``since``, per endpoint and per model."""
+    summary = {}
+    for name, column in (("by_endpoint", GeneratedContent.endpoint), ("by_model", GeneratedContent.model_used)):
+        stmt = (
+            select(
+                column,
+                func.count(GeneratedContent.id),
+                func.sum(GeneratedContent.prompt_tokens),
+                func.sum(GeneratedContent.completion_tokens),
+                func.avg(GeneratedContent.latency_ms),
+                func.percentile_cont(0.95).within_group(GeneratedContent.latency_ms),
+                func.avg(GeneratedContent.ttft_ms),
+                # Generation time of the rows that reported completion tokens, for tokens per second.
+                func.sum(GeneratedContent.latency_ms - func.coalesce(GeneratedContent.ttft_ms, 0))
+                .filter(GeneratedContent.completion_tokens.is_not(None)),
+                # Actual vs. estimated output, over the rows that have both.
+                func.sum(GeneratedContent.completion_tokens).filter(GeneratedContent.estimated_tokens.is_not(None)),
+                func.sum(GeneratedContent.estimated_tokens).filter(GeneratedContent.completion_tokens.is_not(None)),
+            )
+            .where(GeneratedContent.created_at >= since, GeneratedContent.latency_ms.is_not(None))
+            .group_by(column)
+            .order_by(column)
+        )
+        rows = (await session.execute(stmt)).all()
+        summary[name] = [
+            {
+                name.removeprefix("by_"): key,
+                "generations": count,
+                "prompt_tokens": prompt or 0,
+                "completion_tokens": completion or 0,
+                "latency_avg_ms": _round(latency_avg),
+                "latency_p95_ms": _round(latency_p95),
+                "ttft_avg_ms": _round(ttft_avg),
+                "tokens_per_second": round(completion * 1000 / ms, 1) if completion and ms else None,
+                "completion_vs_estimate": round(actual / estimated, 2) if actual and estimated else None,
+            }
+            for key, count, prompt, completion, latency_avg, latency_p95, ttft_avg, ms, actual, estimated in rows
+        ]
+    return summary
+
+
+def _round(value: Any) -> int | None:
+    return round(float(value)) if value is not None else None
@@ -0,0 +1,255 @@
+"""Deterministic fake LLM – an OpenAI-compatible chat completions backend without a model.
+
+Used as provider ``fake`` (``LLM_PROVIDER=fake``), where the registry mounts
+FakeLLMTransport under the provider's httpx client, and by the standalone
+``fake_llm_server.py``. Both go through the real ChatOpenAI / admission /
+router code, so the whole API can be load-tested offline.
+
+Answers follow the prompt: a lesson covers the sub-topics of the (section)
+prompt with the requested number of quiz questions and code examples, a quiz
+has the requested number of questions, a follow-up answers the question. The
+text depends only on the prompt and FAKE_LLM_SEED. Timing and failures are
+configurable: FAKE_LLM_TTFT_SECONDS, FAKE_LLM_TOKENS_PER_SECOND,
+FAKE_LLM_ERROR_RATE (answered with FAKE_LLM_ERROR_STATUS) and
+FAKE_LLM_TRUNCATION_RATE (stopped half-way with finish_reason "length").
+Responses are also cut at the request's max_tokens; continuation requests
+get the rest of the same answer.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+import httpx
+
+from app.config import settings
+from app.services.prompt_templates import CONTINUATION_PROMPT, MORE_CONTEXT_SYSTEM_PROMPT, QUIZ_SYSTEM_PROMPT
+from app.utils.context_packer import CHARS_PER_TOKEN, estimate_tokens
+
+_CHUNK_TOKENS = 4  # tokens per streamed chunk
+
+_SENTENCES = [
+    "{s} is easiest to understand by starting from a concrete example.",
+    "In practice, {s} shows up whenever a model has to trade accuracy against cost.",
+    "A common mistake with {s} is to apply it without checking its assumptions first.",
+    "The key idea behind {s} can be written down in a few lines of code.",
+    "Compared with the naive approach, {s} scales much better on large datasets.",
+    "When debugging {s}, print intermediate values and compare them with a hand calculation.",
+    "Most libraries implement {s} for you, but knowing the details helps when results look wrong.",
+    "{s} builds directly on the concepts introduced earlier in this unit.",
+]
+
+_rng = random.Random(settings.FAKE_LLM_SEED)  # error / truncation draws, one per request
+
+
+@dataclass
+class FakeReply:
+    """One response: its text, why it stopped and its token counts."""
+
+    text: str
+    finish_reason: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+def _prompt_rng(messages: list[dict]) -> random.Random:
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+    return random.Random(f"{settings.FAKE_LLM_SEED}:{digest}")
+
+
+def _bullets(text: str) -> list[str]:
+    return [line[4:].strip() for line in text.splitlines() if line.startswith("  - ")]
+
+
+def _count(pattern: str, text: str, default: int) -> int:
+    match = re.search(pattern, text)
+    return int(match.group(1)) if match else default
+
+
+def _paragraphs(rng: random.Random, subject: str, count: int) -> str:
+    return "\n\n".join(
+        " ".join(rng.choice(_SENTENCES).format(s=subject) for _ in range(4)) for _ in range(count)
+    )
+
+
+def _question(rng: random.Random, subject: str, n: int) -> dict:
+    correct = rng.randrange(4)
+    return {
+        "question": f"Question {n + 1}: which statement about {subject} is correct?",
+        "options": [
+            f"Statement {'ABCD'[i]} about {subject}" + (" (correct)" if i == correct else "") for i in range(4)
+        ],
+        "correct_index": correct,
+        "explanation": f"Option {'ABCD'[correct]} is correct; the others misstate how {subject} works.",
+    }
+
+
+def _code(subject: str, n: int) -> dict:
+    name = re.sub(r"\W+", "_", subject.lower()).strip("_") or "example"
+    return {
+        "language": "python",
+        "code": f"def {name}_example_{n + 1}(data):\n    # {subject}\n    return [x * 2 for x in data]\n",
+        "explanation": f"Example {n + 1} of {subject}.",
+    }
+
+
+def _lesson(prompt: str, rng: random.Random) -> dict:
+    taught = _bullets(prompt.split("Teach me ONLY this part", 1)[1]) if "Teach me ONLY this part" in prompt else []
+    sub_topics = taught or _bullets(prompt) or ["the topic"]
+    quiz_per = _count(r"generate (\d+) questions per sub-topic", prompt, 0)
+    code_per = _count(r"Include about (\d+) code examples per sub-topic", prompt, 0)
+    lesson = {
+        "explanation": "\n\n".join(f"## {s}\n\n{_paragraphs(rng, s, 3)}" for s in sub_topics),
+        "key_points": [f"{s}: {rng.choice(_SENTENCES).format(s='it')}" for s in sub_topics],
+        "code_examples": [_code(s, i) for s in sub_topics for i in range(code_per)],
+        "math_formulas": ["$\\hat{y} = w^T x + b$"],
+        "quiz": [_question(rng, s, i) for s in sub_topics for i in range(quiz_per)],
+        "further_reading": [f"Further reading on {s}" for s in sub_topics[:3]],
+    }
+    if "NO code examples" in prompt:
+        del lesson["code_examples"]
+    if "NO quiz" in prompt:
+        del lesson["quiz"]
+    return lesson
+
+
+def _quiz(prompt: str, rng: random.Random) -> dict:
+    sub_topics = _bullets(prompt) or ["the topic"]
+    count = _count(r"Generate (\d+) multiple-choice questions", prompt, 5)
+    return {
+        "questions": [
+            {**_question(rng, sub_topics[i % len(sub_topics)], i), "sub_topic": sub_topics[i % len(sub_topics)]}
+            for i in range(count)
+        ]
+    }
+
+
+def _more_context(prompt: str, rng: random.Random) -> dict:
+    match = re.search(r'The student asks: "(.*)"', prompt)
+    subject = match.group(1).rstrip("?") if match else "this topic"
+    return {
+        "explanation": f"## {subject}\n\n{_paragraphs(rng, subject, 4)}",
+        "code_examples": [_code(subject, 0)],
+    }
+
+
+def answer(messages: list[dict]) -> str:
+    """The complete answer to a conversation (a continuation gets the answer to its original request)."""
+    if messages[-1]["content"] == CONTINUATION_PROMPT:
+        messages = messages[:-2]
+    system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+    prompt = messages[-1]["content"]
+    rng = _prompt_rng(messages)
+    if system == QUIZ_SYSTEM_PROMPT:
+        content = _quiz(prompt, rng)
+    elif system == MORE_CONTEXT_SYSTEM_PROMPT:
+        content = _more_context(prompt, rng)
+    else:
+        content = _lesson(prompt, rng)
+    return json.dumps(content)
+
+
+def reply(body: dict) -> FakeReply:
+    """The reply to one chat completions request, before timing and errors."""
+    messages = body["messages"]
+    full = answer(messages)
+    continuing = messages[-1]["content"] == CONTINUATION_PROMPT
+    text = full[len(messages[-2]["content"]):] if continuing else full
+    finish_reason = "stop"
+    if not continuing and _rng.random() < settings.FAKE_LLM_TRUNCATION_RATE:
+        text, finish_reason = text[: len(text) // 2], "length"
+    max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+    if max_tokens and estimate_tokens(text) > max_tokens:
+        text, finish_reason = text[: max_tokens * CHARS_PER_TOKEN], "length"
+    prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+    return FakeReply(text, finish_reason, prompt_tokens, estimate_tokens(text))
+
+
+def error() -> tuple[int, dict, dict] | None:
+    """(status, headers, body) of an injected failure, or None – drawn once per request."""
+    if _rng.random() >= settings.FAKE_LLM_ERROR_RATE:
+        return None
+    status = settings.FAKE_LLM_ERROR_STATUS
+    headers = {"retry-after": "1"} if status == 429 else {}
+    return status, headers, {"error": {"message": f"fake provider error ({status})", "type": "fake_error"}}
+
+
+def _usage(r: FakeReply) -> dict:
+    return {
+        "prompt_tokens": r.prompt_tokens,
+        "completion_tokens": r.completion_tokens,
+        "total_tokens": r.prompt_tokens + r.completion_tokens,
+    }
+
+
+async def completion(body: dict) -> dict:
+    """A non-streaming ``chat.completion``, returned after TTFT plus generation time."""
+    r = reply(body)
+    await asyncio.sleep(settings.FAKE_LLM_TTFT_SECONDS + r.completion_tokens / settings.FAKE_LLM_TOKENS_PER_SECOND)
+    return {
+        "id": f"fake-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", settings.FAKE_LLM_MODEL),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": r.text},
+            "finish_reason": r.finish_reason,
+        }],
+        "usage": _usage(r),
+    }
+
+
+async def stream(body: dict) -> AsyncIterator[bytes]:
+    """Server-sent ``chat.completion.chunk`` events paced at FAKE_LLM_TOKENS_PER_SECOND."""
+    r = reply(body)
+    base = {"id": f"fake-{time.time_ns()}", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": body.get("model", settings.FAKE_LLM_MODEL)}
+
+    def event(choices: list, **extra) -> bytes:
+        return f"data: {json.dumps({**base, 'choices': choices, **extra})}\n\n".encode()
+
+    await asyncio.sleep(settings.FAKE_LLM_TTFT_SECONDS)
+    step = _CHUNK_TOKENS * CHARS_PER_TOKEN
+    for i in range(0, len(r.text), step):
+        if i:
+            await asyncio.sleep(_CHUNK_TOKENS / settings.FAKE_LLM_TOKENS_PER_SECOND)
+        delta = {"content": r.text[i:i + step], **({"role": "assistant"} if i == 0 else {})}
+        yield event([{"index": 0, "delta": delta, "finish_reason": None}])
+    yield event([{"index": 0, "delta": {}, "finish_reason": r.finish_reason}])
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield event([], usage=_usage(r))
+    yield b"data: [DONE]\n\n"
+
+
+class _EventStream(httpx.AsyncByteStream):
+    def __init__(self, events: AsyncIterator[bytes]):
+        self._events = events
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for event in self._events:
+            yield event
+
+    async def aclose(self) -> None:
+        await self._events.aclose()
+
+
+class FakeLLMTransport(httpx.AsyncBaseTransport):
+    """httpx transport that answers ``POST .../chat/completions`` in process."""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(404, json={"error": {"message": f"no fake route for {request.url.path}"}})
+        body = json.loads(await request.aread())
+        failure = error()
+        if failure is not None:
+            status, headers, payload = failure
+            return httpx.Response(status, headers=headers, json=payload)
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=_EventStream(stream(body)))
+        return httpx.Response(200, json=await completion(body))
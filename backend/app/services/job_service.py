@@ -0,0 +1,121 @@
+"""Job runner for asynchronous generations – ``POST /learn|/quiz/{topic_id}?async=true``.
+
+The request returns 202 with a job id at once; the generation runs in a
+background task with its own DB session, at most JOB_MAX_CONCURRENCY at a
+time, so no request, session or worker slot is held open while the LLM works.
+Results and failures go to the job store (JOB_STORE), from where
+``GET /jobs/{id}`` and ``GET /jobs/{id}/events`` report them.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import Any
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.services.admission import AdmissionRejected
+from app.services.job_store import Job, JobStore, create_job_store
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+JobRunner = Callable[[AsyncSession], Awaitable[BaseModel | dict]]
+
+_store: JobStore | None = None
+_slots: asyncio.Semaphore | None = None
+_tasks: dict[str, asyncio.Task] = {}
+
+
+def get_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = create_job_store(settings.JOB_STORE, settings.JOB_STORE_MAX_ENTRIES, settings.JOB_RESULT_TTL_SECONDS)
+    return _store
+
+
+async def submit(kind: str, topic_id: int, run: JobRunner) -> Job:
+    """Store a queued job and start it in the background; ``run`` gets a fresh DB session."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.JOB_MAX_CONCURRENCY)
+    job = Job(kind=kind, topic_id=topic_id)
+    await get_store().put(job)
+    metrics.incr(f"jobs.{kind}.submitted")
+    task = asyncio.create_task(_run(job, run))
+    _tasks[job.id] = task
+    task.add_done_callback(lambda _: _tasks.pop(job.id, None))
+    return job
+
+
+async def _run(job: Job, run: JobRunner) -> None:
+    store = get_store()
+    try:
+        async with _slots:
+            job.status, job.started_at = "running", time.time()
+            metrics.observe("jobs.queue_seconds", job.started_at - job.created_at)
+            await store.put(job)
+            async with async_session() as session:
+                result = await run(session)
+            job.result = result.model_dump(mode="json") if isinstance(result, BaseModel) else result
+            job.status = "succeeded"
+    except asyncio.CancelledError:
+        job.status, job.error = "cancelled", {"status_code": 503, "detail": "Server shutting down"}
+        raise
+    except Exception as exc:
+        if not isinstance(exc, (AdmissionRejected, HTTPException)):
+            logger.exception("%s job %s for topic_id=%d failed", job.kind, job.id, job.topic_id)
+        job.status, job.error = "failed", failure(exc)
+    finally:
+        job.finished_at = time.time()
+        metrics.incr(f"jobs.{job.kind}.{job.status}")
+        if job.started_at is not None:
+            metrics.observe("jobs.run_seconds", job.finished_at - job.started_at)
+        await store.put(job)
+
+
+def failure(exc: Exception) -> dict[str, Any]:
+    """The error reported for a failed generation: its HTTP status, detail and, for 503, retry_after."""
+    if isinstance(exc, AdmissionRejected):
+        return {"status_code": 503, "detail": str(exc), "retry_after": exc.retry_after}
+    if isinstance(exc, HTTPException):
+        return {"status_code": exc.status_code, "detail": exc.detail}
+    return {"status_code": 500, "detail": "Generation failed"}
+
+
+async def get_job(job_id: str) -> Job | None:
+    return await get_store().get(job_id)
+
+
+async def watch(job_id: str, heartbeat_seconds: float) -> AsyncGenerator[Job | None, None]:
+    """Yield the job now and after every change until it finishes; None after ``heartbeat_seconds`` idle (never if <= 0)."""
+    store = get_store()
+    job = await store.get(job_id)
+    version = -1
+    while job is not None:
+        if job.version > version:
+            version = job.version
+            yield job
+            if job.finished:
+                return
+        else:
+            yield None
+        job = await store.wait(job_id, version, heartbeat_seconds)
+
+
+async def cancel_all() -> int:
+    """Cancel running jobs on shutdown; returns how many were cancelled."""
+    tasks = list(_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return len(tasks)
+
+
+def stats() -> dict[str, Any]:
+    return {**get_store().stats(), "in_flight": len(_tasks)}
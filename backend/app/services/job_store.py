@@ -0,0 +1,132 @@
+"""Job stores for asynchronous generations (``?async=true``) – where job state lives.
+
+A store keeps ``Job`` records and lets a caller wait for the next change of
+one, which backs both ``GET /jobs/{id}`` and the completion SSE stream. The
+interface is async and jobs serialise with ``to_dict`` / ``from_dict``, so a
+shared store (e.g. Redis with pub/sub for ``wait``) can replace the in-process
+one without touching the job runner or the routers. JOB_STORE selects it.
+"""
+
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+@dataclass
+class Job:
+    """One generation job. ``version`` increases with every stored change."""
+
+    kind: str  # lesson | quiz
+    topic_id: int
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued | running | succeeded | failed | cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    result: dict | None = None
+    error: dict | None = None  # {"status_code", "detail", "retry_after"?}
+    version: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Job":
+        return cls(**data)
+
+
+class JobStore(ABC):
+    """Storage for jobs; implementations must be safe for concurrent use by one event loop."""
+
+    @abstractmethod
+    async def put(self, job: Job) -> None:
+        """Store a new or changed job (bumping its version) and wake its waiters."""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Job | None:
+        """The job's current state, or None if unknown or expired."""
+
+    @abstractmethod
+    async def wait(self, job_id: str, version: int, timeout: float) -> Job | None:
+        """Return the job once its version exceeds ``version``, or its current state after ``timeout``.
+
+        A ``timeout`` <= 0 waits without a limit, as SSE_HEARTBEAT_SECONDS=0 disables heartbeats.
+        """
+
+    @abstractmethod
+    def stats(self) -> dict[str, Any]:
+        ...
+
+
+class InMemoryJobStore(JobStore):
+    """Jobs in this worker's memory: finished jobs expire after ``ttl_seconds``, oldest first beyond ``max_entries``.
+
+    Only the worker that accepted a job can report it – run one worker, or use a shared store.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._finished: OrderedDict[str, float] = OrderedDict()  # job id -> finished_at, in finishing order
+        self._changed: dict[str, asyncio.Event] = {}
+
+    async def put(self, job: Job) -> None:
+        job.version += 1
+        self._jobs[job.id] = Job.from_dict(job.to_dict())  # a snapshot, as a remote store would keep
+        if job.finished and job.id not in self._finished:
+            self._finished[job.id] = job.finished_at
+        self._prune()
+        changed = self._changed.pop(job.id, None)
+        if changed is not None:
+            changed.set()
+
+    async def get(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        return Job.from_dict(job.to_dict()) if job is not None else None
+
+    async def wait(self, job_id: str, version: int, timeout: float) -> Job | None:
+        job = self._jobs.get(job_id)
+        if job is not None and job.version <= version:
+            changed = self._changed.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(changed.wait(), timeout if timeout > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+        return await self.get(job_id)
+
+    def _prune(self) -> None:
+        """Drop expired finished jobs, then the oldest finished ones while over ``max_entries``.
+
+        Jobs finish in ``finished_at`` order, so both are popped from the front of ``_finished``.
+        """
+        expired_before = time.time() - self.ttl_seconds
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if finished_at >= expired_before and len(self._jobs) <= self.max_entries:
+                break
+            del self._finished[job_id]
+            del self._jobs[job_id]
+
+    def stats(self) -> dict[str, Any]:
+        counts: dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"store": "memory", "jobs": len(self._jobs), **counts}
+
+
+def create_job_store(kind: str, max_entries: int, ttl_seconds: float) -> JobStore:
+    """Build the store named by JOB_STORE."""
+    if kind == "memory":
+        return InMemoryJobStore(max_entries, ttl_seconds)
+    raise ValueError(f"Unknown JOB_STORE {kind!r} (supported: memory)")
@@ -0,0 +1,236 @@
+"""Lesson service – read-through cache (memory → Postgres → LLM) for generated lessons."""
+
+import asyncio
+import copy
+import logging
+from collections.abc import AsyncGenerator, AsyncIterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.schemas.content import LearnRequest
+from app.schemas.syllabus import TopicDetail
+from app.services import content_service
+from app.services.admission import Priority
+from app.services.cache_service import lesson_cache, lesson_cache_key
+from app.services.llm_service import generate_lesson, generate_lesson_fanout, stream_lesson
+from app.services.stream_hub import BroadcastStream, lesson_stream_hub
+from app.utils import metrics
+from app.utils.json_stream import parse_json_object
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Strong references to fire-and-forget save tasks until they finish.
+_background_tasks: set[asyncio.Task] = set()
+
+_lesson_misses = SingleFlight("lesson_miss_singleflight")
+
+
+async def get_cached_lesson(session: AsyncSession, key: str) -> dict | None:
+    """Look a lesson up in the in-process LRU, then Postgres. Counts hits and misses."""
+    cached = lesson_cache.get(key)
+    if cached is not None:
+        metrics.incr("lesson_cache.memory_hits")
+        return cached
+
+    record = await content_service.get_content_by_key(session, key)
+    if record is not None:
+        metrics.incr("lesson_cache.db_hits")
+        lesson_cache.set(key, record.content_json)
+        return record.content_json
+
+    metrics.incr("lesson_cache.misses")
+    return None
+
+
+def select_sub_topics(topic: TopicDetail, sub_topic_id: int | None) -> list[str]:
+    """Return the sub-topic texts to teach – all of them, or only the focused one."""
+    if sub_topic_id is not None:
+        focused = next((s for s in topic.sub_topics if s.id == sub_topic_id), None)
+        if focused:
+            return [focused.content]
+    return [s.content for s in topic.sub_topics]
+
+
+async def get_or_generate_lesson(
+    session: AsyncSession,
+    topic: TopicDetail,
+    body: LearnRequest,
+    refresh: bool = False,
+    priority: Priority = Priority.INTERACTIVE,
+) -> dict:
+    """Return the lesson JSON for this generation context, generating it only on a miss.
+
+    Lookup order: in-process LRU, then ``generated_contents`` by cache key, then the LLM.
+    ``refresh=True`` skips both caches and stores a newly generated lesson.
+    Topics with several sub-topics are generated section by section when
+    fan-out is enabled (``body.fanout`` or LESSON_FANOUT_ENABLED).
+    ``priority`` orders the LLM call in the provider's admission queue.
+    """
+    key = request_cache_key(topic.id, body)
+
+    if refresh:
+        metrics.incr("lesson_cache.refreshes")
+    else:
+        cached = await get_cached_lesson(session, key)
+        if cached is not None:
+            return cached
+
+    # Concurrent misses for one key and priority share a single generate + save; each caller gets its own copy.
+    # Keyed by priority too, so a student request never waits in a pre-generation job's queue.
+    result = await _lesson_misses.do(f"{priority.name}:{key}", lambda: _generate_and_store(topic, body, key, priority))
+    return copy.deepcopy(result)
+
+
+async def _generate_and_store(topic: TopicDetail, body: LearnRequest, key: str, priority: Priority) -> dict:
+    """Generate the lesson, save it with its usage accounting and put it in the LRU.
+
+    Runs once per key however many callers are waiting, with its own DB session
+    since the caller that started it may leave before it finishes. A lesson
+    marked ``truncated`` is returned without being saved or cached. A lesson
+    served by another model than the primary one (SLO downgrade, provider
+    failover) is saved under that model's key and not put in the LRU.
+    """
+    sub_topics = select_sub_topics(topic, body.sub_topic_id)
+    fanout = body.fanout if body.fanout is not None else settings.LESSON_FANOUT_ENABLED
+    generate = generate_lesson_fanout if fanout and len(sub_topics) > 1 else generate_lesson
+    result = dict(await generate(
+        main_topic=topic.main_topic_name,
+        unit_name=topic.unit_name,
+        topic_title=topic.title,
+        sub_topics=sub_topics,
+        user_level=body.user_level,
+        focus_areas=body.focus_areas,
+        include_code=body.include_code,
+        include_quiz=body.include_quiz,
+        priority=priority,
+    ))
+    # Token / latency accounting is saved in its own columns, not in the lesson.
+    usage = result.pop("usage", None)
+    if result.get("truncated"):
+        # Cut off at max_tokens and repaired: served once, but the next request generates it again.
+        metrics.incr("lesson_cache.truncated_not_cached")
+        logger.warning("Lesson for topic_id=%d was truncated – not cached", topic.id)
+        return result
+    served_key = request_cache_key(topic.id, body, result.get("model_used"))
+    async with async_session() as session:
+        await content_service.save_content(
+            session=session,
+            topic_id=topic.id,
+            content_type="lesson",
+            content_json=result,
+            model_used=result.get("model_used", settings.LLM_MODEL),
+            cache_key=served_key,
+            usage=usage,
+        )
+    if served_key == key:
+        lesson_cache.set(key, result)
+    else:
+        metrics.incr("lesson_cache.fallback_not_cached")
+        logger.info("Lesson for topic_id=%d served by %s – not cached for the primary model", topic.id, result["model_used"])
+    return result
+
+
+def request_cache_key(topic_id: int, body: LearnRequest, model: str | None = None) -> str:
+    """Cache key of the lesson ``body`` asks for (from the primary model unless ``model`` is given)."""
+    return lesson_cache_key(
+        topic_id=topic_id,
+        sub_topic_id=body.sub_topic_id,
+        user_level=body.user_level,
+        focus_areas=body.focus_areas,
+        include_code=body.include_code,
+        include_quiz=body.include_quiz,
+        model=model,
+    )
+
+
+async def cached_topic_ids(session: AsyncSession, topic_ids: list[int], body: LearnRequest) -> set[int]:
+    """The topics whose lesson for ``body`` is already in the in-process LRU or Postgres (one query)."""
+    keys = {request_cache_key(topic_id, body): topic_id for topic_id in topic_ids}
+    in_memory = {key for key in keys if lesson_cache.get(key) is not None}
+    stored = await content_service.existing_cache_keys(session, [key for key in keys if key not in in_memory])
+    return {keys[key] for key in in_memory | stored}
+
+
+def stream_cache_key(topic_id: int, user_level: str, model: str | None = None) -> str:
+    """Cache key of a streamed lesson (whole topic, default include flags, no focus areas)."""
+    return lesson_cache_key(topic_id, None, user_level, [], include_code=True, include_quiz=True, model=model)
+
+
+def open_lesson_stream(topic: TopicDetail, user_level: str, key: str, fresh: bool = False) -> BroadcastStream:
+    """Join (or start) the shared upstream token stream for this lesson; ``fresh`` never replays a finished one."""
+
+    def start() -> AsyncIterator[str]:
+        usage: dict = {}
+        return _persist_on_completion(
+            stream_lesson(
+                main_topic=topic.main_topic_name,
+                unit_name=topic.unit_name,
+                topic_title=topic.title,
+                sub_topics=[s.content for s in topic.sub_topics],
+                user_level=user_level,
+                on_usage=lambda u: usage.update(u.to_dict()),
+            ),
+            topic_id=topic.id,
+            user_level=user_level,
+            key=key,
+            usage=usage,
+        )
+
+    return lesson_stream_hub.join(key, start, fresh=fresh)
+
+
+async def _persist_on_completion(
+    tokens: AsyncIterator[str],
+    topic_id: int,
+    user_level: str,
+    key: str,
+    usage: dict | None = None,
+) -> AsyncGenerator[str, None]:
+    """Pass tokens through, then save the lesson once the stream finishes successfully.
+
+    Runs inside the hub's producer task, so it completes even if the viewer
+    who started the stream has left; a cancelled stream is never saved.
+    ``usage`` is filled in by the LLM stream when it finishes. A lesson from
+    another model than the primary one is saved under that model's key.
+    """
+    parts: list[str] = []
+    async for chunk in tokens:
+        parts.append(chunk)
+        yield chunk
+
+    lesson = parse_json_object("".join(parts))
+    if lesson is None or not lesson.get("explanation"):
+        logger.warning("Streamed lesson for topic_id=%d was not valid JSON – not cached", topic_id)
+        return
+    lesson["model_used"] = (usage or {}).get("model", settings.LLM_MODEL)
+    lesson["model_tier"] = (usage or {}).get("tier")
+    served_key = stream_cache_key(topic_id, user_level, lesson["model_used"])
+    if served_key == key:
+        lesson_cache.set(key, lesson)
+    else:
+        metrics.incr("lesson_cache.fallback_not_cached")
+    # Save in the background so viewers get their final event without waiting on Postgres.
+    task = asyncio.create_task(_save_streamed_lesson(topic_id, served_key, lesson, usage))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _save_streamed_lesson(topic_id: int, key: str, lesson: dict, usage: dict | None) -> None:
+    try:
+        async with async_session() as session:
+            await content_service.save_content(
+                session=session,
+                topic_id=topic_id,
+                content_type="lesson",
+                content_json=lesson,
+                model_used=lesson["model_used"],
+                cache_key=key,
+                usage=usage,
+            )
+    except Exception:
+        logger.exception("Failed to save streamed lesson for topic_id=%d", topic_id)
+        return
+    metrics.incr("lesson_cache.streams_saved")
@@ -0,0 +1,154 @@
+"""Record / replay of LLM traffic – reproducible, offline benchmarks of prompt and parsing changes.
+
+CassetteTransport sits under a provider's pooled httpx client (see
+llm_clients), below ChatOpenAI, so lessons, quizzes, follow-ups and streams
+are all covered without changes to llm_service. Modes (LLM_CASSETTE_MODE):
+
+- ``record``: forward every chat completions request and save each successful
+  response in its own cassette, with the response time or, for streams, the
+  time offset of every chunk.
+- ``replay``: serve responses from cassettes with their original timing
+  scaled by LLM_CASSETTE_TIME_SCALE (0 = instant). A request without a
+  cassette fails with 404 instead of reaching the provider.
+- ``auto``: replay what has been recorded, record the rest.
+
+Cassettes are content-addressed: ``<LLM_CASSETTE_DIR>/<sha256 of the request
+body>.json.gz``. The model name is left out of the hash, so traffic recorded
+on one provider replays under any other.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import httpx
+
+from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay", "auto")
+_UNKEYED = ("model", "stream_options")  # do not change what the model is asked to generate
+
+
+def cassette_key(body: dict) -> str:
+    """Content address of a chat completions request."""
+    keyed = {k: v for k, v in body.items() if k not in _UNKEYED}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def cassette_path(key: str) -> Path:
+    return Path(settings.LLM_CASSETTE_DIR_RESOLVED) / f"{key}.json.gz"
+
+
+def _write(path: Path, cassette: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(gzip.compress(json.dumps(cassette, separators=(",", ":")).encode()))
+    os.replace(tmp, path)  # concurrent recorders of the same request leave one complete file
+
+
+def _read(path: Path) -> dict:
+    return json.loads(gzip.decompress(path.read_bytes()))
+
+
+class _Replay(httpx.AsyncByteStream):
+    """Recorded chunks, each released at its (scaled) original offset."""
+
+    def __init__(self, chunks: list[list]):
+        self._chunks = chunks
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        started = time.monotonic()
+        for offset, text in self._chunks:
+            delay = offset * settings.LLM_CASSETTE_TIME_SCALE - (time.monotonic() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield text.encode()
+
+
+class _Recording(httpx.AsyncByteStream):
+    """Pass a streamed response through, saving it once it has been read to the end."""
+
+    def __init__(self, response: httpx.Response, started: float, on_complete):
+        self._response = response
+        self._started = started
+        self._on_complete = on_complete
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        chunks = []
+        async for text in self._response.aiter_text():  # decoded, so replay needs no content-encoding
+            chunks.append([round(time.monotonic() - self._started, 4), text])
+            yield text.encode()
+        await self._on_complete(chunks)
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """Records or replays ``POST .../chat/completions``; everything else passes through."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, provider: str, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"LLM_CASSETTE_MODE must be one of {MODES}, not {mode!r}")
+        self._transport = transport
+        self._provider = provider
+        self._mode = mode
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return await self._transport.handle_async_request(request)
+        body = json.loads(await request.aread())
+        key = cassette_key(body)
+        path = cassette_path(key)
+        if self._mode in ("replay", "auto") and path.exists():
+            metrics.incr("llm_cassette.replayed")
+            return await self._replay(await asyncio.to_thread(_read, path))
+        if self._mode == "replay":
+            metrics.incr("llm_cassette.misses")
+            logger.warning("No LLM cassette for request %s", key[:12])
+            return httpx.Response(404, json={"error": {"message": f"no cassette {path.name} (LLM_CASSETTE_MODE=replay)"}})
+        return await self._record(request, body, path)
+
+    async def _replay(self, cassette: dict) -> httpx.Response:
+        headers = {"content-type": cassette["content_type"]}
+        if "chunks" in cassette:
+            return httpx.Response(cassette["status"], headers=headers, stream=_Replay(cassette["chunks"]))
+        await asyncio.sleep(cassette["latency"] * settings.LLM_CASSETTE_TIME_SCALE)
+        return httpx.Response(cassette["status"], headers=headers, content=cassette["body"].encode())
+
+    async def _record(self, request: httpx.Request, body: dict, path: Path) -> httpx.Response:
+        started = time.monotonic()
+        response = await self._transport.handle_async_request(request)
+        if response.status_code != 200:
+            return response  # failures are not replayed
+        cassette = {
+            "provider": self._provider,
+            "recorded_at": time.time(),
+            "request": body,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+        }
+
+        async def save(**recorded) -> None:
+            await asyncio.to_thread(_write, path, {**cassette, **recorded})
+            metrics.incr("llm_cassette.recorded")
+
+        headers = {"content-type": cassette["content_type"]}
+        if body.get("stream"):
+            return httpx.Response(
+                response.status_code,
+                headers=headers,
+                stream=_Recording(response, started, lambda chunks: save(chunks=chunks)),
+            )
+        await response.aread()
+        await save(latency=round(time.monotonic() - started, 4), body=response.text)
+        return httpx.Response(response.status_code, headers=headers, content=response.content)
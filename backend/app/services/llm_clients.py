@@ -0,0 +1,115 @@
+"""Long-lived LLM client registry – pooled HTTP connections shared across requests.
+
+Building a ChatOpenAI per call also builds a fresh HTTP client, so every
+generation paid for a new TCP + TLS handshake to OpenRouter / Ollama. The
+registry keeps one keep-alive ``httpx.AsyncClient`` per provider and one
+ChatOpenAI per (provider, model, streaming, temperature) on top of it. It is
+created in the FastAPI lifespan and closed on shutdown.
+"""
+
+import logging
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from app.config import settings
+from app.services.fake_llm import FakeLLMTransport
+from app.services.llm_cassette import CassetteTransport
+
+logger = logging.getLogger(__name__)
+
+
+def _provider_kwargs(provider: str) -> dict:
+    """API key and base URL for a provider."""
+    kwargs = {"api_key": settings.provider_api_key(provider)}
+    base_url = settings.provider_base_url(provider)
+    if base_url:
+        kwargs["base_url"] = base_url
+    return kwargs
+
+
+class LLMClientRegistry:
+    """Caches pooled HTTP clients and the ChatOpenAI instances that use them."""
+
+    def __init__(self):
+        self._http_clients: dict[str, httpx.AsyncClient] = {}
+        self._models: dict[tuple[str, str, bool, float], ChatOpenAI] = {}
+        self._timeout = httpx.Timeout(
+            settings.LLM_HTTP_READ_TIMEOUT,
+            connect=settings.LLM_HTTP_CONNECT_TIMEOUT,
+        )
+
+    def _http_client(self, provider: str) -> httpx.AsyncClient:
+        client = self._http_clients.get(provider)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+            )
+            transport = FakeLLMTransport() if provider == "fake" else None
+            if settings.LLM_CASSETTE_MODE != "off":
+                transport = CassetteTransport(
+                    transport or httpx.AsyncHTTPTransport(limits=limits), provider, settings.LLM_CASSETTE_MODE
+                )
+            client = httpx.AsyncClient(limits=limits, timeout=self._timeout, transport=transport)
+            self._http_clients[provider] = client
+        return client
+
+    def get(
+        self,
+        provider: str,
+        model: str,
+        streaming: bool = False,
+        temperature: float = 0.7,
+    ) -> ChatOpenAI:
+        """Return the shared ChatOpenAI for this configuration, creating it on first use."""
+        key = (provider, model, streaming, temperature)
+        llm = self._models.get(key)
+        if llm is None:
+            llm = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                streaming=streaming,
+                max_tokens=settings.LLM_MAX_TOKENS,  # default; calls pass their own size (output_sizing)
+                timeout=self._timeout,  # the OpenAI SDK sends its own per-request timeout
+                max_retries=0,  # retries go through admission control, which releases the slot while backing off
+                stream_usage=streaming and settings.LLM_STREAM_USAGE,  # token counts on the final stream chunk
+                http_async_client=self._http_client(provider),
+                **_provider_kwargs(provider),
+            )
+            self._models[key] = llm
+            logger.info("Created LLM client: provider=%s model=%s streaming=%s", provider, model, streaming)
+        return llm
+
+    async def aclose(self) -> None:
+        """Close every pooled HTTP connection."""
+        for client in self._http_clients.values():
+            await client.aclose()
+        self._http_clients.clear()
+        self._models.clear()
+
+
+_registry: LLMClientRegistry | None = None
+
+
+def init_registry() -> LLMClientRegistry:
+    """Create the process-wide registry (called from the FastAPI lifespan)."""
+    global _registry
+    _registry = LLMClientRegistry()
+    return _registry
+
+
+def get_registry() -> LLMClientRegistry:
+    """Return the registry, creating it lazily for scripts that run outside the app."""
+    if _registry is None:
+        return init_registry()
+    return _registry
+
+
+async def close_registry() -> None:
+    """Close pooled connections (called on shutdown)."""
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
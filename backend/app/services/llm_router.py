@@ -0,0 +1,269 @@
+"""Latency-aware routing across LLM providers, with hedged requests and circuit breakers.
+
+``LLM_PROVIDERS`` lists the backends the router may use (by default only
+``LLM_PROVIDER``). For every provider it keeps the outcome and latency of the
+last ``LLM_ROUTER_WINDOW`` calls and sends each request to the healthiest one:
+lowest p50 latency, weighted by error rate. Providers with fewer than
+``_MIN_SAMPLES`` calls are tried first so that their latency gets measured.
+
+- Failover: if the chosen provider fails, the next one is tried.
+- Circuit breaker: ``LLM_CIRCUIT_FAILURES`` consecutive errors take a provider
+  out of rotation for ``LLM_CIRCUIT_OPEN_SECONDS``; after that a single trial
+  call is sent while other calls keep going elsewhere. Its success closes the
+  circuit again and its failure re-opens it.
+- Hedging (``LLM_HEDGE_ENABLED``, non-streaming calls only): if the first
+  provider has not answered after max(its p95, ``LLM_HEDGE_MIN_DELAY_SECONDS``),
+  the same request is sent to the next provider and the first answer wins.
+
+Calls are made through caller-supplied ``attempt(provider)`` functions, so the
+router can be driven by fake providers in tests and debug scripts.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from typing import TypeVar
+
+from app.config import settings
+from app.services.admission import AdmissionRejected
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_MIN_SAMPLES = 3
+
+
+class ProviderHealth:
+    """Rolling latency / error statistics and circuit-breaker state for one provider."""
+
+    def __init__(self, name: str, window: int, failure_threshold: int, open_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.latencies: deque[float] = deque(maxlen=window)  # successful non-streaming calls
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # circuit open while time.monotonic() < open_until
+        self.half_open = False
+        self.trial_in_flight = False  # the one call probing a half-open circuit
+
+    @property
+    def p50(self) -> float | None:
+        return metrics.percentile(self.latencies, 0.50)
+
+    @property
+    def p95(self) -> float | None:
+        return metrics.percentile(self.latencies, 0.95)
+
+    @property
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def available(self) -> bool:
+        """Closed, or open period over and no trial call already in flight."""
+        if time.monotonic() < self.open_until:
+            return False
+        return not (self.half_open and self.trial_in_flight)
+
+    def begin_call(self) -> bool:
+        """Claim the trial if the circuit is half-open; True if this call is the trial."""
+        if not self.half_open or self.trial_in_flight or time.monotonic() < self.open_until:
+            return False
+        self.trial_in_flight = True
+        metrics.incr(f"llm_router.{self.name}.circuit_trials")
+        return True
+
+    def end_trial(self) -> None:
+        """The trial resolved (or was cancelled / rejected, so the next call may try again)."""
+        self.trial_in_flight = False
+
+    def score(self) -> float:
+        """Lower is better. Unmeasured providers and circuit trials score 0 so they get called."""
+        if len(self.outcomes) < _MIN_SAMPLES or self.half_open:
+            return 0.0
+        if self.p50 is None:
+            return float("inf")
+        return self.p50 / max(1 - self.error_rate, 0.05)
+
+    def record_success(self, latency: float | None) -> None:
+        if latency is not None:
+            self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+        if self.half_open:
+            logger.info("LLM provider %s recovered – closing circuit", self.name)
+            self.half_open = False
+
+    def record_failure(self) -> None:
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+        if self.half_open or self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.open_seconds
+            self.half_open = True  # the first call after the open period is a trial
+            metrics.incr(f"llm_router.{self.name}.circuit_opened")
+            logger.warning(
+                "LLM provider %s failed %d times in a row – circuit open for %.0fs",
+                self.name, self.consecutive_failures, self.open_seconds,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "p50_ms": metrics.ms(self.p50),
+            "p95_ms": metrics.ms(self.p95),
+            "error_rate": round(self.error_rate, 3),
+            "calls": len(self.outcomes),
+            "circuit": "open" if time.monotonic() < self.open_until else "half_open" if self.half_open else "closed",
+            "trial_in_flight": self.trial_in_flight,
+        }
+
+
+class ProviderRouter:
+    """Chooses, hedges and fails over between providers."""
+
+    def __init__(
+        self,
+        providers: list[str],
+        window: int = 100,
+        failure_threshold: int = 5,
+        open_seconds: float = 30.0,
+        hedge_min_delay: float = 2.0,
+    ):
+        self.providers = providers
+        self.hedge_min_delay = hedge_min_delay
+        self.health = {p: ProviderHealth(p, window, failure_threshold, open_seconds) for p in providers}
+
+    def ranked(self) -> list[str]:
+        """Providers to try, best first. If every circuit is open, all are tried anyway."""
+        order = {p: i for i, p in enumerate(self.providers)}
+        available = [p for p in self.providers if self.health[p].available] or list(self.providers)
+        return sorted(available, key=lambda p: (self.health[p].score(), order[p]))
+
+    def hedge_delay(self, provider: str) -> float:
+        p95 = self.health[provider].p95
+        return max(p95 or 0.0, self.hedge_min_delay)
+
+    async def _timed(self, provider: str, attempt: Callable[[str], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        try:
+            result = await attempt(provider)
+        except AdmissionRejected:
+            # Our own queue (or the provider's rate limit) is full – fail over, but the backend is not broken.
+            metrics.incr(f"llm_router.{provider}.saturated")
+            raise
+        except Exception:
+            self.health[provider].record_failure()
+            metrics.incr(f"llm_router.{provider}.errors")
+            raise
+        self.health[provider].record_success(time.monotonic() - started)
+        metrics.incr(f"llm_router.{provider}.calls")
+        return result
+
+    async def call(self, attempt: Callable[[str], Awaitable[T]], hedge: bool = False) -> tuple[str, T]:
+        """Run ``attempt(provider)`` on the best provider; returns (provider, result).
+
+        On failure the next provider is tried. With ``hedge`` a second provider is
+        started if the first is slower than its usual p95; the loser is cancelled.
+        """
+        candidates = self.ranked()
+        pending: dict[asyncio.Future, str] = {}
+        hedged = False
+        last_error: BaseException | None = None
+
+        def launch() -> None:
+            # Skip a provider whose trial call started since ranking, unless it is the last one.
+            while len(candidates) > 1 and not self.health[candidates[0]].available:
+                candidates.pop(0)
+            provider = candidates.pop(0)
+            health = self.health[provider]
+            # Claimed before the task runs, so concurrent calls already see the trial in flight.
+            trial = health.begin_call()
+            task = asyncio.ensure_future(self._timed(provider, attempt))
+            if trial:  # released however the task ends – even if cancelled before it starts
+                task.add_done_callback(lambda _: health.end_trial())
+            pending[task] = provider
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if hedge and not hedged and candidates and len(pending) == 1:
+                    timeout = self.hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    metrics.incr("llm_router.hedged")
+                    launch()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged:
+                            metrics.incr(f"llm_router.hedge_won.{provider}")
+                        return provider, task.result()
+                    last_error = task.exception()
+                    logger.warning("LLM provider %s failed: %s", provider, last_error)
+                if not pending and candidates:
+                    metrics.incr("llm_router.failovers")
+                    launch()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, open_stream: Callable[[str], AsyncIterator[T]]) -> AsyncGenerator[T, None]:
+        """Stream from the best provider, failing over only before the first chunk."""
+        candidates = self.ranked()
+        while True:
+            while len(candidates) > 1 and not self.health[candidates[0]].available:
+                candidates.pop(0)
+            provider = candidates.pop(0)
+            trial = self.health[provider].begin_call()
+            started = False
+            try:
+                async for chunk in open_stream(provider):
+                    started = True
+                    yield chunk
+            except AdmissionRejected:
+                metrics.incr(f"llm_router.{provider}.saturated")
+                if started or not candidates:
+                    raise
+            except Exception as exc:
+                self.health[provider].record_failure()
+                metrics.incr(f"llm_router.{provider}.errors")
+                if started or not candidates:
+                    raise
+                logger.warning("LLM provider %s failed before streaming: %s", provider, exc)
+            else:
+                # Streamed latency depends on lesson length, so only the outcome is recorded.
+                self.health[provider].record_success(None)
+                metrics.incr(f"llm_router.{provider}.calls")
+                return
+            finally:
+                if trial:
+                    self.health[provider].end_trial()
+            metrics.incr("llm_router.failovers")
+
+    def stats(self) -> dict[str, dict]:
+        return {p: self.health[p].stats() for p in self.providers}
+
+
+_router: ProviderRouter | None = None
+
+
+def get_router() -> ProviderRouter:
+    """Process-wide router over LLM_PROVIDERS, created on first use."""
+    global _router
+    if _router is None:
+        _router = ProviderRouter(
+            settings.LLM_PROVIDER_LIST,
+            window=settings.LLM_ROUTER_WINDOW,
+            failure_threshold=settings.LLM_CIRCUIT_FAILURES,
+            open_seconds=settings.LLM_CIRCUIT_OPEN_SECONDS,
+            hedge_min_delay=settings.LLM_HEDGE_MIN_DELAY_SECONDS,
+        )
+    return _router
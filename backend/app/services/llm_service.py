@@ -1,38 +1,170 @@
 """LLM Orchestrator – LangChain + OpenRouter integration with streaming."""
 
+import asyncio
 import json
 import logging
-from collections.abc import AsyncGenerator
+import time
+from collections.abc import AsyncGenerator, Callable
+from typing import Any
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 
 from app.config import settings
-from app.services.prompt_templates import build_more_context_prompt, build_quiz_prompt, build_teach_prompt
+from app.services import admission
+from app.services import llm_usage
+from app.services import model_tiers
+from app.services.admission import AdmissionRejected, Priority
+from app.services.cache_service import make_key
+from app.services.llm_clients import get_registry
+from app.services.llm_router import get_router
+from app.services.llm_usage import LLMUsage, usage_from_message
+from app.services.llm_workers import offload
+from app.services.output_sizing import OutputPlan, plan_lesson, plan_more_context, plan_quiz
+from app.services.prompt_templates import (
+    CONTINUATION_PROMPT,
+    build_more_context_prompt,
+    build_quiz_prompt,
+    build_section_prompt,
+    build_teach_prompt,
+)
+from app.utils import metrics
+from app.utils.context_packer import pack_context
+from app.utils.json_stream import repair_json
+from app.utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
 
-def _get_llm(streaming: bool = False, temperature: float = 0.7) -> ChatOpenAI:
-    """Create a ChatOpenAI instance configured for the active LLM provider."""
-    kwargs = {
-        "model": settings.LLM_MODEL,
-        "temperature": temperature,
-        "streaming": streaming,
-        "max_tokens": 8192,  # Higher for 10-20 quiz questions per sub-topic
-    }
-    
-    # Set API key based on provider
-    if settings.LLM_PROVIDER == "ollama":
-        # Use Ollama API key if provided, otherwise use dummy key for local
-        kwargs["api_key"] = settings.OLLAMA_API_KEY or "no-key-required"
-    else:
-        kwargs["api_key"] = settings.LLM_API_KEY
-    
-    if settings.LLM_BASE_URL:
-        kwargs["base_url"] = settings.LLM_BASE_URL
-    
-    return ChatOpenAI(**kwargs)
+# Histogram buckets for prompt context sizes, in tokens.
+CONTEXT_TOKEN_BUCKETS = (100, 250, 500, 1000, 1500, 2000, 3000, 5000, 10000)
+
+_lesson_flights = SingleFlight("lesson_singleflight")
+_quiz_flights = SingleFlight("quiz_singleflight")
+_more_context_flights = SingleFlight("more_context_singleflight")
+
+
+def _generation_key(messages: list[dict[str, str]], temperature: float, priority: Priority) -> str:
+    """Identify a generation by everything sent upstream and its admission priority.
+
+    Callers only share a call queued at their own priority: an interactive request
+    must not wait behind background pre-generation, or time out with it.
+    """
+    return make_key(settings.LLM_PROVIDER, settings.LLM_MODEL, temperature, messages, priority.value)
+
+
+def _get_llm(provider: str, model: str, streaming: bool = False, temperature: float = 0.7) -> ChatOpenAI:
+    """Return the pooled ChatOpenAI client for ``provider`` and ``model``."""
+    return get_registry().get(
+        provider=provider,
+        model=model,
+        streaming=streaming,
+        temperature=temperature,
+    )
+
+
+async def _invoke(
+    lc_messages: list,
+    temperature: float,
+    priority: Priority,
+    endpoint: str,
+    plan: OutputPlan,
+) -> tuple[Any, LLMUsage]:
+    """Send one non-streaming request via the provider router; returns (response, usage).
+
+    ``plan`` sets the request's max_tokens. A response cut off at max_tokens is
+    completed with continuation requests to the same provider, so only the
+    missing tail is generated again. Tokens and latency of the winning attempt
+    are recorded under ``endpoint``, next to the planned estimate. The model is
+    that of the endpoint's current tier (see model_tiers).
+    """
+    tier = model_tiers.select(endpoint)
+
+    async def attempt(provider: str):
+        model = model_tiers.model_for(tier, provider)
+        llm = _get_llm(provider, model, streaming=False, temperature=temperature)
+        started = time.monotonic()
+        response = await admission.call(
+            provider, priority, lambda: llm.ainvoke(lc_messages, max_tokens=plan.max_tokens)
+        )
+        continuations = 0
+        while _truncated(response) and continuations < settings.LLM_MAX_CONTINUATIONS:
+            continuations += 1
+            metrics.incr("llm.continuations")
+            logger.info("Response hit max_tokens – continuation %d via %s", continuations, provider)
+            follow_up = _continuation_messages(lc_messages, response.content)
+            tail = await admission.call(
+                provider, priority, lambda: llm.ainvoke(follow_up, max_tokens=plan.max_tokens)
+            )
+            response = AIMessage(
+                content=join_continuation(response.content, tail.content),
+                response_metadata=tail.response_metadata,
+                usage_metadata=_add_usage(response.usage_metadata, tail.usage_metadata),
+            )
+        if _truncated(response):
+            metrics.incr("llm.truncated")
+        prompt_tokens, completion_tokens = usage_from_message(response)
+        usage = LLMUsage(
+            endpoint=endpoint,
+            provider=provider,
+            model=model,
+            tier=tier,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            latency_seconds=time.monotonic() - started,
+            estimated_tokens=plan.estimated_tokens,
+            max_tokens=plan.max_tokens,
+        )
+        return response, usage
+
+    _, (response, usage) = await get_router().call(
+        attempt,
+        hedge=settings.LLM_HEDGE_ENABLED and priority == Priority.INTERACTIVE,
+    )
+    llm_usage.record(usage)
+    model_tiers.observe(endpoint, tier, usage.latency_seconds)
+    return response, usage
+
+
+def _truncated(message: Any) -> bool:
+    """True if the provider stopped because it reached max_tokens."""
+    return (getattr(message, "response_metadata", None) or {}).get("finish_reason") == "length"
+
+
+def _continuation_messages(lc_messages: list, partial: str) -> list:
+    return [*lc_messages, AIMessage(content=partial), HumanMessage(content=CONTINUATION_PROMPT)]
+
+
+def join_continuation(partial: str, tail: str, max_overlap: int = 200) -> str:
+    """Append a continuation, dropping code fences and any text it repeated from ``partial``."""
+    tail = tail.lstrip("\n")
+    if tail.startswith("```"):
+        tail = tail.split("\n", 1)[1] if "\n" in tail else ""
+    for size in range(min(max_overlap, len(partial), len(tail)), 10, -1):
+        if partial.endswith(tail[:size]):
+            return partial + tail[size:]
+    return partial + tail
+
+
+def _add_usage(a: dict | None, b: dict | None) -> dict | None:
+    if not a or not b:
+        return a or b
+    return {k: a.get(k, 0) + b.get(k, 0) for k in ("input_tokens", "output_tokens", "total_tokens")}
+
+
+def _parse_json(content: str) -> dict | None:
+    """json.loads, falling back to repairing a truncated or fenced object."""
+    try:
+        result = json.loads(content)
+        if isinstance(result, dict):
+            return result
+    except json.JSONDecodeError:
+        pass
+    result = repair_json(content)
+    if result is not None:
+        metrics.incr("llm.json_repaired")
+        logger.warning("Repaired malformed JSON from LLM (%d chars)", len(content))
+    return result
 
 
 def _messages_to_langchain(messages: list[dict[str, str]]):
@@ -46,6 +178,7 @@ def _messages_to_langchain(messages: list[dict[str, str]]):
     return lc_messages
 
 
+@offload
 async def generate_lesson(
     main_topic: str,
     unit_name: str,
@@ -55,8 +188,10 @@ async def generate_lesson(
     focus_areas: list[str] | None = None,
     include_code: bool = True,
     include_quiz: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
 ) -> dict:
     """Generate a complete lesson (non-streaming). Returns parsed JSON dict."""
+    plan = plan_lesson(len(sub_topics), include_code, include_quiz)
     messages = build_teach_prompt(
         main_topic=main_topic,
         unit_name=unit_name,
@@ -66,12 +201,31 @@ async def generate_lesson(
         focus_areas=focus_areas,
         include_code=include_code,
         include_quiz=include_quiz,
+        quiz_per_sub_topic=plan.quiz_per_sub_topic,
+        code_per_sub_topic=plan.code_per_sub_topic,
     )
-    llm = _get_llm(streaming=False)
+    return await _lesson_flights.do(
+        _generation_key(messages, 0.7, priority),
+        lambda: _run_lesson(messages, topic_title, priority, plan),
+    )
+
+
+async def _run_lesson(
+    messages: list[dict[str, str]],
+    topic_title: str,
+    priority: Priority,
+    plan: OutputPlan,
+    strict: bool = False,
+    endpoint: str = "lesson",
+) -> dict:
+    """One lesson call. With ``strict``, a non-JSON answer raises ValueError instead of being wrapped.
+
+    The result carries the call's token / latency accounting under ``usage``.
+    """
     lc_messages = _messages_to_langchain(messages)
 
     logger.info("Generating lesson for: %s", topic_title)
-    response = await llm.ainvoke(lc_messages)
+    response, usage = await _invoke(lc_messages, 0.7, priority, endpoint, plan)
 
     # Parse JSON from response
     content = response.content.strip()
@@ -82,32 +236,183 @@ async def generate_lesson(
             content = content[:-3]
         content = content.strip()
 
-    try:
-        result = json.loads(content)
-    except json.JSONDecodeError:
+    result = _parse_json(content)
+    if result is None:
+        if strict:
+            raise ValueError(f"LLM returned non-JSON lesson for: {topic_title}")
         logger.warning("LLM returned non-JSON response, wrapping in explanation field.")
         result = {"explanation": content, "key_points": [], "code_examples": [], "quiz": []}
+    if _truncated(response):
+        result["truncated"] = True  # still cut off after continuations: repaired, incomplete
 
-    result["model_used"] = settings.LLM_MODEL
+    result["model_used"] = usage.model
+    result["model_tier"] = usage.tier
+    result["usage"] = usage.to_dict()
     return result
 
 
+def split_sections(sub_topics: list[str], max_parts: int) -> list[list[str]]:
+    """Group sub-topics into at most ``max_parts`` contiguous, evenly sized sections."""
+    parts = max(1, min(max_parts, len(sub_topics)))
+    size, extra = divmod(len(sub_topics), parts)
+    sections, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        sections.append(sub_topics[start:end])
+        start = end
+    return sections
+
+
+@offload
+async def generate_lesson_fanout(
+    main_topic: str,
+    unit_name: str,
+    topic_title: str,
+    sub_topics: list[str],
+    user_level: str = "beginner",
+    focus_areas: list[str] | None = None,
+    include_code: bool = True,
+    include_quiz: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+) -> dict:
+    """Generate a lesson as concurrent per-section requests and merge the results.
+
+    Each section is a smaller response than the whole topic, so wall-clock time
+    follows the largest section rather than the sum, and a response is far less
+    likely to hit max_tokens. A failed or non-JSON section is retried on its own.
+    """
+    sections = split_sections(sub_topics, settings.LESSON_FANOUT_MAX_PARTS)
+    started = time.monotonic()
+    plans = [plan_lesson(len(section), include_code, include_quiz) for section in sections]
+    tasks = [
+        asyncio.ensure_future(_generate_section(
+            build_section_prompt(
+                main_topic=main_topic,
+                unit_name=unit_name,
+                topic_title=topic_title,
+                sub_topics=sub_topics,
+                section=section,
+                user_level=user_level,
+                focus_areas=focus_areas,
+                include_code=include_code,
+                include_quiz=include_quiz,
+                quiz_per_sub_topic=plan.quiz_per_sub_topic,
+                code_per_sub_topic=plan.code_per_sub_topic,
+            ),
+            f"{topic_title} [{i + 1}/{len(sections)}]",
+            priority,
+            plan,
+        ))
+        for i, (section, plan) in enumerate(zip(sections, plans))
+    ]
+    try:
+        parts = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    elapsed = time.monotonic() - started
+    metrics.incr("lesson_fanout.lessons")
+    metrics.incr("lesson_fanout.parts", len(parts))
+    metrics.observe("lesson_fanout.wall_seconds", elapsed)
+    merged = _merge_lessons(parts)
+    # Sections were already recorded one by one; this total is only saved with the lesson.
+    usages = [LLMUsage(**p["usage"]) for p in parts if p.get("usage")]
+    if usages:
+        merged["usage"] = llm_usage.combine("lesson_fanout", usages, elapsed).to_dict()
+    return merged
+
+
+async def _generate_section(
+    messages: list[dict[str, str]], label: str, priority: Priority, plan: OutputPlan
+) -> dict:
+    retries = settings.LESSON_FANOUT_RETRIES
+    for attempt in range(retries + 1):
+        strict = attempt < retries  # the last attempt keeps a non-JSON answer as plain text
+        started = time.monotonic()
+        try:
+            part = await _lesson_flights.do(
+                _generation_key(messages, 0.7, priority),
+                lambda: _run_lesson(messages, label, priority, plan, strict=strict, endpoint="lesson_section"),
+            )
+        except AdmissionRejected:
+            raise  # already retried with backoff by admission control
+        except Exception as exc:
+            if attempt == retries:
+                raise
+            metrics.incr("lesson_fanout.part_retries")
+            logger.warning("Lesson section %s failed (%s) – retrying", label, exc)
+            continue
+        metrics.observe("lesson_fanout.part_seconds", time.monotonic() - started)
+        return part
+
+
+def _merge_lessons(parts: list[dict]) -> dict:
+    """Concatenate section results in order; list fields of strings are de-duplicated."""
+    merged: dict[str, Any] = {
+        "explanation": "\n\n".join(p.get("explanation", "").strip() for p in parts if p.get("explanation")),
+    }
+    for field in ("key_points", "code_examples", "math_formulas", "quiz", "further_reading"):
+        items, seen = [], set()
+        for part in parts:
+            for item in part.get(field) or []:
+                marker = item.strip().lower() if isinstance(item, str) else json.dumps(item, sort_keys=True)
+                if marker not in seen:
+                    seen.add(marker)
+                    items.append(item)
+        merged[field] = items
+    # Sections served by different models (a downgrade or failover mid-lesson) are all named.
+    models = list(dict.fromkeys(p["model_used"] for p in parts if p.get("model_used")))
+    tiers = list(dict.fromkeys(p["model_tier"] for p in parts if p.get("model_tier")))
+    merged["model_used"] = "+".join(models) if models else settings.LLM_MODEL
+    merged["model_tier"] = "+".join(tiers) if tiers else None
+    if any(p.get("truncated") for p in parts):
+        merged["truncated"] = True
+    return merged
+
+
+@offload
 async def generate_more_context(
     topic_title: str,
     existing_explanation: str,
     user_question: str,
+    priority: Priority = Priority.INTERACTIVE,
 ) -> dict:
-    """Generate additional context based on user's follow-up question. Returns {explanation, code_examples}."""
+    """Generate additional context based on user's follow-up question. Returns {explanation, code_examples}.
+
+    Only the lesson sections most relevant to the question (BM25) are sent,
+    up to MORE_CONTEXT_TOKEN_BUDGET tokens.
+    """
+    context, packing = pack_context(existing_explanation, user_question, settings.MORE_CONTEXT_TOKEN_BUDGET)
+    metrics.observe("more_context.context_tokens", packing["tokens"], CONTEXT_TOKEN_BUCKETS)
+    if packing["sections"] is not None:
+        metrics.incr("more_context.contexts_packed")
+        logger.info(
+            "More-context prompt: %d of %d lesson sections, %d of %d tokens",
+            packing["selected"], packing["sections"], packing["tokens"], packing["source_tokens"],
+        )
     messages = build_more_context_prompt(
         topic_title=topic_title,
-        existing_explanation=existing_explanation,
+        existing_explanation=context,
         user_question=user_question,
     )
-    llm = _get_llm(streaming=False)
+    return await _more_context_flights.do(
+        _generation_key(messages, 0.7, priority),
+        lambda: _run_more_context(messages, topic_title, user_question, priority, plan_more_context()),
+    )
+
+
+async def _run_more_context(
+    messages: list[dict[str, str]],
+    topic_title: str,
+    user_question: str,
+    priority: Priority,
+    plan: OutputPlan,
+) -> dict:
     lc_messages = _messages_to_langchain(messages)
 
     logger.info("Generating more context for: %s (question: %s)", topic_title, user_question[:50])
-    response = await llm.ainvoke(lc_messages)
+    response, usage = await _invoke(lc_messages, 0.7, priority, "more_context", plan)
 
     content = response.content.strip()
     if content.startswith("```"):
@@ -116,9 +421,8 @@ async def generate_more_context(
             content = content[:-3]
         content = content.strip()
 
-    try:
-        result = json.loads(content)
-    except json.JSONDecodeError:
+    result = _parse_json(content)
+    if result is None:
         logger.warning("LLM returned non-JSON for more context, wrapping in explanation.")
         result = {"explanation": content, "code_examples": []}
 
@@ -126,6 +430,9 @@ async def generate_more_context(
         result["explanation"] = content
     if "code_examples" not in result:
         result["code_examples"] = []
+    result["model_used"] = usage.model
+    result["model_tier"] = usage.tier
+    result["usage"] = usage.to_dict()
     return result
 
 
@@ -138,8 +445,14 @@ async def stream_lesson(
     focus_areas: list[str] | None = None,
     include_code: bool = True,
     include_quiz: bool = True,
+    priority: Priority = Priority.INTERACTIVE,
+    on_usage: Callable[[LLMUsage], None] | None = None,
 ) -> AsyncGenerator[str, None]:
-    """Stream lesson content token-by-token via SSE."""
+    """Stream lesson content token-by-token via SSE.
+
+    ``on_usage`` receives the token / latency accounting once the stream has finished.
+    """
+    plan = plan_lesson(len(sub_topics), include_code, include_quiz)
     messages = build_teach_prompt(
         main_topic=main_topic,
         unit_name=unit_name,
@@ -149,28 +462,105 @@ async def stream_lesson(
         focus_areas=focus_areas,
         include_code=include_code,
         include_quiz=include_quiz,
+        quiz_per_sub_topic=plan.quiz_per_sub_topic,
+        code_per_sub_topic=plan.code_per_sub_topic,
     )
-    llm = _get_llm(streaming=True)
     lc_messages = _messages_to_langchain(messages)
+    tier = model_tiers.select("lesson_stream")
+
+    def open_stream(provider: str):
+        model = model_tiers.model_for(tier, provider)
+        return _stream_completion(provider, model, tier, lc_messages, priority, plan, on_usage)
 
     logger.info("Streaming lesson for: %s", topic_title)
-    async for chunk in llm.astream(lc_messages):
-        if chunk.content:
-            yield chunk.content
+    async for text in get_router().stream(open_stream):
+        yield text
+
 
+async def _stream_completion(
+    provider: str,
+    model: str,
+    tier: str,
+    lc_messages: list,
+    priority: Priority,
+    plan: OutputPlan,
+    on_usage: Callable[[LLMUsage], None] | None = None,
+) -> AsyncGenerator[str, None]:
+    """Stream a response's text, continuing it in place if it stops at max_tokens."""
+    llm = _get_llm(provider, model, streaming=True)
+    text = ""
+    messages = lc_messages
+    usage = LLMUsage(
+        endpoint="lesson_stream",
+        provider=provider,
+        model=model,
+        tier=tier,
+        estimated_tokens=plan.estimated_tokens,
+        max_tokens=plan.max_tokens,
+    )
+    started = time.monotonic()
+    for continuation in range(settings.LLM_MAX_CONTINUATIONS + 1):
+        if continuation:
+            metrics.incr("llm.continuations")
+            logger.info("Stream hit max_tokens – continuation %d via %s", continuation, provider)
+            messages = _continuation_messages(lc_messages, text)
+        finish_reason = None
+        # The start of a continuation is held back until repeated text can be trimmed.
+        head: str | None = "" if continuation else None
+        async for chunk in admission.stream(provider, priority, lambda: llm.astream(messages, max_tokens=plan.max_tokens)):
+            finish_reason = chunk.response_metadata.get("finish_reason") or finish_reason
+            if chunk.usage_metadata:  # the final chunk, when the provider reports stream usage
+                prompt_tokens, completion_tokens = usage_from_message(chunk)
+                usage.prompt_tokens = (usage.prompt_tokens or 0) + (prompt_tokens or 0)
+                usage.completion_tokens = (usage.completion_tokens or 0) + (completion_tokens or 0)
+            piece = chunk.content
+            if not piece:
+                continue
+            if head is not None:
+                head += piece
+                if len(head) < 200:
+                    continue
+                piece, head = join_continuation(text, head)[len(text):], None
+            if usage.ttft_seconds is None:
+                usage.ttft_seconds = time.monotonic() - started
+            text += piece
+            yield piece
+        if head:
+            piece = join_continuation(text, head)[len(text):]
+            text += piece
+            yield piece
+        if finish_reason != "length":
+            break
+    else:
+        metrics.incr("llm.truncated")
+    usage.latency_seconds = time.monotonic() - started
+    llm_usage.record(usage)
+    model_tiers.observe("lesson_stream", tier, usage.ttft_seconds)
+    if on_usage is not None:
+        on_usage(usage)
 
+
+@offload
 async def generate_quiz(
     topic_title: str,
     sub_topics: list[str],
     num_questions: int = 5,
+    difficulty: str = "intermediate",
+    priority: Priority = Priority.QUIZ,
 ) -> dict:
-    """Generate quiz questions for a topic."""
-    messages = build_quiz_prompt(topic_title, sub_topics, num_questions)
-    llm = _get_llm(streaming=False, temperature=0.5)
+    """Generate quiz questions for a topic at one difficulty."""
+    messages = build_quiz_prompt(topic_title, sub_topics, num_questions, difficulty)
+    return await _quiz_flights.do(
+        _generation_key(messages, 0.5, priority),
+        lambda: _run_quiz(messages, topic_title, priority, plan_quiz(num_questions)),
+    )
+
+
+async def _run_quiz(messages: list[dict[str, str]], topic_title: str, priority: Priority, plan: OutputPlan) -> dict:
     lc_messages = _messages_to_langchain(messages)
 
     logger.info("Generating quiz for: %s", topic_title)
-    response = await llm.ainvoke(lc_messages)
+    response, usage = await _invoke(lc_messages, 0.5, priority, "quiz", plan)
 
     content = response.content.strip()
     if content.startswith("```"):
@@ -179,11 +569,17 @@ async def generate_quiz(
             content = content[:-3]
         content = content.strip()
 
-    try:
-        result = json.loads(content)
-    except json.JSONDecodeError:
+    result = _parse_json(content)
+    if result is None:
         logger.warning("LLM returned non-JSON quiz response.")
         result = {"questions": []}
+    # A repaired (truncated) quiz may end with an incomplete question.
+    required = {"question", "options", "correct_index", "explanation"}
+    result["questions"] = [
+        q for q in result.get("questions") or [] if isinstance(q, dict) and required <= q.keys()
+    ]
 
-    result["model_used"] = settings.LLM_MODEL
+    result["model_used"] = usage.model
+    result["model_tier"] = usage.tier
+    result["usage"] = usage.to_dict()
     return result
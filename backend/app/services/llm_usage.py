@@ -0,0 +1,161 @@
+"""Token and latency accounting for LLM calls.
+
+Every generation produces one ``LLMUsage``: prompt / completion tokens as
+reported by the provider, time to first token (streaming calls only), total
+latency as seen by the caller (admission queueing included), provider,
+model and model tier. It is saved with the generated content and aggregated in
+memory per endpoint, per model and per tier for GET /metrics.
+"""
+
+from collections import deque
+from dataclasses import asdict, dataclass
+from threading import Lock
+from typing import Any
+
+from app.utils import metrics
+
+# Histogram buckets for generation speed, in completion tokens per second.
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250, 500)
+# Histogram buckets for completion tokens over the output_sizing estimate.
+ESTIMATE_RATIO_BUCKETS = (0.25, 0.5, 0.75, 0.9, 1.0, 1.1, 1.25, 1.5, 2.0, 3.0)
+
+_RECENT = 200  # latencies kept per endpoint / model for p50 and p95
+
+
+@dataclass
+class LLMUsage:
+    """Accounting for one generation (possibly several upstream requests, e.g. continuations)."""
+
+    endpoint: str  # lesson | lesson_stream | lesson_section | lesson_fanout | more_context | quiz
+    provider: str
+    model: str
+    tier: str | None = None  # model tier that served it (see model_tiers)
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    ttft_seconds: float | None = None  # streaming only; a non-streaming answer arrives all at once
+    latency_seconds: float | None = None
+    estimated_tokens: int | None = None  # completion tokens expected by output_sizing
+    max_tokens: int | None = None  # limit sent with the request
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        """Completion tokens over generation time (after the first token when it is known)."""
+        if not self.completion_tokens or not self.latency_seconds:
+            return None
+        generating = self.latency_seconds - (self.ttft_seconds or 0.0)
+        return self.completion_tokens / generating if generating > 0 else None
+
+    @property
+    def estimate_ratio(self) -> float | None:
+        """Actual over estimated completion tokens; above 1 means the estimator is low."""
+        if not self.completion_tokens or not self.estimated_tokens:
+            return None
+        return self.completion_tokens / self.estimated_tokens
+
+    def to_dict(self) -> dict[str, Any]:
+        """Plain fields only, so ``LLMUsage(**usage.to_dict())`` round-trips."""
+        return asdict(self)
+
+
+def usage_from_message(message: Any) -> tuple[int | None, int | None]:
+    """(prompt_tokens, completion_tokens) from a LangChain message's ``usage_metadata``."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_tokens"), usage.get("output_tokens")
+
+
+def combine(endpoint: str, parts: list[LLMUsage], latency_seconds: float) -> LLMUsage:
+    """One usage record for several concurrent calls (lesson fan-out): tokens summed, wall-clock latency."""
+
+    def total(field: str) -> int | None:
+        values = [getattr(p, field) for p in parts if getattr(p, field) is not None]
+        return sum(values) if values else None
+
+    first = parts[0]
+    return LLMUsage(
+        endpoint=endpoint,
+        provider=first.provider if all(p.provider == first.provider for p in parts) else "mixed",
+        model=first.model if all(p.model == first.model for p in parts) else "mixed",
+        tier=first.tier if all(p.tier == first.tier for p in parts) else "mixed",
+        prompt_tokens=total("prompt_tokens"),
+        completion_tokens=total("completion_tokens"),
+        latency_seconds=latency_seconds,
+        estimated_tokens=total("estimated_tokens"),
+    )
+
+
+class _Aggregate:
+    """Running totals plus recent latencies for one endpoint, model or tier."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies: deque[float] = deque(maxlen=_RECENT)
+        self.ttfts: deque[float] = deque(maxlen=_RECENT)
+        self.speeds: deque[float] = deque(maxlen=_RECENT)
+        self.estimate_ratios: deque[float] = deque(maxlen=_RECENT)
+
+    def add(self, usage: LLMUsage) -> None:
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens or 0
+        self.completion_tokens += usage.completion_tokens or 0
+        if usage.latency_seconds is not None:
+            self.latencies.append(usage.latency_seconds)
+        if usage.ttft_seconds is not None:
+            self.ttfts.append(usage.ttft_seconds)
+        if usage.tokens_per_second is not None:
+            self.speeds.append(usage.tokens_per_second)
+        if usage.estimate_ratio is not None:
+            self.estimate_ratios.append(usage.estimate_ratio)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_p50_ms": metrics.ms(metrics.percentile(self.latencies, 0.50)),
+            "latency_p95_ms": metrics.ms(metrics.percentile(self.latencies, 0.95)),
+            "ttft_p50_ms": metrics.ms(metrics.percentile(self.ttfts, 0.50)),
+            "tokens_per_second_p50": _round(metrics.percentile(self.speeds, 0.50), 1),
+            "estimate_ratio_p50": _round(metrics.percentile(self.estimate_ratios, 0.50), 2),
+            "estimate_ratio_p95": _round(metrics.percentile(self.estimate_ratios, 0.95), 2),
+        }
+
+
+_lock = Lock()
+_by_endpoint: dict[str, _Aggregate] = {}
+_by_model: dict[str, _Aggregate] = {}
+_by_tier: dict[str, _Aggregate] = {}
+
+
+def record(usage: LLMUsage) -> None:
+    """Add one generation to the per-endpoint, per-model and per-tier aggregates and histograms."""
+    with _lock:
+        _by_endpoint.setdefault(usage.endpoint, _Aggregate()).add(usage)
+        _by_model.setdefault(usage.model, _Aggregate()).add(usage)
+        if usage.tier is not None:
+            _by_tier.setdefault(usage.tier, _Aggregate()).add(usage)
+    metrics.incr(f"llm_tokens.{usage.endpoint}.prompt", usage.prompt_tokens or 0)
+    metrics.incr(f"llm_tokens.{usage.endpoint}.completion", usage.completion_tokens or 0)
+    if usage.latency_seconds is not None:
+        metrics.observe(f"llm.latency_seconds.{usage.endpoint}", usage.latency_seconds)
+    if usage.ttft_seconds is not None:
+        metrics.observe(f"llm.ttft_seconds.{usage.endpoint}", usage.ttft_seconds)
+    if usage.tokens_per_second is not None:
+        metrics.observe(f"llm.tokens_per_second.{usage.model}", usage.tokens_per_second, TOKENS_PER_SECOND_BUCKETS)
+    if usage.estimate_ratio is not None:
+        metrics.observe(f"llm.output_estimate_ratio.{usage.endpoint}", usage.estimate_ratio, ESTIMATE_RATIO_BUCKETS)
+
+
+def summary() -> dict[str, dict]:
+    """Aggregates since this worker started, per endpoint, per model and per tier."""
+    with _lock:
+        return {
+            "by_endpoint": {name: agg.stats() for name, agg in sorted(_by_endpoint.items())},
+            "by_model": {name: agg.stats() for name, agg in sorted(_by_model.items())},
+            "by_tier": {name: agg.stats() for name, agg in sorted(_by_tier.items())},
+        }
+
+
+def _round(value: float | None, digits: int) -> float | None:
+    return round(value, digits) if value is not None else None
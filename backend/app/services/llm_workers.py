@@ -0,0 +1,409 @@
+"""LLM worker processes – non-streaming generation outside the API event loop (LLM_WORKER_MODE=process).
+
+In the default ``inline`` mode every LLM call, the JSON parsing and repair of
+its answer, and the merging of fan-out sections run in the uvicorn worker's
+event loop, next to syllabus and auth requests. In ``process`` mode the
+functions marked with ``@offload`` (lesson, fan-out lesson, quiz and
+more-context generation) are sent instead through a local queue to
+LLM_WORKER_PROCESSES worker processes, each with its own event loop, LLM
+client pool, admission control and provider router, and only the finished
+result comes back. The API process keeps routing, caching, the database and
+lesson streams.
+
+Identical concurrent calls are coalesced in the API process before one of
+them is sent to a worker. A worker whose process dies fails its in-flight calls
+and is restarted. The admission limits (LLM_MAX_CONCURRENCY) are split between
+the API process, which keeps the streams, and the workers, so the total in
+flight per provider stays as configured (each process gets at least one slot).
+"""
+
+import asyncio
+import functools
+import importlib
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services import admission
+from app.services.admission import AdmissionRejected
+from app.services.cache_service import make_key
+from app.utils import metrics
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+MODES = ("inline", "process")
+
+LIVENESS_CHECK_SECONDS = 1.0
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+
+class LLMWorkerError(RuntimeError):
+    """A call failed inside a worker process (or the process died while running it)."""
+
+
+# ── Worker process side ─────────────────────────────────────────────
+
+def _error(exc: BaseException) -> dict[str, Any]:
+    """Describe an exception so that the API process can raise the same kind of error."""
+    if isinstance(exc, AdmissionRejected):
+        return {"type": "admission", "detail": str(exc), "retry_after": exc.retry_after}
+    if isinstance(exc, HTTPException):
+        return {"type": "http", "status_code": exc.status_code, "detail": exc.detail}
+    return {"type": "error", "detail": f"{type(exc).__name__}: {exc}"}
+
+
+def _raise(error: dict[str, Any]) -> None:
+    if error["type"] == "admission":
+        raise AdmissionRejected(error["detail"], error["retry_after"])
+    if error["type"] == "http":
+        raise HTTPException(status_code=error["status_code"], detail=error["detail"])
+    raise LLMWorkerError(error["detail"])
+
+
+def _worker_stats() -> dict[str, Any]:
+    from app.services import llm_usage, model_tiers
+    from app.services.llm_router import get_router
+
+    return {
+        "llm_admission": admission.stats(),
+        "llm_providers": get_router().stats(),
+        "llm_usage": llm_usage.summary(),
+        "llm_tiers": model_tiers.stats(),
+        "counters": metrics.snapshot(),
+    }
+
+
+async def _serve(index: int, requests: multiprocessing.Queue, results: multiprocessing.Queue) -> None:
+    """Run calls from ``requests`` concurrently until the None sentinel arrives."""
+    from app.services.llm_clients import close_registry, init_registry
+
+    init_registry()
+    loop = asyncio.get_running_loop()
+    tasks: dict[int, asyncio.Task] = {}
+
+    async def execute(call_id: int, target: str, args: tuple, kwargs: dict) -> None:
+        try:
+            module, name = target.split(":")
+            fn = getattr(importlib.import_module(module), name)
+            results.put((call_id, True, await fn(*args, **kwargs)))
+        except asyncio.CancelledError:
+            pass  # the caller has gone away and expects no answer
+        except Exception as exc:
+            results.put((call_id, False, _error(exc)))
+        finally:
+            tasks.pop(call_id, None)
+
+    def next_message() -> Any:
+        while True:
+            try:
+                return requests.get(timeout=1.0)
+            except queue.Empty:
+                if not parent.is_alive():  # the API process was killed without stopping the pool
+                    return None
+
+    parent = multiprocessing.parent_process()
+    try:
+        while True:
+            message = await loop.run_in_executor(None, next_message)
+            if message is None:
+                break
+            op, call_id, *payload = message
+            if op == "call":
+                tasks[call_id] = asyncio.create_task(execute(call_id, *payload))
+            elif op == "cancel":
+                task = tasks.get(call_id)
+                if task is not None:
+                    task.cancel()
+            elif op == "stats":
+                results.put((call_id, True, {"worker": index, "in_flight": len(tasks), **_worker_stats()}))
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        await close_registry()
+
+
+def _worker_main(
+    index: int,
+    overrides: dict[str, Any],
+    requests: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+) -> None:
+    """Entry point of a worker process."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)-8s | %(processName)s | %(name)s | %(message)s",
+    )
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    settings.LLM_WORKER_MODE = "inline"  # offloaded functions run here
+    try:
+        asyncio.run(_serve(index, requests, results))
+    except KeyboardInterrupt:
+        pass
+
+
+# ── API process side ────────────────────────────────────────────────
+
+def _split_limit(limit: int, processes: int) -> tuple[int, int]:
+    """Shares of a per-provider limit: (the API process, each worker); every process gets at least one slot."""
+    worker = max(1, limit // (processes + 1))
+    return max(1, limit - worker * processes), worker
+
+
+class _Worker:
+    def __init__(self, index: int, process: multiprocessing.Process, requests: multiprocessing.Queue):
+        self.index = index
+        self.process = process
+        self.requests = requests
+        self.in_flight: set[int] = set()
+        self.calls = 0
+
+
+class LLMWorkerPool:
+    """Worker processes fed through one request queue each, answering on a shared result queue.
+
+    Identical concurrent calls share one dispatch, which goes to the worker with
+    the fewest calls in flight. A reader thread takes answers off the result
+    queue – unpickling them there, not in the event loop – and resolves the
+    waiting futures. Dead workers are detected every LIVENESS_CHECK_SECONDS.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = max(1, processes)
+        self._context = multiprocessing.get_context("spawn")  # no inherited event loop, sockets or locks
+        self._results = self._context.Queue()
+        self._workers: list[_Worker] = []
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reader: threading.Thread | None = None
+        self._watchdog: asyncio.Task | None = None
+        self._flights = SingleFlight("llm_workers_singleflight")
+        self._closing = False
+        self._limits: dict[str, Any] = {}
+        self._overrides: dict[str, Any] = {}
+        self.restarts = 0
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        # Split the admission limits: this process keeps a share for the streams.
+        self._limits = {n: getattr(settings, n) for n in ("LLM_MAX_CONCURRENCY", "LLM_DEFAULT_MAX_CONCURRENCY")}
+        shares = {p: _split_limit(n, self.processes) for p, n in settings.LLM_MAX_CONCURRENCY.items()}
+        default = _split_limit(settings.LLM_DEFAULT_MAX_CONCURRENCY, self.processes)
+        self._overrides = {
+            **settings.model_dump(),
+            "LLM_MAX_CONCURRENCY": {p: worker for p, (_, worker) in shares.items()},
+            "LLM_DEFAULT_MAX_CONCURRENCY": default[1],
+        }
+        settings.LLM_MAX_CONCURRENCY = {p: own for p, (own, _) in shares.items()}
+        settings.LLM_DEFAULT_MAX_CONCURRENCY = default[0]
+        admission.resize()
+
+        self._workers = [self._spawn(i) for i in range(self.processes)]
+        self._reader = threading.Thread(target=self._read, name="llm-worker-results", daemon=True)
+        self._reader.start()
+        self._watchdog = asyncio.create_task(self._watch())
+        logger.info("Started %d LLM worker processes", self.processes)
+
+    def _spawn(self, index: int) -> _Worker:
+        requests = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._overrides, requests, self._results),
+            name=f"llm-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return _Worker(index, process, requests)
+
+    def _read(self) -> None:
+        while not self._closing:
+            try:
+                call_id, ok, value = self._results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            try:
+                self._loop.call_soon_threadsafe(self._resolve, call_id, ok, value)
+            except RuntimeError:  # the event loop has closed
+                break
+
+    async def _watch(self) -> None:
+        """Check worker liveness on a timer – results may keep arriving from the live workers."""
+        while True:
+            await asyncio.sleep(LIVENESS_CHECK_SECONDS)
+            self._reap()
+
+    def _resolve(self, call_id: int, ok: bool, value: Any) -> None:
+        future = self._pending.get(call_id)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(value)
+        else:
+            try:
+                _raise(value)
+            except Exception as exc:
+                future.set_exception(exc)
+
+    def _reap(self) -> None:
+        """Fail the calls of workers that died and start replacements."""
+        if self._closing:
+            return
+        for i, worker in enumerate(self._workers):
+            if worker.process.is_alive():
+                continue
+            logger.error("LLM worker %d exited with code %s – restarting", worker.index, worker.process.exitcode)
+            metrics.incr("llm_workers.restarts")
+            self.restarts += 1
+            for call_id in worker.in_flight:
+                future = self._pending.get(call_id)
+                if future is not None and not future.done():
+                    future.set_exception(LLMWorkerError(f"LLM worker {worker.index} exited"))
+            self._close_queue(worker.requests, flush=False)
+            self._workers[i] = self._spawn(worker.index)
+
+    async def _request(self, worker: _Worker, op: str, *payload: Any) -> Any:
+        call_id = next(self._ids)
+        future = self._loop.create_future()
+        self._pending[call_id] = future
+        worker.in_flight.add(call_id)
+        worker.requests.put((op, call_id, *payload))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            worker.requests.put(("cancel", call_id))
+            raise
+        finally:
+            self._pending.pop(call_id, None)
+            worker.in_flight.discard(call_id)
+
+    async def call(self, target: str, args: tuple, kwargs: dict) -> Any:
+        """Run ``module:function`` on the least busy worker and return its result.
+
+        Identical concurrent calls share one dispatch (and one result), as the
+        single-flights inside the offloaded functions would share them inline.
+        """
+        key = make_key(target, args, kwargs)
+        return await self._flights.do(key, lambda: self._dispatch(target, args, kwargs))
+
+    async def _dispatch(self, target: str, args: tuple, kwargs: dict) -> Any:
+        worker = min(self._workers, key=lambda w: len(w.in_flight))
+        worker.calls += 1
+        started = time.monotonic()
+        try:
+            return await self._request(worker, "call", target, args, kwargs)
+        finally:
+            metrics.observe("llm_workers.call_seconds", time.monotonic() - started)
+
+    async def worker_stats(self, timeout: float = 5.0) -> list[dict[str, Any]]:
+        """LLM metrics reported by each worker process (they are not in this process's counters)."""
+        replies = await asyncio.gather(
+            *(asyncio.wait_for(self._request(w, "stats"), timeout) for w in self._workers),
+            return_exceptions=True,
+        )
+        return [
+            reply if isinstance(reply, dict) else {"worker": w.index, "error": repr(reply)}
+            for w, reply in zip(self._workers, replies)
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "mode": "process",
+            "processes": self.processes,
+            "alive": sum(w.process.is_alive() for w in self._workers),
+            "in_flight": {w.index: len(w.in_flight) for w in self._workers},
+            "calls": {w.index: w.calls for w in self._workers},
+            "restarts": self.restarts,
+        }
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Stop the workers; calls still running fail with LLMWorkerError."""
+        self._closing = True
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+        for worker in self._workers:
+            worker.requests.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(LLMWorkerError("LLM worker pool closed"))
+        if self._reader is not None:
+            await asyncio.to_thread(self._reader.join, 2.0)
+        for worker in self._workers:
+            self._close_queue(worker.requests, flush=worker.process.exitcode == 0)
+        self._close_queue(self._results)
+        for name, value in self._limits.items():
+            setattr(settings, name, value)
+        admission.resize()
+
+    @staticmethod
+    def _close_queue(q: multiprocessing.Queue, flush: bool = True) -> None:
+        """Close a queue and join its feeder thread, so that its pipe and semaphores are released.
+
+        Without ``flush`` (nobody will read it any more) unsent messages are dropped
+        instead of blocking the join.
+        """
+        if not flush:
+            q.cancel_join_thread()
+        q.close()
+        q.join_thread()
+
+
+_pool: LLMWorkerPool | None = None
+
+
+def offload(fn: F) -> F:
+    """Run ``fn`` in a worker process while the pool is started; in this process otherwise.
+
+    Arguments and the result cross a process boundary, so both must pickle.
+    """
+    target = f"{fn.__module__}:{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        if _pool is None:
+            return await fn(*args, **kwargs)
+        return await _pool.call(target, args, kwargs)
+
+    return wrapper
+
+
+def start_pool() -> LLMWorkerPool | None:
+    """Start the worker processes if LLM_WORKER_MODE is ``process`` (called from the FastAPI lifespan)."""
+    global _pool
+    if settings.LLM_WORKER_MODE not in MODES:
+        raise ValueError(f"Unknown LLM_WORKER_MODE {settings.LLM_WORKER_MODE!r} (supported: {', '.join(MODES)})")
+    if settings.LLM_WORKER_MODE == "process" and _pool is None:
+        _pool = LLMWorkerPool(settings.LLM_WORKER_PROCESSES)
+        _pool.start()
+    return _pool
+
+
+async def stop_pool() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+
+async def stats() -> dict[str, Any]:
+    if _pool is None:
+        return {"mode": "inline"}
+    return {**_pool.stats(), "workers": await _pool.worker_stats()}
@@ -0,0 +1,130 @@
+"""Model tiers – which model serves each LLM endpoint, with latency-SLO downgrades.
+
+``LLM_ENDPOINT_TIERS`` assigns every endpoint a tier (e.g. quiz and
+more_context → "fast", lessons → "large") and ``LLM_MODEL_TIERS`` names the
+model each provider serves for a tier; a provider a tier does not list serves
+its default model, so tiers can be configured for some providers only.
+
+An endpoint with an entry in ``LLM_TIER_SLO_P95_SECONDS`` has the latency of its
+last ``LLM_TIER_SLO_WINDOW`` calls on its primary tier tracked (as the caller
+sees it, admission queueing included; time to first token for lesson_stream).
+Once the p95 of at least ``LLM_TIER_SLO_MIN_CALLS`` calls exceeds the SLO, the
+endpoint is served by ``LLM_TIER_DOWNGRADE[tier]`` for
+``LLM_TIER_DOWNGRADE_SECONDS``; then the primary tier is tried again with an
+empty window. Every generation records the tier that served it.
+
+State is per process, like the provider router's.
+"""
+
+import logging
+import time
+from collections import deque
+
+from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = ("lesson", "lesson_section", "lesson_stream", "quiz", "more_context")
+
+
+class EndpointSLO:
+    """Rolling latency of one endpoint's primary tier and its downgrade state."""
+
+    def __init__(self, endpoint: str, slo_seconds: float, window: int, min_calls: int, downgrade_seconds: float):
+        self.endpoint = endpoint
+        self.slo_seconds = slo_seconds
+        self.min_calls = min_calls
+        self.downgrade_seconds = downgrade_seconds
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.downgraded_until = 0.0  # downgraded while time.monotonic() < downgraded_until
+        self.downgrades = 0
+
+    @property
+    def p95(self) -> float | None:
+        return metrics.percentile(self.latencies, 0.95)
+
+    @property
+    def downgraded(self) -> bool:
+        return time.monotonic() < self.downgraded_until
+
+    def record(self, latency: float) -> None:
+        self.latencies.append(latency)
+        p95 = self.p95
+        if len(self.latencies) >= self.min_calls and p95 > self.slo_seconds:
+            self.downgraded_until = time.monotonic() + self.downgrade_seconds
+            self.downgrades += 1
+            self.latencies.clear()
+            metrics.incr(f"llm_tiers.{self.endpoint}.downgrades")
+            logger.warning(
+                "LLM endpoint %s: p95 %.1fs exceeds its %.1fs SLO – downgraded for %.0fs",
+                self.endpoint, p95, self.slo_seconds, self.downgrade_seconds,
+            )
+
+    def stats(self) -> dict:
+        return {
+            "slo_p95_ms": metrics.ms(self.slo_seconds),
+            "p95_ms": metrics.ms(self.p95),
+            "calls": len(self.latencies),
+            "downgraded": self.downgraded,
+            "downgrades": self.downgrades,
+        }
+
+
+_slos: dict[str, EndpointSLO] = {}
+
+
+def _slo(endpoint: str) -> EndpointSLO | None:
+    slo_seconds = settings.LLM_TIER_SLO_P95_SECONDS.get(endpoint)
+    if slo_seconds is None:
+        return None
+    state = _slos.get(endpoint)
+    if state is None or state.slo_seconds != slo_seconds:
+        state = _slos[endpoint] = EndpointSLO(
+            endpoint,
+            slo_seconds,
+            window=settings.LLM_TIER_SLO_WINDOW,
+            min_calls=settings.LLM_TIER_SLO_MIN_CALLS,
+            downgrade_seconds=settings.LLM_TIER_DOWNGRADE_SECONDS,
+        )
+    return state
+
+
+def select(endpoint: str) -> str:
+    """Tier to serve ``endpoint`` with: its primary tier, or the downgrade tier while its SLO is breached."""
+    tier = settings.endpoint_tier(endpoint)
+    state = _slo(endpoint)
+    if state is not None and state.downgraded:
+        metrics.incr(f"llm_tiers.{endpoint}.downgraded_calls")
+        return settings.LLM_TIER_DOWNGRADE.get(tier, tier)
+    return tier
+
+
+def model_for(tier: str, provider: str) -> str:
+    return settings.tier_model(tier, provider)
+
+
+def observe(endpoint: str, tier: str, latency: float | None) -> None:
+    """Record the latency of a call ``select`` routed; only primary-tier calls count toward the SLO."""
+    if latency is None or tier != settings.endpoint_tier(endpoint):
+        return
+    state = _slo(endpoint)
+    if state is not None and not state.downgraded:
+        state.record(latency)
+
+
+def stats() -> dict[str, dict]:
+    """Per endpoint: primary and current tier, the model per provider, and SLO state if one is set."""
+    result = {}
+    for endpoint in ENDPOINTS:
+        primary = settings.endpoint_tier(endpoint)
+        state = _slo(endpoint)
+        tier = settings.LLM_TIER_DOWNGRADE.get(primary, primary) if state is not None and state.downgraded else primary
+        result[endpoint] = {
+            "primary_tier": primary,
+            "tier": tier,
+            "models": {p: model_for(tier, p) for p in settings.LLM_PROVIDER_LIST},
+            **(state.stats() if state is not None else {}),
+        }
+    return result
+
@@ -0,0 +1,142 @@
+"""More-context service – follow-up answers from a per-topic semantic cache, then the LLM.
+
+Students keep asking the same follow-ups ("explain with an example", "what is
+the intuition"). Answers are stored per topic in ``generated_contents``
+(content_type ``more_context``) and indexed in an in-process SemanticCache; a
+new question whose similarity to a stored one reaches
+MORE_CONTEXT_CACHE_THRESHOLD gets the stored answer without an LLM call.
+"""
+
+import copy
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.schemas.syllabus import TopicDetail
+from app.services import content_service
+from app.services.admission import Priority
+from app.services.cache_service import make_key
+from app.services.llm_service import generate_more_context
+from app.services.prompt_templates import PROMPT_VERSION
+from app.services.semantic_cache import SemanticCache
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+more_context_cache = SemanticCache(
+    "more_context_cache",
+    threshold=settings.MORE_CONTEXT_CACHE_THRESHOLD,
+    max_per_scope=settings.MORE_CONTEXT_CACHE_MAX_PER_TOPIC,
+    max_scopes=settings.MORE_CONTEXT_CACHE_MAX_TOPICS,
+)
+_answers = SingleFlight("more_context_answer_singleflight")
+
+
+def more_context_scope(topic_id: int, model: str | None = None) -> str:
+    """Cache scope (and ``generated_contents.cache_key``) of a topic's follow-up answers.
+
+    Answers come from the primary model's scope; ``model`` names the scope of another model's answers.
+    """
+    model = model or settings.tier_model(settings.endpoint_tier("more_context"), settings.LLM_PROVIDER)
+    return make_key("more_context", topic_id, model, PROMPT_VERSION)
+
+
+async def _warm(session: AsyncSession, scope: str) -> None:
+    """Load a topic's stored answers into the semantic cache the first time this worker sees it."""
+    if scope in more_context_cache:
+        return
+    records = await content_service.list_content_by_key(session, scope, settings.MORE_CONTEXT_CACHE_MAX_PER_TOPIC)
+    for record in reversed(records):  # oldest first, so the newest answer wins on duplicates
+        question = record.content_json.get("question")
+        if question:
+            more_context_cache.add(scope, question, _answer(record.content_json))
+    more_context_cache.mark_loaded(scope)
+
+
+def _answer(result: dict) -> dict:
+    return {
+        "explanation": result["explanation"],
+        "code_examples": result.get("code_examples", []),
+        "model_tier": result.get("model_tier"),
+    }
+
+
+async def _lesson_context(session: AsyncSession, topic: TopicDetail) -> str:
+    """Explanation of the newest lesson stored for the topic, or a one-line outline."""
+    cached = await content_service.list_content_for_topic(session, topic.id)
+    lessons = [c for c in cached if c.content_type == "lesson"]
+    if lessons:
+        latest = max(lessons, key=lambda c: c.created_at)
+        explanation = latest.content_json.get("explanation", "")
+        if explanation:
+            return explanation
+    return f"Topic: {topic.title}. Sub-topics: {', '.join(s.content for s in topic.sub_topics)}"
+
+
+async def get_or_generate_more_context(
+    session: AsyncSession,
+    topic: TopicDetail,
+    question: str,
+    existing_explanation: str | None = None,
+    priority: Priority = Priority.INTERACTIVE,
+) -> dict:
+    """Answer a follow-up question: ``{explanation, code_examples, cached, similarity}``.
+
+    ``similarity`` is that of the closest stored question (None if the cache is disabled).
+    """
+    scope = more_context_scope(topic.id)
+    similarity = None
+    if settings.MORE_CONTEXT_CACHE_ENABLED:
+        await _warm(session, scope)
+        answer, similarity = more_context_cache.lookup(scope, question)
+        if answer is not None:
+            return {**answer, "cached": True, "similarity": round(similarity, 3)}
+
+    existing_explanation = existing_explanation or await _lesson_context(session, topic)
+    # Concurrent misses for one question share a single generate + save; each caller gets its own copy.
+    key = make_key(priority.name, scope, question, existing_explanation)
+    answer = await _answers.do(key, lambda: _generate_and_store(topic, scope, question, existing_explanation, priority))
+    return {
+        **copy.deepcopy(answer),
+        "cached": False,
+        "similarity": round(similarity, 3) if similarity is not None else None,
+    }
+
+
+async def _generate_and_store(
+    topic: TopicDetail,
+    scope: str,
+    question: str,
+    existing_explanation: str,
+    priority: Priority,
+) -> dict:
+    """Generate the answer, save it with its usage accounting and add it to the semantic cache.
+
+    Runs once per question however many callers are waiting, with its own DB
+    session since the caller that started it may leave before it finishes.
+    An answer from another model than the primary one (SLO downgrade, provider
+    failover) is saved under that model's scope and not added to the cache.
+    """
+    result = await generate_more_context(
+        topic_title=topic.title,
+        existing_explanation=existing_explanation,
+        user_question=question,
+        priority=priority,
+    )
+    answer = _answer(result)
+    served_scope = more_context_scope(topic.id, result.get("model_used"))
+    async with async_session() as session:
+        await content_service.save_content(
+            session=session,
+            topic_id=topic.id,
+            content_type="more_context",
+            content_json={"question": question, **answer},
+            model_used=result.get("model_used", settings.LLM_MODEL),
+            cache_key=served_scope,
+            usage=result.get("usage"),
+        )
+    if served_scope == scope:
+        more_context_cache.add(scope, question, answer)
+    return answer
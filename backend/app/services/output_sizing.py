@@ -0,0 +1,78 @@
+"""Output sizing – how much to ask the LLM for, and the max_tokens that fits it.
+
+Every prompt states its quantities (quiz questions and code examples per
+sub-topic, questions per quiz), so the length of the answer can be estimated
+before the call from a few per-item token costs. The estimate sets the call's
+max_tokens (with headroom) and, for lessons, lowers the number of quiz
+questions per sub-topic until the whole lesson fits LLM_MAX_TOKENS.
+
+The per-item costs are rough; every generation records its estimate next to
+the completion tokens actually used (``llm.output_estimate_ratio.*`` in
+GET /metrics, ``estimated_tokens`` in generated_contents) so they can be tuned.
+"""
+
+import math
+from dataclasses import dataclass
+
+from app.config import settings
+
+# Completion tokens per item of a response.
+LESSON_BASE_TOKENS = 350  # JSON structure, key points, formulas, further reading
+EXPLANATION_TOKENS = 500  # Markdown explanation of one sub-topic
+CODE_EXAMPLE_TOKENS = 220  # code plus its explanation
+LESSON_QUIZ_TOKENS = 90  # one lesson Knowledge Check question
+QUIZ_BASE_TOKENS = 30
+QUIZ_QUESTION_TOKENS = 110  # a quiz-bank question also names its sub-topic
+MORE_CONTEXT_TOKENS = 1200  # follow-up explanation with one or two code examples
+
+
+@dataclass(frozen=True)
+class OutputPlan:
+    """Quantities to request and the response size they imply."""
+
+    estimated_tokens: int
+    max_tokens: int
+    quiz_per_sub_topic: int = 0
+    code_per_sub_topic: int = 0
+
+
+def max_tokens_for(estimated_tokens: int) -> int:
+    """The call's max_tokens: the estimate plus headroom, within [LLM_MIN_MAX_TOKENS, LLM_MAX_TOKENS]."""
+    if not settings.LLM_ADAPTIVE_MAX_TOKENS:
+        return settings.LLM_MAX_TOKENS
+    sized = math.ceil(estimated_tokens * settings.LLM_MAX_TOKENS_HEADROOM)
+    return max(settings.LLM_MIN_MAX_TOKENS, min(sized, settings.LLM_MAX_TOKENS))
+
+
+def _lesson_tokens(sub_topics: int, code_per_sub_topic: int, quiz_per_sub_topic: int) -> int:
+    per_sub_topic = (
+        EXPLANATION_TOKENS
+        + code_per_sub_topic * CODE_EXAMPLE_TOKENS
+        + quiz_per_sub_topic * LESSON_QUIZ_TOKENS
+    )
+    return LESSON_BASE_TOKENS + sub_topics * per_sub_topic
+
+
+def plan_lesson(sub_topic_count: int, include_code: bool = True, include_quiz: bool = True) -> OutputPlan:
+    """Plan a lesson (or one fan-out section) covering ``sub_topic_count`` sub-topics.
+
+    Quiz questions per sub-topic start at LESSON_QUIZ_PER_SUB_TOPIC and are
+    lowered (to no fewer than one) while the estimate exceeds LLM_MAX_TOKENS.
+    Topics too large even then are left to fan-out or continuations.
+    """
+    sub_topics = max(sub_topic_count, 1)
+    code = settings.LESSON_CODE_PER_SUB_TOPIC if include_code else 0
+    quiz = settings.LESSON_QUIZ_PER_SUB_TOPIC if include_quiz else 0
+    while quiz > 1 and _lesson_tokens(sub_topics, code, quiz) > settings.LLM_MAX_TOKENS:
+        quiz -= 1
+    estimated = _lesson_tokens(sub_topics, code, quiz)
+    return OutputPlan(estimated, max_tokens_for(estimated), quiz, code)
+
+
+def plan_quiz(num_questions: int) -> OutputPlan:
+    estimated = QUIZ_BASE_TOKENS + num_questions * QUIZ_QUESTION_TOKENS
+    return OutputPlan(estimated, max_tokens_for(estimated))
+
+
+def plan_more_context() -> OutputPlan:
+    return OutputPlan(MORE_CONTEXT_TOKENS, max_tokens_for(MORE_CONTEXT_TOKENS))
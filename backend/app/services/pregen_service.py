@@ -0,0 +1,316 @@
+"""Pre-generation service – fill the lesson/quiz cache for every topic × level ahead of time.
+
+The syllabus is static, so a job walks all ``Topic`` rows, skips generation
+contexts already stored for the current model and prompt version (their cache
+keys exist in ``generated_contents``), and generates the rest with a bounded
+number of workers and a requests-per-minute cap on the LLM provider. Its calls
+queue behind student requests in admission control (``Priority.BACKGROUND``).
+
+Finished cache keys are appended to a checkpoint file, so an interrupted job
+resumes where it stopped even before its results are visible in Postgres.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session
+from app.models.syllabus import Topic
+from app.schemas.content import LearnRequest
+from app.services import content_service, lesson_service, quiz_service, syllabus_service
+from app.services.admission import Priority
+from app.services.cache_service import quiz_cache_key
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("lesson", "quiz")
+_KEY_LOOKUP_BATCH = 500
+_MAX_ERRORS_KEPT = 20
+
+
+@dataclass(frozen=True)
+class PregenItem:
+    """One generation context: a lesson at a user level, or a quiz at a difficulty."""
+    topic_id: int
+    kind: str
+    level: str
+    key: str
+
+
+class RateLimiter:
+    """Spaces calls at least ``60 / requests_per_minute`` seconds apart (0 = unlimited)."""
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60 / requests_per_minute if requests_per_minute > 0 else 0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class PregenJob:
+    """A single pre-generation run and its progress counters."""
+
+    def __init__(
+        self,
+        levels: list[str],
+        kinds: list[str],
+        quiz_difficulties: list[str],
+        concurrency: int,
+        requests_per_minute: float,
+        checkpoint_path: str | None,
+        topic_ids: list[int] | None = None,
+        limit: int | None = None,
+    ):
+        self.levels = levels
+        self.kinds = kinds
+        self.quiz_difficulties = quiz_difficulties
+        self.concurrency = max(concurrency, 1)
+        self.requests_per_minute = requests_per_minute
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.topic_ids = topic_ids
+        self.limit = limit
+
+        self.state = "pending"  # pending | planning | running | finished | cancelled | failed
+        self.total = 0
+        self.skipped = 0
+        self.generated = 0
+        self.failed = 0
+        self.in_progress = 0
+        self.errors: list[str] = []
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self._started_monotonic = 0.0
+        self._limiter = RateLimiter(requests_per_minute)
+        self.task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.state in ("pending", "planning", "running")
+
+    def progress(self) -> dict:
+        """Point-in-time progress report (also served by GET /admin/pregenerate)."""
+        remaining = self.total - self.skipped - self.generated - self.failed
+        elapsed = time.monotonic() - self._started_monotonic if self.started_at else 0.0
+        rate = self.generated / elapsed * 60 if elapsed > 0 else 0.0
+        eta = remaining / rate * 60 if rate > 0 and self.state == "running" else None
+        return {
+            "state": self.state,
+            "total": self.total,
+            "skipped": self.skipped,
+            "generated": self.generated,
+            "failed": self.failed,
+            "in_progress": self.in_progress,
+            "remaining": remaining,
+            "generated_per_minute": round(rate, 2),
+            "eta_seconds": round(eta) if eta is not None else None,
+            "levels": self.levels,
+            "kinds": self.kinds,
+            "concurrency": self.concurrency,
+            "requests_per_minute": self.requests_per_minute,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "recent_errors": self.errors[-_MAX_ERRORS_KEPT:],
+        }
+
+    async def run(self) -> dict:
+        """Plan, skip cached items and generate the rest. Returns the final progress."""
+        self.started_at = datetime.now(timezone.utc)
+        self._started_monotonic = time.monotonic()
+        try:
+            self.state = "planning"
+            pending = await self._plan()
+            self.state = "running"
+            logger.info(
+                "Pre-generation: %d items, %d already cached, %d to generate (concurrency=%d, rpm=%g)",
+                self.total, self.skipped, len(pending), self.concurrency, self.requests_per_minute,
+            )
+            queue: asyncio.Queue[PregenItem] = asyncio.Queue()
+            for item in pending:
+                queue.put_nowait(item)
+            workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+            self.state = "finished"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception:
+            self.state = "failed"
+            logger.exception("Pre-generation job failed")
+        finally:
+            self.finished_at = datetime.now(timezone.utc)
+            logger.info("Pre-generation %s: %s", self.state, self._summary())
+        return self.progress()
+
+    async def _plan(self) -> list[PregenItem]:
+        async with async_session() as session:
+            stmt = select(Topic.id).order_by(Topic.id)
+            if self.topic_ids:
+                stmt = stmt.where(Topic.id.in_(self.topic_ids))
+            topic_ids = list((await session.execute(stmt)).scalars().all())
+
+            items = [item for topic_id in topic_ids for item in self._items_for(topic_id)]
+            if self.limit is not None:
+                items = items[:self.limit]
+
+            done = self._read_checkpoint()
+            keys = [item.key for item in items if item.key not in done]
+            for i in range(0, len(keys), _KEY_LOOKUP_BATCH):
+                done |= await content_service.existing_cache_keys(session, keys[i:i + _KEY_LOOKUP_BATCH])
+
+        self.total = len(items)
+        pending = [item for item in items if item.key not in done]
+        self.skipped = self.total - len(pending)
+        metrics.incr("pregen.skipped", self.skipped)
+        return pending
+
+    def _items_for(self, topic_id: int) -> list[PregenItem]:
+        items = []
+        if "lesson" in self.kinds:
+            for level in self.levels:
+                # Same key as POST /learn with default options and as GET /learn/{id}/stream.
+                key = lesson_service.stream_cache_key(topic_id, level)
+                items.append(PregenItem(topic_id, "lesson", level, key))
+        if "quiz" in self.kinds:
+            for difficulty in self.quiz_difficulties:
+                key = quiz_cache_key(topic_id, difficulty)
+                items.append(PregenItem(topic_id, "quiz", difficulty, key))
+        return items
+
+    async def _worker(self, queue: asyncio.Queue[PregenItem]) -> None:
+        while not queue.empty():
+            item = queue.get_nowait()
+            await self._limiter.wait()
+            self.in_progress += 1
+            try:
+                await self._generate(item)
+            except Exception as exc:
+                self.failed += 1
+                metrics.incr("pregen.failed")
+                self.errors = (self.errors + [f"topic {item.topic_id} {item.kind}/{item.level}: {exc}"])[-_MAX_ERRORS_KEPT:]
+                logger.warning("Pre-generation failed for topic_id=%d %s/%s: %s", item.topic_id, item.kind, item.level, exc)
+            else:
+                self.generated += 1
+                metrics.incr("pregen.generated")
+                self._write_checkpoint(item.key)
+            finally:
+                self.in_progress -= 1
+            done = self.generated + self.failed
+            if done % 10 == 0:
+                logger.info("Pre-generation progress: %s", self._summary())
+
+    async def _generate(self, item: PregenItem) -> None:
+        async with async_session() as session:
+            topic = await syllabus_service.get_topic_detail(session, item.topic_id)
+            if topic is None:
+                raise LookupError("topic not found")
+            if item.kind == "lesson":
+                body = LearnRequest(user_level=item.level)
+                lesson = await lesson_service.get_or_generate_lesson(session, topic, body, priority=Priority.BACKGROUND)
+                # Not cached for the primary model, so it must not be checkpointed either: count it as failed.
+                if lesson.get("truncated"):
+                    raise ValueError("lesson truncated at the output limit – not cached")
+                served_key = lesson_service.request_cache_key(topic.id, body, lesson.get("model_used"))
+                if served_key != lesson_service.request_cache_key(topic.id, body):
+                    raise ValueError(f"lesson served by fallback model {lesson.get('model_used')} – not cached")
+            else:
+                await quiz_service.top_up(session, topic, item.level, priority=Priority.BACKGROUND)
+
+    def _read_checkpoint(self) -> set[str]:
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return set()
+        return {line.strip() for line in self.checkpoint_path.read_text().splitlines() if line.strip()}
+
+    def _write_checkpoint(self, key: str) -> None:
+        if self.checkpoint_path is None:
+            return
+        with self.checkpoint_path.open("a") as f:
+            f.write(key + "\n")
+
+    def _summary(self) -> str:
+        p = self.progress()
+        eta = f", ETA {p['eta_seconds']} s" if p["eta_seconds"] is not None else ""
+        return (
+            f"{p['generated']} generated, {p['skipped']} cached, {p['failed']} failed, "
+            f"{p['remaining']} remaining of {p['total']} ({p['generated_per_minute']}/min{eta})"
+        )
+
+
+def split_setting(value: str) -> list[str]:
+    """Split a comma-separated setting such as PREGEN_LEVELS."""
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def new_job(
+    levels: list[str] | None = None,
+    kinds: list[str] | None = None,
+    quiz_difficulties: list[str] | None = None,
+    concurrency: int | None = None,
+    requests_per_minute: float | None = None,
+    checkpoint_path: str | None = None,
+    topic_ids: list[int] | None = None,
+    limit: int | None = None,
+) -> PregenJob:
+    """Build a job, filling unset options from settings."""
+    return PregenJob(
+        levels=levels or split_setting(settings.PREGEN_LEVELS),
+        kinds=[k for k in (kinds or KINDS) if k in KINDS],
+        quiz_difficulties=quiz_difficulties or split_setting(settings.PREGEN_QUIZ_DIFFICULTIES),
+        concurrency=concurrency or settings.PREGEN_CONCURRENCY,
+        requests_per_minute=(
+            requests_per_minute if requests_per_minute is not None else settings.PREGEN_REQUESTS_PER_MINUTE
+        ),
+        checkpoint_path=checkpoint_path if checkpoint_path is not None else settings.PREGEN_CHECKPOINT_PATH_RESOLVED,
+        topic_ids=topic_ids,
+        limit=limit,
+    )
+
+
+# The job started from the admin API; at most one runs per process.
+_current_job: PregenJob | None = None
+
+
+def get_job() -> PregenJob | None:
+    return _current_job
+
+
+def start_job(job: PregenJob) -> PregenJob:
+    """Run ``job`` in the background. Raises RuntimeError if another job is running."""
+    global _current_job
+    if _current_job is not None and _current_job.running:
+        raise RuntimeError("A pre-generation job is already running")
+    _current_job = job
+    job.task = asyncio.create_task(job.run())
+    return job
+
+
+async def cancel_job() -> bool:
+    """Cancel the running job, if any. Returns True if one was cancelled."""
+    job = _current_job
+    if job is None or job.task is None or job.task.done():
+        return False
+    job.task.cancel()
+    try:
+        await job.task
+    except asyncio.CancelledError:
+        pass
+    return True
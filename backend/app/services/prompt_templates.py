@@ -6,16 +6,19 @@ Follows the HLD prompt architecture (~1,980 tokens):
   Few-Shot Example (~700 tok) + User Query (~30 tok)
 """
 
+import hashlib
+from pathlib import Path
+
 SYSTEM_PROMPT = """You are StudyAI, an expert AI/ML teacher and mentor. Your role is to teach complex technical topics in a clear, structured, and engaging manner.
 
 ## Your Teaching Style
 - Break down complex concepts into digestible pieces
 - Use real-world analogies and practical examples
-- Include MANY working code examples with detailed explanations (aim for 5+ examples when relevant)
+- Include working code examples with detailed explanations (as many as the student asks for)
 - Use mathematical notation (LaTeX) when relevant
 - Provide quiz questions to test understanding
 - Adapt to the student's level (beginner / intermediate / advanced)
-- Generate as much comprehensive content as possible – be thorough and include abundant examples
+- Be thorough within the amount of content the student asks for
 
 ## Output Format
 You MUST respond in valid JSON with this exact structure:
@@ -42,7 +45,7 @@ You MUST respond in valid JSON with this exact structure:
 }}
 
 ## Knowledge Check (Quiz) Requirements
-- Generate 10-20 questions PER sub-topic (minimum 10, up to 20 each).
+- Generate exactly the number of questions PER sub-topic that the student asks for.
 - Match question difficulty to the student level:
   - beginner: simple recall, definitions, foundational concepts
   - intermediate: applied scenarios, moderate depth, practical application
@@ -73,8 +76,10 @@ def build_user_context(
     focus_areas: list[str] | None = None,
     include_code: bool = True,
     include_quiz: bool = True,
+    quiz_per_sub_topic: int = 10,
+    code_per_sub_topic: int = 2,
 ) -> str:
-    """Build user personalisation context."""
+    """Build user personalisation context, including how much of each part to generate."""
     level_guide = {
         "beginner": "Quiz: simple recall, definitions, foundational concepts.",
         "intermediate": "Quiz: applied scenarios, practical application, moderate depth.",
@@ -83,7 +88,11 @@ def build_user_context(
     parts = [f"## Student Context\nLevel: {user_level}"]
     parts.append(level_guide.get(user_level.lower(), level_guide["intermediate"]))
     if include_quiz:
-        parts.append("Generate 10-20 Knowledge Check questions per sub-topic, all matching the student level above.")
+        parts.append(
+            f"Generate {quiz_per_sub_topic} Knowledge Check questions per sub-topic, all matching the student level above."
+        )
+    if include_code:
+        parts.append(f"Include about {code_per_sub_topic} code examples per sub-topic.")
     if focus_areas:
         parts.append(f"Focus areas: {', '.join(focus_areas)}")
     if not include_code:
@@ -102,10 +111,14 @@ def build_teach_prompt(
     focus_areas: list[str] | None = None,
     include_code: bool = True,
     include_quiz: bool = True,
+    quiz_per_sub_topic: int = 10,
+    code_per_sub_topic: int = 2,
 ) -> list[dict[str, str]]:
     """Build the complete message list for the LLM."""
     syllabus_ctx = build_syllabus_context(main_topic, unit_name, topic_title, sub_topics)
-    user_ctx = build_user_context(user_level, focus_areas, include_code, include_quiz)
+    user_ctx = build_user_context(
+        user_level, focus_areas, include_code, include_quiz, quiz_per_sub_topic, code_per_sub_topic
+    )
 
     return [
         {"role": "system", "content": SYSTEM_PROMPT},
@@ -117,9 +130,51 @@ def build_teach_prompt(
 
 Teach me: {topic_title}
 
-Cover ALL the sub-topics listed above comprehensively. Provide abundant practical examples and working code – include as many examples as possible to illustrate each concept. Be thorough and detailed.
+Cover ALL the sub-topics listed above comprehensively, with practical examples and working code. Be thorough and detailed.
 
-For the Knowledge Check quiz: generate 10-20 questions per sub-topic. Match difficulty to my level ({user_level}).""",
+For the Knowledge Check quiz: generate {quiz_per_sub_topic} questions per sub-topic. Match difficulty to my level ({user_level}).""",
+        },
+    ]
+
+
+def build_section_prompt(
+    main_topic: str,
+    unit_name: str,
+    topic_title: str,
+    sub_topics: list[str],
+    section: list[str],
+    user_level: str = "beginner",
+    focus_areas: list[str] | None = None,
+    include_code: bool = True,
+    include_quiz: bool = True,
+    quiz_per_sub_topic: int = 10,
+    code_per_sub_topic: int = 2,
+) -> list[dict[str, str]]:
+    """Build the message list for one section of a fanned-out lesson.
+
+    The whole topic is given as context, but only ``section`` is taught; the
+    other sections are generated by parallel requests and merged afterwards.
+    """
+    syllabus_ctx = build_syllabus_context(main_topic, unit_name, topic_title, sub_topics)
+    user_ctx = build_user_context(
+        user_level, focus_areas, include_code, include_quiz, quiz_per_sub_topic, code_per_sub_topic
+    )
+    bullets = "\n".join(f"  - {st}" for st in section)
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": f"""{syllabus_ctx}
+
+{user_ctx}
+
+Teach me ONLY this part of "{topic_title}":
+{bullets}
+
+The other sub-topics are taught separately – do not introduce the whole topic and do not cover them. Start the explanation with a "## " heading per sub-topic of this part. Provide practical examples and working code. Be thorough and detailed.
+
+For the Knowledge Check quiz: generate {quiz_per_sub_topic} questions per sub-topic of this part. Match difficulty to my level ({user_level}).""",
         },
     ]
 
@@ -134,7 +189,8 @@ Respond in valid JSON:
       "question": "Clear, specific question",
       "options": ["A", "B", "C", "D"],
       "correct_index": 0,
-      "explanation": "Why the correct answer is right and others are wrong"
+      "explanation": "Why the correct answer is right and others are wrong",
+      "sub_topic": "The sub-topic this question tests, copied exactly from the list"
     }}
   ]
 }}
@@ -176,7 +232,7 @@ def build_more_context_prompt(
             "content": f"""Topic: {topic_title}
 
 ## Existing lesson content the student has already seen:
-{existing_explanation[:8000]}
+{existing_explanation}
 
 ---
 
@@ -191,8 +247,9 @@ def build_quiz_prompt(
     topic_title: str,
     sub_topics: list[str],
     num_questions: int = 5,
+    difficulty: str = "intermediate",
 ) -> list[dict[str, str]]:
-    """Build prompt for quiz generation."""
+    """Build prompt for quiz generation at one difficulty."""
     bullets = "\n".join(f"  - {st}" for st in sub_topics)
     return [
         {"role": "system", "content": QUIZ_SYSTEM_PROMPT},
@@ -203,6 +260,19 @@ def build_quiz_prompt(
 Sub-topics:
 {bullets}
 
-Generate {num_questions} multiple-choice questions covering these sub-topics.""",
+Difficulty: {difficulty}
+
+Generate {num_questions} multiple-choice questions covering these sub-topics, all at {difficulty} difficulty.
+Each question must test something different.""",
         },
     ]
+
+
+# Sent after a response that stopped at max_tokens, together with that partial response.
+CONTINUATION_PROMPT = """Your previous response was cut off because it reached the length limit.
+Continue EXACTLY where it stopped: output only the remaining characters, starting with the very next character, so that the two parts joined together form the complete JSON object.
+Do not repeat anything already written, do not restart the JSON, and do not add code fences or commentary."""
+
+
+# Hash of this module's source – any template change invalidates cached content.
+PROMPT_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
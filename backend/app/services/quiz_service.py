@@ -0,0 +1,283 @@
+"""Quiz service – a per-topic question bank that quizzes are sampled from.
+
+Generated questions are stored one row per question in ``quiz_items``, tagged
+with topic, sub-topic and difficulty and de-duplicated by a hash of their
+normalised text. A quiz is ``num_questions`` random items from the bank for
+the requested slice. The LLM is only called when the slice holds fewer items
+than requested (synchronously) or fewer than QUIZ_BANK_TARGET_SIZE (in the
+background, after the quiz has been served).
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+from collections import Counter
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.content import QuizItem
+from app.schemas.syllabus import TopicDetail
+from app.services import content_service
+from app.services.admission import Priority
+from app.services.cache_service import quiz_cache_key
+from app.services.llm_service import generate_quiz
+from app.utils import metrics
+from app.utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Slices being topped up in the background, and strong references to those tasks.
+_refilling: set[tuple[int, str, int | None]] = set()
+_background_tasks: set[asyncio.Task] = set()
+_bank_fills = SingleFlight("quiz_bank_singleflight")
+
+
+def normalise_question(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace so rewordings of spacing/case match."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def question_hash(text: str) -> str:
+    return hashlib.sha256(normalise_question(text).encode()).hexdigest()
+
+
+def _valid(question: Any) -> bool:
+    if not isinstance(question, dict) or not str(question.get("question", "")).strip():
+        return False
+    options = question.get("options")
+    index = question.get("correct_index")
+    return (
+        isinstance(options, list) and len(options) >= 2
+        and isinstance(index, int) and 0 <= index < len(options)
+    )
+
+
+def _slice(stmt, topic_id: int, difficulty: str, sub_topic_id: int | None):
+    stmt = stmt.where(QuizItem.topic_id == topic_id, QuizItem.difficulty == difficulty)
+    if sub_topic_id is not None:
+        stmt = stmt.where(QuizItem.sub_topic_id == sub_topic_id)
+    return stmt
+
+
+async def count_items(session: AsyncSession, topic_id: int, difficulty: str, sub_topic_id: int | None = None) -> int:
+    """Number of banked questions for a topic and difficulty (optionally one sub-topic)."""
+    result = await session.execute(_slice(select(func.count(QuizItem.id)), topic_id, difficulty, sub_topic_id))
+    return result.scalar() or 0
+
+
+async def cached_topic_ids(session: AsyncSession, topic_ids: list[int], difficulty: str, num_questions: int) -> set[int]:
+    """The topics whose bank already holds ``num_questions`` questions at ``difficulty`` (one query)."""
+    if not topic_ids:
+        return set()
+    stmt = (
+        select(QuizItem.topic_id)
+        .where(QuizItem.topic_id.in_(topic_ids), QuizItem.difficulty == difficulty.strip().lower())
+        .group_by(QuizItem.topic_id)
+        .having(func.count(QuizItem.id) >= num_questions)
+    )
+    result = await session.execute(stmt)
+    return set(result.scalars().all())
+
+
+async def sample_items(
+    session: AsyncSession,
+    topic_id: int,
+    difficulty: str,
+    n: int,
+    sub_topic_id: int | None = None,
+) -> list[QuizItem]:
+    """Up to ``n`` random banked questions for the slice."""
+    stmt = _slice(select(QuizItem), topic_id, difficulty, sub_topic_id).order_by(func.random()).limit(n)
+    result = await session.execute(stmt)
+    return list(result.scalars().all())
+
+
+async def add_questions(
+    session: AsyncSession,
+    topic: TopicDetail,
+    difficulty: str,
+    questions: list[dict],
+    model_used: str | None,
+    sub_topic_id: int | None = None,
+    model_tier: str | None = None,
+) -> int:
+    """Bank generated questions, skipping invalid ones and duplicates. Returns how many were added.
+
+    Questions are tagged with ``sub_topic_id`` when the batch was generated for
+    one sub-topic, otherwise with the sub-topic the LLM named (if it matches).
+    """
+    sub_topic_ids = {normalise_question(s.content): s.id for s in topic.sub_topics}
+    rows: dict[str, dict] = {}
+    for q in questions:
+        if not _valid(q):
+            continue
+        text_hash = question_hash(q["question"])
+        rows.setdefault(text_hash, {
+            "topic_id": topic.id,
+            "sub_topic_id": sub_topic_id or sub_topic_ids.get(normalise_question(str(q.get("sub_topic", "")))),
+            "difficulty": difficulty,
+            "question": q["question"].strip(),
+            "options": [str(o) for o in q["options"]],
+            "correct_index": q["correct_index"],
+            "explanation": str(q.get("explanation", "")),
+            "text_hash": text_hash,
+            "model_used": model_used,
+            "model_tier": model_tier,
+        })
+    if not rows:
+        return 0
+    stmt = (
+        insert(QuizItem)
+        .values(list(rows.values()))
+        .on_conflict_do_nothing(index_elements=["topic_id", "text_hash"])
+        .returning(QuizItem.id)
+    )
+    added = len((await session.execute(stmt)).all())
+    await session.commit()
+    metrics.incr("quiz_bank.added", added)
+    metrics.incr("quiz_bank.skipped", len(questions) - added)  # invalid or already banked
+    return added
+
+
+async def fill_bank(
+    topic: TopicDetail,
+    difficulty: str,
+    sub_topic_id: int | None = None,
+    needed: int = 0,
+    priority: Priority = Priority.QUIZ,
+) -> int:
+    """Generate one batch of at least ``needed`` questions into the bank. Returns how many were added.
+
+    Concurrent fills of one slice and priority share a single generate + save,
+    and every caller returns once the questions are banked.
+    """
+    num_questions = max(settings.QUIZ_BANK_BATCH_SIZE, needed)
+    key = f"{priority.name}:{topic.id}:{difficulty}:{sub_topic_id}:{num_questions}"
+    return await _bank_fills.do(key, lambda: _generate_and_bank(topic, difficulty, sub_topic_id, num_questions, priority))
+
+
+async def _generate_and_bank(
+    topic: TopicDetail,
+    difficulty: str,
+    sub_topic_id: int | None,
+    num_questions: int,
+    priority: Priority,
+) -> int:
+    """Generate a batch, save it with its usage accounting and bank its questions.
+
+    Runs once per slice however many callers are waiting, with its own DB
+    session since the caller that started it may leave before it finishes.
+    """
+    sub_topics = [s for s in topic.sub_topics if sub_topic_id is None or s.id == sub_topic_id]
+    result = await generate_quiz(
+        topic_title=topic.title,
+        sub_topics=[s.content for s in sub_topics],
+        num_questions=num_questions,
+        difficulty=difficulty,
+        priority=priority,
+    )
+    metrics.incr("quiz_bank.generations")
+    questions = result.get("questions") or []
+    if not questions:
+        return 0
+    # The generation result may be shared with other coalesced calls, so it is read, never modified.
+    async with async_session() as session:
+        await content_service.save_content(
+            session=session,
+            topic_id=topic.id,
+            content_type="quiz",
+            content_json={k: v for k, v in result.items() if k != "usage"},
+            model_used=result.get("model_used", settings.LLM_MODEL),
+            cache_key=quiz_cache_key(topic.id, difficulty, result.get("model_used")),
+            usage=result.get("usage"),
+        )
+        return await add_questions(
+            session, topic, difficulty, questions, result.get("model_used"), sub_topic_id, result.get("model_tier")
+        )
+
+
+async def top_up(
+    session: AsyncSession,
+    topic: TopicDetail,
+    difficulty: str,
+    sub_topic_id: int | None = None,
+    priority: Priority = Priority.BACKGROUND,
+) -> int:
+    """Generate a batch if the slice holds fewer than QUIZ_BANK_TARGET_SIZE questions."""
+    available = await count_items(session, topic.id, difficulty, sub_topic_id)
+    if available >= settings.QUIZ_BANK_TARGET_SIZE:
+        return 0
+    return await fill_bank(
+        topic, difficulty, sub_topic_id,
+        needed=settings.QUIZ_BANK_TARGET_SIZE - available, priority=priority,
+    )
+
+
+def _schedule_top_up(topic: TopicDetail, difficulty: str, sub_topic_id: int | None) -> None:
+    slice_key = (topic.id, difficulty, sub_topic_id)
+    if slice_key in _refilling:
+        return
+    _refilling.add(slice_key)
+
+    async def run() -> None:
+        try:
+            async with async_session() as session:
+                await top_up(session, topic, difficulty, sub_topic_id)
+        except Exception:
+            logger.exception("Quiz bank top-up failed for topic_id=%d/%s", topic.id, difficulty)
+        finally:
+            _refilling.discard(slice_key)
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def get_or_generate_quiz(
+    session: AsyncSession,
+    topic: TopicDetail,
+    num_questions: int = 5,
+    difficulty: str = "intermediate",
+    sub_topic_id: int | None = None,
+    refresh: bool = False,
+    priority: Priority = Priority.QUIZ,
+) -> dict:
+    """Sample a quiz from the question bank, generating questions only when the slice is short.
+
+    ``refresh=True`` adds a newly generated batch before sampling.
+    """
+    difficulty = difficulty.strip().lower()
+    available = await count_items(session, topic.id, difficulty, sub_topic_id)
+
+    if refresh or available < num_questions:
+        metrics.incr("quiz_bank.refreshes" if refresh else "quiz_bank.misses")
+        await fill_bank(topic, difficulty, sub_topic_id, needed=num_questions - available, priority=priority)
+    else:
+        metrics.incr("quiz_bank.hits")
+        if available < settings.QUIZ_BANK_TARGET_SIZE:
+            _schedule_top_up(topic, difficulty, sub_topic_id)
+
+    items = await sample_items(session, topic.id, difficulty, num_questions, sub_topic_id)
+    models = Counter(item.model_used for item in items if item.model_used)
+    tiers = Counter(item.model_tier for item in items if item.model_tier)
+    return {
+        "questions": [
+            {
+                "id": item.id,
+                "sub_topic_id": item.sub_topic_id,
+                "question": item.question,
+                "options": item.options,
+                "correct_index": item.correct_index,
+                "explanation": item.explanation,
+            }
+            for item in items
+        ],
+        "model_used": models.most_common(1)[0][0] if models else None,
+        "model_tier": tiers.most_common(1)[0][0] if tiers else None,
+    }
@@ -0,0 +1,185 @@
+"""Per-scope semantic cache for short questions – hashed n-gram TF-IDF and cosine similarity.
+
+Questions are normalised, split into word unigrams, word bigrams and character
+trigrams, and hashed into ``dim`` buckets (the hashing trick, so there is no
+vocabulary to maintain). IDF weights come from every question the cache has
+seen. A lookup returns the stored answer of the most similar question in the
+same scope (e.g. one topic) if the cosine similarity reaches ``threshold``.
+
+Entries are kept sparse (bucket indices + term counts) and scored together
+with NumPy, so a lookup takes well under a millisecond.
+No external embedding service is involved.
+"""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from app.utils import metrics
+
+# Histogram buckets for the best similarity found per lookup.
+SIMILARITY_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0)
+
+
+def normalise_text(text: str) -> str:
+    """Lower-case, drop punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+class HashedTfidf:
+    """Hashed n-gram term counts plus running document frequencies for IDF."""
+
+    def __init__(self, dim: int = 1 << 14):
+        self.dim = dim
+        self.doc_freq = np.zeros(dim, dtype=np.float32)
+        self.docs = 0
+
+    def terms(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """Sparse term counts of ``text``: (bucket indices, counts)."""
+        words = normalise_text(text).split()
+        grams = [f"w:{w}" for w in words]
+        grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        for w in words:
+            padded = f"<{w}>"
+            grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        if not grams:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        buckets = np.fromiter((zlib.crc32(g.encode()) % self.dim for g in grams), dtype=np.int64, count=len(grams))
+        indices, counts = np.unique(buckets, return_counts=True)
+        return indices, counts.astype(np.float32)
+
+    def add_document(self, indices: np.ndarray) -> None:
+        self.doc_freq[indices] += 1
+        self.docs += 1
+
+    def remove_document(self, indices: np.ndarray) -> None:
+        self.doc_freq[indices] -= 1
+        self.docs -= 1
+
+    def idf(self, indices: np.ndarray) -> np.ndarray:
+        """Smoothed IDF, as in scikit-learn: ln((1 + n) / (1 + df)) + 1."""
+        return np.log((1 + self.docs) / (1 + self.doc_freq[indices])) + 1
+
+    def weights(self, indices: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """Sublinear TF × IDF."""
+        return (1 + np.log(counts)) * self.idf(indices)
+
+
+class _Scope:
+    """Questions and answers of one scope, with their terms flattened for vectorised scoring."""
+
+    def __init__(self):
+        self.entries: list[tuple[str, np.ndarray, np.ndarray, Any]] = []  # (normalised question, indices, counts, answer)
+        self._flat: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+
+    def flat(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(entry number, bucket index, count) of every term of every entry."""
+        if self._flat is None:
+            owners = [np.full(len(idx), i, dtype=np.int64) for i, (_, idx, _, _) in enumerate(self.entries)]
+            self._flat = (
+                np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64),
+                np.concatenate([e[1] for e in self.entries]) if self.entries else np.zeros(0, dtype=np.int64),
+                np.concatenate([e[2] for e in self.entries]) if self.entries else np.zeros(0, dtype=np.float32),
+            )
+        return self._flat
+
+    def changed(self) -> None:
+        self._flat = None
+
+
+class SemanticCache:
+    """Answers keyed by question similarity within a scope; LRU over scopes, FIFO within one."""
+
+    def __init__(self, name: str, threshold: float, max_per_scope: int, max_scopes: int, dim: int = 1 << 14):
+        self.name = name
+        self.threshold = threshold
+        self.max_per_scope = max_per_scope
+        self.max_scopes = max_scopes
+        self.vectorizer = HashedTfidf(dim)
+        self._scopes: OrderedDict[str, _Scope] = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def __contains__(self, scope: str) -> bool:
+        return scope in self._scopes
+
+    def lookup(self, scope: str, question: str) -> tuple[Any | None, float]:
+        """Return (answer, similarity) of the closest stored question, or (None, best similarity)."""
+        indices, counts = self.vectorizer.terms(question)
+        with self._lock:
+            entries = self._scopes.get(scope)
+            answer, similarity = None, 0.0
+            if entries is not None and entries.entries and len(indices):
+                self._scopes.move_to_end(scope)
+                answer, similarity = self._best(entries, indices, counts)
+            self.lookups += 1
+            hit = answer is not None and similarity >= self.threshold
+            if hit:
+                self.hits += 1
+        metrics.incr(f"{self.name}.hits" if hit else f"{self.name}.misses")
+        metrics.observe(f"{self.name}.similarity", similarity, SIMILARITY_BUCKETS)
+        return (answer if hit else None), similarity
+
+    def _best(self, entries: _Scope, indices: np.ndarray, counts: np.ndarray) -> tuple[Any, float]:
+        owners, flat_idx, flat_counts = entries.flat()
+        query = np.zeros(self.vectorizer.dim, dtype=np.float32)
+        query[indices] = self.vectorizer.weights(indices, counts)
+        stored = self.vectorizer.weights(flat_idx, flat_counts)
+        n = len(entries.entries)
+        dots = np.bincount(owners, weights=stored * query[flat_idx], minlength=n)
+        norms = np.sqrt(np.bincount(owners, weights=stored * stored, minlength=n)) * np.linalg.norm(query)
+        scores = np.divide(dots, norms, out=np.zeros(n), where=norms > 0)
+        best = int(np.argmax(scores))
+        return entries.entries[best][3], float(min(scores[best], 1.0))
+
+    def add(self, scope: str, question: str, answer: Any) -> None:
+        """Store an answer. A question already stored in the scope (after normalisation) is replaced."""
+        normalised = normalise_text(question)
+        indices, counts = self.vectorizer.terms(question)
+        if not len(indices):
+            return
+        with self._lock:
+            entries = self._scope(scope)
+            for i, entry in enumerate(entries.entries):
+                if entry[0] == normalised:
+                    self.vectorizer.remove_document(entry[1])
+                    del entries.entries[i]
+                    break
+            entries.entries.append((normalised, indices, counts, answer))
+            self.vectorizer.add_document(indices)
+            while len(entries.entries) > self.max_per_scope:
+                self.vectorizer.remove_document(entries.entries.pop(0)[1])
+            entries.changed()
+
+    def mark_loaded(self, scope: str) -> None:
+        """Create an (empty) scope so that callers can tell it has been warmed from storage."""
+        with self._lock:
+            self._scope(scope)
+
+    def _scope(self, scope: str) -> _Scope:
+        """Get or create a scope (most recently used), evicting the least recently used ones."""
+        entries = self._scopes.get(scope)
+        if entries is None:
+            entries = self._scopes[scope] = _Scope()
+            while len(self._scopes) > self.max_scopes:
+                _, evicted = self._scopes.popitem(last=False)
+                for _, idx, _, _ in evicted.entries:
+                    self.vectorizer.remove_document(idx)
+        self._scopes.move_to_end(scope)
+        return entries
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "scopes": len(self._scopes),
+                "entries": sum(len(s.entries) for s in self._scopes.values()),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else None,
+                "threshold": self.threshold,
+            }
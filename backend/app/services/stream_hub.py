@@ -0,0 +1,261 @@
+"""Broadcast hub – fan one upstream LLM token stream out to every concurrent SSE viewer.
+
+The first subscriber for a key starts the upstream stream; later subscribers
+join it, receive the tokens emitted so far (the backlog) and then live tokens.
+When the last subscriber leaves (and does not come back within a short grace
+period), or nobody starts reading a new stream, the upstream call is cancelled.
+"""
+
+import asyncio
+import itertools
+import logging
+import secrets
+import statistics
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+
+from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StreamLagError(Exception):
+    """A subscriber fell so far behind that its unread tokens were discarded."""
+
+
+class BroadcastStream:
+    """One upstream token stream shared by any number of subscribers.
+
+    Tokens are stored once in ``chunks``; each subscriber only keeps a cursor
+    into it. Memory is bounded by ``max_backlog_chars``: once exceeded, the
+    stream stops admitting new subscribers (they would need the full backlog)
+    and drops chunks every remaining subscriber has already read. A subscriber
+    still holding the stream over its bound is cut off with StreamLagError.
+    """
+
+    def __init__(self, key: str, hub: "StreamHub", max_backlog_chars: int):
+        self.key = key
+        self.id = secrets.token_hex(4)  # distinguishes this run in SSE event ids
+        self.max_backlog_chars = max_backlog_chars
+        self.chunks: list[str] = []
+        self.offset = 0  # absolute index of chunks[0] after compaction
+        self.size = 0  # characters currently held in chunks
+        self.joinable = True
+        self.done = False
+        self.error: BaseException | None = None
+        self._hub = hub
+        self._cursors: dict[int, int] = {}
+        self._lagged: set[int] = set()
+        self._ids = itertools.count()
+        self._changed = asyncio.Condition()
+        self._task: asyncio.Task | None = None
+        self._cancelled = False
+
+    @property
+    def failed(self) -> bool:
+        """Finished with an upstream error or was cancelled."""
+        return self.done and (self.error is not None or self._cancelled)
+
+    @property
+    def end(self) -> int:
+        """Absolute index one past the last received chunk."""
+        return self.offset + len(self.chunks)
+
+    def start(self, source: AsyncIterator[str]) -> None:
+        self._task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self.size += len(chunk)
+                    if self.size > self.max_backlog_chars:
+                        self._compact()
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self._cancelled = True
+            raise
+        except Exception as e:
+            logger.warning("Upstream stream %s failed: %s", self.key[:12], e)
+            self.error = e
+        finally:
+            if hasattr(source, "aclose"):
+                await source.aclose()
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+            self._hub._finished(self)
+
+    def _compact(self) -> None:
+        """Drop chunks all subscribers have read; cut off laggards still over the bound."""
+        self.joinable = False
+        active = {k: v for k, v in self._cursors.items() if k not in self._lagged}
+        while active:
+            low = min(active.values())
+            drop = low - self.offset
+            if drop > 0:
+                self.size -= sum(len(c) for c in self.chunks[:drop])
+                del self.chunks[:drop]
+                self.offset = low
+            if self.size <= self.max_backlog_chars:
+                return
+            laggard = min(active, key=active.get)
+            self._lagged.add(laggard)
+            del active[laggard]
+            metrics.incr("stream_hub.lagged_subscribers")
+        # Nobody left who still needs the backlog.
+        self.offset = self.end
+        self.chunks.clear()
+        self.size = 0
+
+    def subscribe(self) -> AsyncGenerator[str, None]:
+        """Return an iterator over the stream from its start.
+
+        The subscriber is registered on first read and released when the iterator
+        ends or is closed, so one that is never read (e.g. a response whose body
+        was never sent) holds nothing. Raises StreamLagError on first read if the
+        start has already been compacted away.
+        """
+        return self._iterate(next(self._ids))
+
+    async def _iterate(self, sub_id: int) -> AsyncGenerator[str, None]:
+        pos = self._cursors[sub_id] = 0
+        try:
+            while True:
+                async with self._changed:
+                    while pos >= self.end and not self.done:
+                        await self._changed.wait()
+                    if sub_id in self._lagged or pos < self.offset:
+                        raise StreamLagError(f"subscriber fell behind on stream {self.key[:12]}")
+                    new = self.chunks[pos - self.offset:]
+                    finished = self.done
+                for chunk in new:
+                    yield chunk
+                pos += len(new)
+                self._cursors[sub_id] = pos
+                if finished and pos >= self.end:
+                    if self.error is not None:
+                        raise self.error
+                    return
+        finally:
+            self._cursors.pop(sub_id, None)
+            self._lagged.discard(sub_id)
+            self._hub._release(self)
+
+    def cancel(self) -> bool:
+        """Cancel the upstream call; False if it has already finished or been cancelled."""
+        if self._task is None or self._task.done() or self._task.cancelling():
+            return False
+        self._task.cancel()
+        return True
+
+
+class StreamHub:
+    """Registry of live (and recently finished) broadcast streams, keyed by generation context.
+
+    A stream whose last subscriber leaves keeps generating for
+    ``disconnect_grace_seconds`` so a dropped client can reconnect and resume;
+    after that the upstream call is cancelled. So is a new stream that nobody
+    has started reading within ``first_read_timeout_seconds``. A stream that
+    finished is kept for ``resume_grace_seconds`` so reconnects can replay it
+    without the LLM.
+    """
+
+    def __init__(
+        self,
+        max_backlog_chars: int,
+        disconnect_grace_seconds: float = 0,
+        resume_grace_seconds: float = 0,
+        first_read_timeout_seconds: float = 10.0,
+    ):
+        self.max_backlog_chars = max_backlog_chars
+        self.disconnect_grace_seconds = disconnect_grace_seconds
+        self.resume_grace_seconds = resume_grace_seconds
+        self.first_read_timeout_seconds = first_read_timeout_seconds
+        self._streams: dict[str, BroadcastStream] = {}
+        # Chunk counts of recently completed streams – estimates what a cancel saves.
+        self._completed_lengths: deque[int] = deque(maxlen=100)
+
+    def join(
+        self,
+        key: str,
+        source_factory: Callable[[], AsyncIterator[str]],
+        fresh: bool = False,
+    ) -> BroadcastStream:
+        """Return the stream for ``key``, starting one via ``source_factory`` if needed.
+
+        ``fresh=True`` (a refresh) replaces a finished stream kept for resumes
+        instead of replaying it; a stream still generating is joined either way.
+        """
+        stream = self._streams.get(key)
+        if stream is None or not stream.joinable or stream.failed or (fresh and stream.done):
+            stream = BroadcastStream(key, self, self.max_backlog_chars)
+            self._streams[key] = stream
+            stream.start(source_factory())
+            asyncio.get_running_loop().call_later(self.first_read_timeout_seconds, self._release, stream)
+            metrics.incr("stream_hub.upstream_streams")
+        else:
+            metrics.incr("stream_hub.joined_streams")
+        return stream
+
+    def get(self, key: str) -> BroadcastStream | None:
+        """Return the live or retained stream for ``key`` without starting one."""
+        return self._streams.get(key)
+
+    def _release(self, stream: BroadcastStream) -> None:
+        if stream._cursors or stream.done:
+            return
+        if self.disconnect_grace_seconds > 0:
+            asyncio.get_running_loop().call_later(
+                self.disconnect_grace_seconds, self._cancel_if_idle, stream
+            )
+        else:
+            self._cancel_if_idle(stream)
+
+    def _cancel_if_idle(self, stream: BroadcastStream) -> None:
+        if stream._cursors or stream.done:
+            return
+        if not stream.cancel():
+            return  # both the disconnect grace and the first-read timeout can get here
+        logger.info("No subscribers left on stream %s – cancelled upstream", stream.key[:12])
+        self._forget(stream)
+        self._record_cancel(stream.end)
+
+    def _record_cancel(self, generated: int) -> None:
+        """Count tokens thrown away by a cancelled stream and (estimated) never generated.
+
+        Providers stream roughly one token per chunk, so chunks stand in for tokens.
+        """
+        metrics.incr("stream_hub.cancelled_streams")
+        metrics.incr("stream_hub.tokens_wasted", generated)
+        if self._completed_lengths:
+            expected = statistics.mean(self._completed_lengths)
+            metrics.incr("stream_hub.tokens_saved_estimate", max(0, round(expected - generated)))
+
+    def _finished(self, stream: BroadcastStream) -> None:
+        if stream.failed:
+            self._forget(stream)
+            return
+        self._completed_lengths.append(stream.end)
+        if self.resume_grace_seconds <= 0:
+            self._forget(stream)
+            return
+        # Keep the finished stream around so reconnects can replay it.
+        asyncio.get_running_loop().call_later(self.resume_grace_seconds, self._forget, stream)
+
+    def _forget(self, stream: BroadcastStream) -> None:
+        if self._streams.get(stream.key) is stream:
+            del self._streams[stream.key]
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+
+lesson_stream_hub = StreamHub(
+    max_backlog_chars=settings.STREAM_HUB_MAX_BACKLOG_CHARS,
+    disconnect_grace_seconds=settings.STREAM_DISCONNECT_GRACE_SECONDS,
+    resume_grace_seconds=settings.STREAM_RESUME_GRACE_SECONDS,
+    first_read_timeout_seconds=settings.STREAM_FIRST_READ_TIMEOUT_SECONDS,
+)
@@ -84,7 +84,32 @@ async def get_topic_detail(session: AsyncSession, topic_id: int) -> TopicDetail
     topic = result.scalars().first()
     if topic is None:
         return None
+    return _topic_detail(topic)
 
+
+async def get_topic_details(session: AsyncSession, topic_ids: list[int]) -> dict[int, TopicDetail]:
+    """Like ``get_topic_detail`` for many topics at once; unknown ids are left out."""
+    stmt = (
+        select(Topic)
+        .options(
+            selectinload(Topic.sub_topics),
+            selectinload(Topic.unit).selectinload(Unit.main_topic),
+        )
+        .where(Topic.id.in_(topic_ids))
+    )
+    result = await session.execute(stmt)
+    return {topic.id: _topic_detail(topic) for topic in result.scalars().all()}
+
+
+async def list_unit_topic_ids(session: AsyncSession, unit_id: int) -> list[int] | None:
+    """Ids of a unit's topics in syllabus order, or None if the unit does not exist."""
+    if await session.get(Unit, unit_id) is None:
+        return None
+    result = await session.execute(select(Topic.id).where(Topic.unit_id == unit_id).order_by(Topic.id))
+    return list(result.scalars().all())
+
+
+def _topic_detail(topic: Topic) -> TopicDetail:
     return TopicDetail(
         id=topic.id,
         number=topic.number,
@@ -0,0 +1,128 @@
+"""Token-budgeted context selection – pick the lesson sections most relevant to a question.
+
+The lesson Markdown is split into sections at its headings (long sections
+further at blank lines, then line breaks, then sentence ends), every section is scored against the question with
+Okapi BM25, and the best-scoring sections are packed into a token budget. The
+chosen sections are returned in lesson order, with ``...`` where sections were
+left out, so the prompt still reads like the lesson.
+"""
+
+import math
+import re
+from collections import Counter
+
+# Rough size of a token for English prose and code; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+_HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+_WORD = re.compile(r"[a-z0-9_]+")
+# Ever finer places to split an oversize section: paragraphs, lines, sentences.
+_SPLITS = ((re.compile(r"\n\s*\n"), "\n\n"), (re.compile(r"\n"), "\n"), (re.compile(r"(?<=[.!?])\s+"), " "))
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i in is it its me more of on or so that the "
+    "their then there these this to was what when where which who why will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _terms(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+def split_sections(markdown: str, max_tokens: int) -> list[str]:
+    """Split at Markdown headings; sections over ``max_tokens`` are split again until every piece fits."""
+    starts = [m.start() for m in _HEADING.finditer(markdown)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = []
+    for start, end in zip(starts, starts[1:] + [len(markdown)]):
+        section = markdown[start:end].strip()
+        if section:
+            sections.extend(_split_text(section, max_tokens))
+    return sections
+
+
+def _split_text(text: str, max_tokens: int, level: int = 0) -> list[str]:
+    """Split ``text`` at paragraphs, then lines, then sentences, merging neighbours up to ``max_tokens``.
+
+    A sentence that alone is still too long is cut into fixed-size pieces.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    if level == len(_SPLITS):
+        size = max_tokens * CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, len(text), size)]
+    pattern, separator = _SPLITS[level]
+    chunks, chunk = [], ""
+    for unit in pattern.split(text):
+        if not unit.strip():
+            continue
+        for piece in _split_text(unit, max_tokens, level + 1):
+            if chunk and estimate_tokens(f"{chunk}{separator}{piece}") > max_tokens:
+                chunks.append(chunk)
+                chunk = ""
+            chunk = f"{chunk}{separator}{piece}" if chunk else piece
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def bm25_scores(documents: list[str], query: str, k1: float = 1.5, b: float = 0.75) -> list[float]:
+    """Okapi BM25 score of every document for ``query``."""
+    docs = [Counter(_terms(d)) for d in documents]
+    if not docs:
+        return []
+    lengths = [sum(d.values()) for d in docs]
+    avg_length = sum(lengths) / len(docs) or 1.0
+    scores = [0.0] * len(docs)
+    for term in set(_terms(query)):
+        containing = sum(1 for d in docs if term in d)
+        if not containing:
+            continue
+        idf = math.log(1 + (len(docs) - containing + 0.5) / (containing + 0.5))
+        for i, (doc, length) in enumerate(zip(docs, lengths)):
+            tf = doc.get(term, 0)
+            if tf:
+                scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+    return scores
+
+
+def pack_context(markdown: str, query: str, token_budget: int) -> tuple[str, dict]:
+    """Return the most relevant sections of ``markdown`` that fit ``token_budget`` tokens, plus stats.
+
+    Sections are taken by BM25 score; ties (including sections that share no
+    term with the question) go to earlier sections, so the lesson opening is
+    preferred as background. Text that already fits is returned unchanged.
+    """
+    total = estimate_tokens(markdown)
+    if total <= token_budget:
+        return markdown, {"sections": None, "selected": None, "tokens": total, "source_tokens": total}
+
+    sections = split_sections(markdown, max_tokens=max(token_budget // 2, 1))
+    scores = bm25_scores(sections, query)
+    order = sorted(range(len(sections)), key=lambda i: (-scores[i], i))
+    chosen, used = set(), 0
+    for i in order:
+        cost = estimate_tokens(sections[i]) + 1
+        if used + cost <= token_budget:
+            chosen.add(i)
+            used += cost
+
+    parts, previous = [], -1
+    for i in sorted(chosen):
+        if i != previous + 1:
+            parts.append("...")
+        parts.append(sections[i])
+        previous = i
+    if previous != len(sections) - 1:
+        parts.append("...")
+    packed = "\n\n".join(parts)
+    return packed, {
+        "sections": len(sections),
+        "selected": len(chosen),
+        "tokens": estimate_tokens(packed),
+        "source_tokens": total,
+    }
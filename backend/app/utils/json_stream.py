@@ -0,0 +1,273 @@
+"""Incremental parser for streamed lesson JSON – turns token fragments into typed events.
+
+The LLM streams one JSON object shaped like the SYSTEM_PROMPT schema. Rather
+than waiting for the closing brace, ``LessonStreamParser.feed`` scans each new
+fragment and returns events as soon as they are complete:
+
+  ("explanation_delta", "…text…")   decoded text of the "explanation" string so far
+  ("key_point", "…")                 each finished element of "key_points"
+  ("code_example", {...})            each finished element of "code_examples"
+  ("quiz_item", {...})               each finished element of "quiz"
+  ("math_formula", "…") / ("further_reading", "…")
+
+``close()`` returns the final ("done", lesson_dict) event.
+"""
+
+import json
+import re
+from typing import Any
+
+# Top-level array field → event name for each completed element.
+ARRAY_EVENTS = {
+    "key_points": "key_point",
+    "code_examples": "code_example",
+    "quiz": "quiz_item",
+    "math_formulas": "math_formula",
+    "further_reading": "further_reading",
+}
+
+Event = tuple[str, Any]
+
+
+class LessonStreamParser:
+    """Character-level scanner tracking just enough JSON structure to emit events."""
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0  # next character of buffer to scan
+        self._started = False  # seen the opening "{" of the root object
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0  # buffer index just after the opening quote
+        self._key: str | None = None  # current top-level key
+        self._expect_key = False  # next depth-1 string is a key
+        self._element_start: int | None = None  # start of current top-level array element
+        self._explanation_start: int | None = None
+        self._explanation_sent = 0  # raw characters of explanation already decoded
+        self._emitted: dict[str, list] = {}
+
+    def feed(self, text: str) -> list[Event]:
+        """Consume a fragment and return the events it completes."""
+        self.buffer += text
+        events: list[Event] = []
+        buf = self.buffer
+        i = self._pos
+        while i < len(buf):
+            ch = buf[i]
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._expect_key = True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(i, events)
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i + 1
+                if self._depth == 2 and self._element_start is None and self._key in ARRAY_EVENTS:
+                    self._element_start = i
+                if self._depth == 1 and not self._expect_key and self._key == "explanation":
+                    self._explanation_start = i + 1
+            elif ch in "{[":
+                if self._depth == 2 and self._element_start is None and self._key in ARRAY_EVENTS:
+                    self._element_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._element_start is not None:
+                    self._emit_element(i + 1, events)
+                elif self._depth == 0:
+                    self._pos = i + 1
+                    return events
+            elif ch == ",":
+                if self._depth == 1:
+                    self._expect_key = True
+                    self._key = None
+            elif ch == ":":
+                if self._depth == 1:
+                    self._expect_key = False
+            i += 1
+        self._pos = i
+
+        if self._in_string and self._explanation_start is not None and self._depth == 1:
+            self._emit_explanation(len(buf), events, final=False)
+        return events
+
+    def _close_string(self, end: int, events: list[Event]) -> None:
+        """Handle the closing quote of a string at buffer index ``end``."""
+        if self._depth == 1:
+            if self._expect_key:
+                self._key = json.loads(self.buffer[self._string_start - 1:end + 1], strict=False)
+            elif self._explanation_start is not None:
+                self._emit_explanation(end, events, final=True)
+                self._explanation_start = None
+        elif self._depth == 2 and self._element_start is not None and self.buffer[self._element_start] == '"':
+            self._emit_element(end + 1, events)
+
+    def _emit_explanation(self, end: int, events: list[Event], final: bool) -> None:
+        start = self._explanation_start + self._explanation_sent
+        raw = self.buffer[start:end]
+        text = _decode_partial(raw) if not final else _decode(raw)
+        if text is None:
+            return
+        decoded, used = text
+        if not decoded:
+            return
+        self._explanation_sent += used
+        self._emitted.setdefault("explanation", []).append(decoded)
+        events.append(("explanation_delta", decoded))
+
+    def _emit_element(self, end: int, events: list[Event]) -> None:
+        raw = self.buffer[self._element_start:end]
+        self._element_start = None
+        try:
+            value = json.loads(raw, strict=False)
+        except json.JSONDecodeError:
+            return
+        self._emitted.setdefault(self._key, []).append(value)
+        events.append((ARRAY_EVENTS[self._key], value))
+
+    def result(self) -> dict:
+        """Best-effort lesson dict: full parse if possible, else what was streamed."""
+        parsed = parse_json_object(self.buffer)
+        if parsed is not None:
+            return parsed
+        lesson: dict[str, Any] = {"explanation": "".join(self._emitted.get("explanation", []))}
+        for field in ARRAY_EVENTS:
+            lesson[field] = self._emitted.get(field, [])
+        return lesson
+
+    def close(self) -> list[Event]:
+        """Finish the stream and return the final ``done`` event."""
+        return [("done", self.result())]
+
+
+def parse_json_object(text: str) -> dict | None:
+    """Parse the outermost JSON object in ``text`` (ignoring code fences), or None."""
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        result = json.loads(text[start:end + 1], strict=False)
+    except json.JSONDecodeError:
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def repair_json(text: str) -> dict | None:
+    """Best-effort parse of a truncated JSON object, e.g. a response cut off at max_tokens.
+
+    An unterminated string is closed and open arrays / objects are closed in
+    order. If that is not valid JSON (the cut fell inside a key, number or
+    literal), the text is cut back to the last complete element instead.
+    """
+    parsed = parse_json_object(text)
+    if parsed is not None:
+        return parsed
+    start = text.find("{")
+    if start == -1:
+        return None
+    body = text[start:]
+
+    stack: list[str] = []
+    in_string = escape = False
+    cuts: list[tuple[int, str]] = []  # (index of a top-level-or-deeper comma, closers needed there)
+    for i, ch in enumerate(body):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return _loads_object(body[:i + 1])
+        elif ch == ",":
+            cuts.append((i, "".join(reversed(stack))))
+
+    tail = body
+    if in_string:
+        # Drop a dangling escape (a lone backslash or a partial \uXXXX) before closing the string.
+        if escape:
+            tail = tail[:-1]
+        else:
+            tail = re.sub(r"\\u[0-9a-fA-F]{0,3}$", "", tail)
+        tail += '"'
+    candidates = [tail.rstrip().rstrip(",") + "".join(reversed(stack))]
+    candidates += [body[:i] + closers for i, closers in reversed(cuts[-50:])]
+    for candidate in candidates:
+        result = _loads_object(candidate)
+        if result is not None:
+            return result
+    return None
+
+
+def _loads_object(text: str) -> dict | None:
+    try:
+        result = json.loads(text, strict=False)
+    except json.JSONDecodeError:
+        return None
+    return result if isinstance(result, dict) else None
+
+
+def lesson_events(lesson: dict, chunk_chars: int = 0) -> list[Event]:
+    """Replay a finished lesson as the same events the live parser would emit.
+
+    ``chunk_chars`` > 0 splits the explanation into deltas of that size.
+    """
+    explanation = lesson.get("explanation", "") or ""
+    size = chunk_chars if chunk_chars > 0 else max(len(explanation), 1)
+    events: list[Event] = [
+        ("explanation_delta", explanation[i:i + size]) for i in range(0, len(explanation), size)
+    ]
+    for field, event in ARRAY_EVENTS.items():
+        events.extend((event, item) for item in lesson.get(field, []) or [])
+    events.append(("done", lesson))
+    return events
+
+
+def _decode(raw: str) -> tuple[str, int] | None:
+    """Decode the body of a JSON string (without quotes); LLMs often emit raw newlines."""
+    try:
+        return json.loads(f'"{raw}"', strict=False), len(raw)
+    except json.JSONDecodeError:
+        return None
+
+
+def _decode_partial(raw: str) -> tuple[str, int] | None:
+    """Decode the longest prefix of an unfinished JSON string body.
+
+    A fragment may end mid-escape (``\\``, ``\\u00``) or between the two halves
+    of a surrogate pair; those trailing characters are held back for the next call.
+    """
+    for cut in range(min(len(raw), 12) + 1):
+        decoded = _decode(raw[:len(raw) - cut])
+        if decoded is None:
+            continue
+        text, used = decoded
+        if text and "\ud800" <= text[-1] <= "\udbff":
+            continue
+        return text, used
+    return None
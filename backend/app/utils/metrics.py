@@ -0,0 +1,105 @@
+"""In-process metrics – named counters, rolling rates and histograms exposed via GET /metrics."""
+
+import bisect
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import Iterable
+
+RATE_WINDOW_SECONDS = 60
+
+# Default histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_counters: dict[str, int] = defaultdict(int)
+_rate_buckets: dict[str, deque[list]] = defaultdict(deque)  # name -> [[second, amount], ...]
+_histograms: dict[str, dict] = {}  # name -> {"bounds", "counts", "count", "sum"}
+
+
+def incr(name: str, amount: int = 1) -> None:
+    """Increment a named counter."""
+    with _lock:
+        _counters[name] += amount
+
+
+def mark(name: str, amount: float = 1) -> None:
+    """Record ``amount`` for a rate meter (reported per second over the last minute)."""
+    now = int(time.monotonic())
+    with _lock:
+        buckets = _rate_buckets[name]
+        if buckets and buckets[-1][0] == now:
+            buckets[-1][1] += amount
+        else:
+            buckets.append([now, amount])
+        while buckets and buckets[0][0] <= now - RATE_WINDOW_SECONDS:
+            buckets.popleft()
+
+
+def rates() -> dict[str, float]:
+    """Per-second rate of every meter, averaged over the last RATE_WINDOW_SECONDS."""
+    cutoff = int(time.monotonic()) - RATE_WINDOW_SECONDS
+    with _lock:
+        return {
+            name: round(sum(a for sec, a in buckets if sec > cutoff) / RATE_WINDOW_SECONDS, 3)
+            for name, buckets in sorted(_rate_buckets.items())
+        }
+
+
+def observe(name: str, value: float, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+    """Record ``value`` in a histogram. ``buckets`` is fixed by the first observation."""
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = {"bounds": buckets, "counts": [0] * (len(buckets) + 1), "count": 0, "sum": 0.0}
+        hist["counts"][bisect.bisect_left(hist["bounds"], value)] += 1
+        hist["count"] += 1
+        hist["sum"] += value
+
+
+def histograms() -> dict[str, dict]:
+    """Cumulative bucket counts (``le`` upper bounds, Prometheus-style), count and sum per histogram."""
+    with _lock:
+        items = {name: (h["bounds"], list(h["counts"]), h["count"], h["sum"]) for name, h in _histograms.items()}
+    result = {}
+    for name, (bounds, counts, count, total) in sorted(items.items()):
+        cumulative, running = {}, 0
+        for bound, n in zip([*map(str, bounds), "+Inf"], counts):
+            running += n
+            cumulative[bound] = running
+        result[name] = {"count": count, "sum": round(total, 3), "buckets": cumulative}
+    return result
+
+
+def percentile(values: Iterable[float], pct: float) -> float | None:
+    """Nearest-rank ``pct`` percentile (0–1) of ``values``, or None if there are none."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+def ms(seconds: float | None) -> int | None:
+    """Seconds to whole milliseconds, passing None through."""
+    return round(seconds * 1000) if seconds is not None else None
+
+
+def get(name: str) -> int:
+    """Return the current value of a counter (0 if never incremented)."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot() -> dict:
+    """Return a point-in-time copy of all counters, grouped by prefix.
+
+    A counter named ``lesson_cache.memory_hits`` is reported as
+    ``{"lesson_cache": {"memory_hits": 3}}``.
+    """
+    with _lock:
+        items = dict(_counters)
+    grouped: dict[str, dict[str, int]] = defaultdict(dict)
+    for name, value in sorted(items.items()):
+        group, _, key = name.partition(".")
+        grouped[group][key or "value"] = value
+    return dict(grouped)
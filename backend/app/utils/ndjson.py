@@ -0,0 +1,25 @@
+"""Newline-delimited JSON (NDJSON) streaming helpers – one JSON object per line."""
+
+import json
+from collections.abc import AsyncGenerator
+from typing import Any
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+NDJSON_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # deliver each line as soon as it is written
+}
+
+
+def format_line(item: Any) -> str:
+    return json.dumps(item, ensure_ascii=False) + "\n"
+
+
+async def ndjson_lines(items: AsyncGenerator[Any, None]) -> AsyncGenerator[str, None]:
+    """Serialise ``items`` line by line; closing this generator also closes ``items``."""
+    try:
+        async for item in items:
+            yield format_line(item)
+    finally:
+        await items.aclose()
@@ -0,0 +1,62 @@
+"""Single-flight – coalesce concurrent identical async calls into one shared task."""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlightCall:
+    """A shared generation task plus the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared upstream call.
+
+    Every waiter receives the same result (or the same exception). The shared
+    task is cancelled only when the last waiter is cancelled, e.g. when every
+    client that asked for it has disconnected.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[str, _InFlightCall] = {}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _InFlightCall(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda t, k=key, c=call: self._forget(k, c))
+            metrics.incr(f"{self.name}.upstream_calls")
+        else:
+            metrics.incr(f"{self.name}.coalesced")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                logger.info("All waiters left – cancelling in-flight %s generation", self.name)
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _InFlightCall) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every waiter has already gone.
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,156 @@
+"""Server-Sent Events helpers – event formatting and token-coalescing framing."""
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Any
+
+from app.utils import metrics
+from app.utils.json_stream import Event
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def format_event(event: str, data: Any, event_id: str | None = None) -> str:
+    """Serialise one typed SSE event. Strings are wrapped as ``{"text": ...}``."""
+    payload = {"text": data} if isinstance(data, str) else data
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def make_event_id(stream_id: str, seq: int) -> str:
+    """SSE id for the event numbered ``seq`` (1-based) of the stream ``stream_id``."""
+    return f"{stream_id}:{seq}"
+
+
+def parse_event_id(value: str | None) -> tuple[str, int] | None:
+    """Inverse of make_event_id; None for a missing or malformed Last-Event-ID."""
+    if not value:
+        return None
+    stream_id, _, seq = value.strip().rpartition(":")
+    if not stream_id or not seq.isdigit():
+        return None
+    return stream_id, int(seq)
+
+
+async def skip_events(events: AsyncIterator[Event], count: int) -> AsyncGenerator[Event, None]:
+    """Drop the first ``count`` events – the part a resuming client already has."""
+    seen = 0
+    async for event in events:
+        seen += 1
+        if seen > count:
+            yield event
+
+
+HEARTBEAT = ": ping\n\n"
+
+
+async def frame_events(
+    events: AsyncIterator[Event],
+    window_ms: int,
+    max_bytes: int,
+    heartbeat_seconds: float,
+    stream_id: str | None = None,
+    start_seq: int = 0,
+) -> AsyncGenerator[str, None]:
+    """Batch typed events into few, larger SSE writes.
+
+    Consecutive ``explanation_delta`` events are merged into one event, and
+    formatted events are buffered until ``window_ms`` has passed since the
+    first buffered one or ``max_bytes`` are pending. Other events are never
+    merged, only batched. While nothing arrives for ``heartbeat_seconds`` a
+    comment line is sent so proxies do not time out during model warm-up.
+
+    With ``stream_id`` set, every frame carries ``id: <stream_id>:<seq>`` where
+    ``seq`` counts the events it covers, continuing from ``start_seq``.
+    """
+    window = window_ms / 1000
+    iterator = events.__aiter__()
+    pending_next: asyncio.Future | None = None
+    delta: list[str] = []  # explanation text not yet formatted
+    frames: list[str] = []  # formatted events not yet written
+    size = 0
+    deadline: float | None = None  # when the current batch must be flushed
+    last_write = time.monotonic()
+    seq = start_seq
+
+    def event_id() -> str | None:
+        return make_event_id(stream_id, seq) if stream_id is not None else None
+
+    def flush_delta() -> None:
+        nonlocal size
+        if delta:
+            frame = format_event("explanation_delta", "".join(delta), event_id())
+            delta.clear()
+            frames.append(frame)
+            size += len(frame)
+
+    def take_batch() -> str:
+        nonlocal size, deadline, last_write
+        flush_delta()
+        batch = "".join(frames)
+        metrics.incr("sse.frames", len(frames))
+        metrics.incr("sse.writes")
+        metrics.mark("sse.frames", len(frames))
+        metrics.mark("sse.bytes", len(batch.encode("utf-8")))
+        frames.clear()
+        size = 0
+        deadline = None
+        last_write = time.monotonic()
+        return batch
+
+    try:
+        while True:
+            if pending_next is None:
+                pending_next = asyncio.ensure_future(iterator.__anext__())
+            now = time.monotonic()
+            if deadline is not None:
+                timeout = max(deadline - now, 0)
+            elif heartbeat_seconds > 0:
+                timeout = max(last_write + heartbeat_seconds - now, 0)
+            else:
+                timeout = None
+            done, _ = await asyncio.wait({pending_next}, timeout=timeout)
+
+            if not done:
+                if deadline is not None:
+                    yield take_batch()
+                else:
+                    metrics.incr("sse.heartbeats")
+                    last_write = time.monotonic()
+                    yield HEARTBEAT
+                continue
+
+            try:
+                event, data = pending_next.result()
+            except StopAsyncIteration:
+                pending_next = None
+                break
+            pending_next = None
+
+            metrics.incr("sse.events")
+            if event == "explanation_delta":
+                seq += 1
+                delta.append(data)
+                size += len(data)
+            else:
+                flush_delta()
+                seq += 1
+                frame = format_event(event, data, event_id())
+                frames.append(frame)
+                size += len(frame)
+            if deadline is None:
+                deadline = time.monotonic() + window
+            if size >= max_bytes or event == "done":
+                yield take_batch()
+    finally:
+        if pending_next is not None:
+            pending_next.cancel()
+
+    if delta or frames:
+        yield take_batch()
@@ -0,0 +1,146 @@
+"""Benchmark the lesson, quiz and stream paths end to end from recorded LLM traffic.
+
+With ``--record``, the workload is first run against the configured provider
+(LLM_PROVIDER, e.g. a real model, or ``fake`` for a self-contained demo) and
+every response is saved as a cassette. The workload is then replayed at each
+``--scale`` without touching the provider: replay must reproduce the recorded
+answers exactly, and at scale 1 also their latency and time to first token.
+
+Without ``--record``, an existing recording in ``--dir`` is replayed. If there
+is none (e.g. a clean checkout), the workload is recorded from the fake LLM
+stub server (fake_llm_server.py) into a temporary directory first.
+
+Usage:
+    python bench_cassette_replay.py                             # replay --dir, or record from the stub server
+    python bench_cassette_replay.py --record                    # record, then replay at 1× and 0×
+    python bench_cassette_replay.py --scale 1 0.5 0             # replay an existing recording
+    python bench_cassette_replay.py --record --dir /tmp/casettes --scale 1
+"""
+import argparse
+import asyncio
+import contextlib
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import httpx
+
+from app.config import settings
+from app.services import llm_service
+from app.services.llm_clients import close_registry, init_registry
+
+TOPICS = [
+    ("Gradient descent", ["Update rule", "Learning rate", "Convergence"]),
+    ("Regularisation", ["L1 penalty", "L2 penalty"]),
+    ("Decision trees", ["Splitting criteria", "Pruning", "Feature importance", "Overfitting"]),
+]
+
+
+async def workload() -> tuple[list[str], dict[str, list[float]]]:
+    """Run every path once per topic; returns (answers, seconds per path, TTFT of streams)."""
+    answers, timings = [], {"lesson": [], "quiz": [], "stream": [], "stream_ttft": []}
+    for title, sub_topics in TOPICS:
+        lesson_kwargs = dict(main_topic="ML", unit_name="Unit 1", topic_title=title, sub_topics=sub_topics)
+
+        started = time.monotonic()
+        lesson = await llm_service.generate_lesson(**lesson_kwargs)
+        timings["lesson"].append(time.monotonic() - started)
+        answers.append(lesson["explanation"])
+
+        started = time.monotonic()
+        quiz = await llm_service.generate_quiz(title, sub_topics, num_questions=5)
+        timings["quiz"].append(time.monotonic() - started)
+        answers.append(str(quiz["questions"]))
+
+        started, first, text = time.monotonic(), None, ""
+        async for piece in llm_service.stream_lesson(**lesson_kwargs, user_level="advanced"):
+            first = first or time.monotonic() - started
+            text += piece
+        timings["stream"].append(time.monotonic() - started)
+        timings["stream_ttft"].append(first or 0.0)
+        answers.append(text)
+    return answers, timings
+
+
+def report(label: str, timings: dict[str, list[float]]) -> None:
+    cells = "  ".join(f"{name} {sum(v) / len(v) * 1000:6.0f} ms" for name, v in timings.items())
+    print(f"{label:<12} {cells}")
+
+
+async def run(mode: str, scale: float = 1.0) -> tuple[list[str], dict[str, list[float]]]:
+    settings.LLM_CASSETTE_MODE, settings.LLM_CASSETTE_TIME_SCALE = mode, scale
+    init_registry()
+    try:
+        return await workload()
+    finally:
+        await close_registry()
+
+
+@contextlib.contextmanager
+def fake_llm_server() -> Iterator[None]:
+    """Run fake_llm_server.py on a free port and point the ollama provider at it."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen([sys.executable, "fake_llm_server.py", "--port", str(port), "--ttft", "0.3", "--tps", "2000"])
+    settings.LLM_PROVIDER, settings.LLM_PROVIDERS = "ollama", ""
+    settings.OLLAMA_BASE_URL = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                httpx.get(f"{settings.OLLAMA_BASE_URL}/v1/models")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("fake_llm_server.py did not come up")
+        yield
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--record", action="store_true", help="record the workload first")
+    parser.add_argument("--dir", default=settings.LLM_CASSETTE_DIR_RESOLVED, help="cassette directory")
+    parser.add_argument("--scale", type=float, nargs="+", default=[1.0, 0.0], help="replay time scales")
+    args = parser.parse_args()
+    settings.LLM_CASSETTE_DIR = str(Path(args.dir).resolve())
+
+    ok = True
+    recorded = None
+    with contextlib.ExitStack() as stack:
+        if args.record:
+            recorded, timings = await run("record")
+            report(f"record ({settings.LLM_PROVIDER})", timings)
+        elif not any(Path(args.dir).glob("*.json.gz")):
+            print(f"No cassettes in {args.dir} – recording from fake_llm_server.py into a temporary directory")
+            settings.LLM_CASSETTE_DIR = stack.enter_context(tempfile.TemporaryDirectory())
+            with fake_llm_server():
+                recorded, timings = await run("record")
+            report("record (stub)", timings)
+        ok &= await replay(args.scale, recorded)
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+async def replay(scales: list[float], recorded: list[str] | None) -> bool:
+    """Replay the workload at each scale; checks the answers against ``recorded`` if given."""
+    ok = True
+    for scale in scales:
+        answers, timings = await run("replay", scale)
+        report(f"replay ×{scale:g}", timings)
+        if recorded is not None:
+            same = answers == recorded
+            ok &= same
+            print(f"{'OK  ' if same else 'FAIL'} replay ×{scale:g} reproduces the recorded answers")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,72 @@
+"""Benchmark: blind 8000-character slice vs BM25 context packing for more-context prompts.
+
+Builds a long synthetic lesson (one Markdown section per concept), then asks
+one question per concept and checks whether the section that answers it made
+it into the prompt context, and how many tokens the context costs. The same
+lesson run together as one paragraph (no headings or blank lines) must still
+give every question its answer, not an empty context.
+
+Usage:  python bench_context_packer.py [token_budget]
+"""
+import sys
+import time
+
+from app.config import settings
+from app.utils.context_packer import estimate_tokens, pack_context
+
+CONCEPTS = [
+    ("Learning rate", "step size", "How do I choose the step size?"),
+    ("Momentum", "velocity", "What does the velocity term do?"),
+    ("Batch size", "minibatch", "Why use a minibatch instead of the full dataset?"),
+    ("Loss surface", "saddle point", "What happens at a saddle point?"),
+    ("Vanishing gradients", "sigmoid saturation", "Why does sigmoid saturation slow training?"),
+    ("Weight initialisation", "xavier", "When should I use Xavier initialisation?"),
+    ("Regularisation", "weight decay", "How does weight decay prevent overfitting?"),
+    ("Early stopping", "validation loss", "When should training stop based on validation loss?"),
+    ("Learning-rate schedules", "cosine annealing", "What is cosine annealing?"),
+    ("Adam optimiser", "bias correction", "Why does Adam need bias correction?"),
+    ("Gradient clipping", "exploding gradients", "How does clipping handle exploding gradients?"),
+    ("Second-order methods", "hessian", "Why is the Hessian too expensive to compute?"),
+]
+FILLER = ("This paragraph walks through the idea step by step, relates it to the update rule "
+          "w = w - lr * grad and shows how it behaves on a simple quadratic bowl. ") * 4
+
+
+def lesson() -> str:
+    parts = ["# Optimisation for neural networks\nAn overview of how networks are trained."]
+    for title, keyword, _ in CONCEPTS:
+        parts.append(f"## {title}\n{FILLER}\n\nThe key idea here is the {keyword}: {FILLER}")
+    return "\n\n".join(parts)
+
+
+def one_paragraph(text: str) -> str:
+    return " ".join(line.lstrip("# ") for line in text.split("\n") if line.strip())
+
+
+def main() -> int:
+    budget = int(sys.argv[1]) if len(sys.argv) > 1 else settings.MORE_CONTEXT_TOKEN_BUDGET
+    text = lesson()
+    print(f"lesson: {len(CONCEPTS)} sections, {len(text)} chars, ~{estimate_tokens(text)} tokens; budget {budget} tokens")
+    sliced_hits = packed_hits = 0
+    packed_tokens, timings = [], []
+    for title, keyword, question in CONCEPTS:
+        sliced_hits += keyword in text[:8000]
+        started = time.perf_counter()
+        context, stats = pack_context(text, question, budget)
+        timings.append(time.perf_counter() - started)
+        packed_hits += keyword in context
+        packed_tokens.append(stats["tokens"])
+    n = len(CONCEPTS)
+    print(f"blind slice : {sliced_hits}/{n} questions see their section, {estimate_tokens(text[:8000])} tokens each")
+    print(f"BM25 packed : {packed_hits}/{n} questions see their section, "
+          f"{sum(packed_tokens) / n:.0f} tokens on average, {sorted(timings)[n // 2] * 1000:.2f} ms to pack")
+    flat = one_paragraph(text)
+    flat_hits = sum(keyword in pack_context(flat, question, budget)[0] for _, keyword, question in CONCEPTS)
+    print(f"1 paragraph : {flat_hits}/{n} questions see their answer")
+    ok = packed_hits == n and flat_hits == n and max(packed_tokens) <= budget * 1.05
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
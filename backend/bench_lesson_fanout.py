@@ -0,0 +1,76 @@
+"""Benchmark: whole-topic lesson generation vs per-section fan-out.
+
+Runs fully offline – the provider call is replaced by a fake whose latency grows
+with the number of sub-topics it is asked to teach (SECONDS_PER_SUB_TOPIC each,
+roughly how output length drives generation time). The first call for one
+section fails, to show that only that section is retried.
+
+Usage:  python bench_lesson_fanout.py [sub_topics]
+"""
+import asyncio
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+from app.services import llm_service
+from app.services.llm_usage import LLMUsage
+from app.utils import metrics
+
+SECONDS_PER_SUB_TOPIC = 0.2
+calls = {"n": 0, "failed_once": False}
+
+
+async def fake_invoke(lc_messages, temperature, priority, endpoint, plan):
+    prompt = lc_messages[-1].content
+    # Section prompts list their own sub-topics after "Teach me ONLY this part"; whole-topic prompts teach all.
+    taught = prompt.split("Teach me ONLY this part", 1)[-1]
+    sub_topics = [line[4:] for line in taught.splitlines() if line.startswith("  - ")]
+    calls["n"] += 1
+    await asyncio.sleep(SECONDS_PER_SUB_TOPIC * len(sub_topics))
+    if "Sub-topic 3" in sub_topics and not calls["failed_once"] and "ONLY" in prompt:
+        calls["failed_once"] = True
+        raise RuntimeError("simulated provider error")
+    lesson = {
+        "explanation": "\n\n".join(f"## {s}\nText about {s}." for s in sub_topics),
+        "key_points": [f"Point on {s}" for s in sub_topics],
+        "code_examples": [{"language": "python", "code": f"# {s}", "explanation": s} for s in sub_topics],
+        "quiz": [{"question": f"Q on {s}?", "options": ["A", "B"], "correct_index": 0, "explanation": ""}
+                 for s in sub_topics],
+    }
+    usage = LLMUsage(endpoint, "fake", "fake", prompt_tokens=len(prompt) // 4, completion_tokens=len(sub_topics) * 50,
+                     latency_seconds=SECONDS_PER_SUB_TOPIC * len(sub_topics), estimated_tokens=plan.estimated_tokens,
+                     max_tokens=plan.max_tokens)
+    return SimpleNamespace(content=json.dumps(lesson)), usage
+
+
+async def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+    sub_topics = [f"Sub-topic {i + 1}" for i in range(n)]
+    llm_service._invoke = fake_invoke
+    kwargs = dict(main_topic="Main", unit_name="Unit", topic_title="Topic", sub_topics=sub_topics)
+
+    started = time.perf_counter()
+    whole = await llm_service.generate_lesson(**kwargs)
+    whole_s = time.perf_counter() - started
+
+    calls["n"] = 0
+    started = time.perf_counter()
+    fanned = await llm_service.generate_lesson_fanout(**kwargs)
+    fanout_s = time.perf_counter() - started
+
+    sections = len(llm_service.split_sections(sub_topics, llm_service.settings.LESSON_FANOUT_MAX_PARTS))
+    print(f"{n} sub-topics, {sections} sections, {SECONDS_PER_SUB_TOPIC * 1000:.0f} ms per sub-topic")
+    print(f"whole topic : {whole_s * 1000:6.0f} ms  ({len(whole['quiz'])} quiz items)")
+    print(f"fan-out     : {fanout_s * 1000:6.0f} ms  ({len(fanned['quiz'])} quiz items, {calls['n']} calls incl. retry)")
+    print(f"retries     : {metrics.get('lesson_fanout.part_retries')}")
+    print(f"usage       : {fanned.get('usage')}")
+    same = all(len(whole[f]) == len(fanned[f]) for f in ("key_points", "code_examples", "quiz"))
+    headings = [line for line in fanned["explanation"].splitlines() if line.startswith("## ")]
+    ok = same and headings == [f"## {s}" for s in sub_topics] and fanout_s < whole_s
+    print("OK" if ok else "FAIL: merged lesson differs from the whole-topic lesson")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,87 @@
+"""Micro-benchmark: per-call LLM client overhead, per-call ChatOpenAI vs pooled registry.
+
+Runs fully offline – requests are answered by an in-memory httpx transport, so
+the numbers isolate client construction + request plumbing. Real deployments
+additionally save one TCP + TLS handshake per call (typically 50-300 ms to
+OpenRouter / Ollama Cloud), which this script cannot measure.
+
+Usage:  python bench_llm_client.py [iterations]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from app.services.llm_clients import LLMClientRegistry
+
+COMPLETION = {
+    "id": "bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "bench-model",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+def _transport() -> httpx.MockTransport:
+    return httpx.MockTransport(lambda request: httpx.Response(200, json=COMPLETION))
+
+
+async def per_call(n: int) -> list[float]:
+    """Old behaviour: a new ChatOpenAI (and HTTP client) for every call."""
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        llm = ChatOpenAI(
+            model="bench-model",
+            api_key="bench",
+            base_url="http://bench.local/v1",
+            max_tokens=8192,
+            http_async_client=httpx.AsyncClient(transport=_transport()),
+        )
+        await llm.ainvoke([HumanMessage(content="hi")])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def pooled(n: int) -> list[float]:
+    """New behaviour: one long-lived client from the registry."""
+    registry = LLMClientRegistry()
+    registry._http_clients["ollama"] = httpx.AsyncClient(transport=_transport())
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        llm = registry.get(provider="ollama", model="bench-model")
+        await llm.ainvoke([HumanMessage(content="hi")])
+        timings.append(time.perf_counter() - start)
+    await registry.aclose()
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{label:<24} mean {statistics.mean(ms):7.3f} ms   p50 {statistics.median(ms):7.3f} ms   p95 {p95:7.3f} ms")
+
+
+async def main(n: int) -> None:
+    # Warm up imports and lazy initialisation before measuring.
+    await per_call(5)
+    await pooled(5)
+
+    before = await per_call(n)
+    after = await pooled(n)
+    print(f"=== LLM client overhead ({n} calls, offline transport) ===")
+    _report("per-call ChatOpenAI", before)
+    _report("pooled registry", after)
+    saved = statistics.mean(before) - statistics.mean(after)
+    print(f"Saved per call: {saved * 1000:.3f} ms (excluding TCP/TLS handshake)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,243 @@
+"""Benchmark API latency under generation load with LLM_WORKER_MODE=inline vs process.
+
+Starts the fake LLM stub server (fake_llm_server.py) and, for each mode, an API
+server with the learn and syllabus routers (no database: topics and progress
+are stubbed), each in its own process so the load clients do not share its
+event loop. For each mode, ``--generators`` clients keep requesting distinct
+lessons while ``--probes`` clients poll GET /syllabus/topics/{id} and the
+authenticated GET /syllabus/part-progress; the probe latency percentiles show
+how much the generation work slows the rest of the API. The CPU time the API
+process spends per lesson shows how much of that work is left on its event
+loop: what process mode moves to the workers runs in parallel only when there
+are spare cores.
+
+With ``--repair`` every answer is cut off half-way (finish_reason "length")
+and continuations are disabled, so each lesson is rebuilt with repair_json –
+the CPU-heavy parse / repair work that process mode moves out of the API
+event loop.
+
+Usage:
+    python bench_llm_workers.py
+    python bench_llm_workers.py --seconds 30 --generators 32 --processes 4 --sub-topics 8
+    python bench_llm_workers.py --repair --sub-topics 24
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.config import settings
+from app.database import get_db
+from app.routers import learn, syllabus
+from app.schemas.syllabus import PartProgressItem, SubTopicOut, TopicDetail
+from app.services import content_service, lesson_service, llm_workers
+from app.services.llm_clients import close_registry, init_registry
+from app.utils.jwt_utils import create_access_token
+
+SUB_TOPICS = 6
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def fake_topic(session, topic_id):
+    return TopicDetail(
+        id=topic_id, number="1.1", title="Gradient descent", unit_name="Unit 1", main_topic_name="ML",
+        sub_topics=[SubTopicOut(id=i, content=f"Sub-topic {i}") for i in range(1, SUB_TOPICS + 1)],
+    )
+
+
+async def fake_part_progress(session, user_id):
+    return [PartProgressItem(part_id=i, completed=i, total=10) for i in range(1, 15)]
+
+
+async def no_cache(session, key):
+    return None
+
+
+async def no_save(**kwargs):
+    return None
+
+
+async def no_db():
+    yield None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # As in app.main: uvicorn re-raises SIGTERM after serve() returns, so shutdown belongs here.
+    init_registry()
+    llm_workers.start_pool()
+    yield
+    await llm_workers.stop_pool()
+    await close_registry()
+
+
+def build_app() -> FastAPI:
+    learn.syllabus_service.get_topic_detail = fake_topic
+    syllabus.syllabus_service.get_part_progress = fake_part_progress
+    lesson_service.get_cached_lesson = no_cache
+    content_service.save_content = no_save
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(learn.router)
+    app.include_router(syllabus.router)
+    app.dependency_overrides[get_db] = no_db
+
+    @app.get("/bench/cpu")
+    async def cpu_seconds():
+        return {"seconds": time.process_time()}  # this process only, not the worker processes
+
+    return app
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+async def serve(args: argparse.Namespace) -> None:
+    """The API server under test (run in its own process by ``run_mode``)."""
+    settings.LLM_PROVIDER, settings.LLM_PROVIDERS = "ollama", ""
+    settings.OLLAMA_BASE_URL = f"http://127.0.0.1:{args.llm_port}"
+    settings.LLM_MAX_CONCURRENCY = {"ollama": args.generators}
+    settings.LLM_WORKER_MODE, settings.LLM_WORKER_PROCESSES = args.serve, args.processes
+    if args.repair:
+        settings.LLM_MAX_CONTINUATIONS = 0
+    server = uvicorn.Server(uvicorn.Config(build_app(), host="127.0.0.1", port=args.port, log_level="warning"))
+    await server.serve()
+
+
+async def wait_until_up(url: str) -> None:
+    for _ in range(300):
+        try:
+            httpx.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict:
+    port = free_port()
+    server = subprocess.Popen([
+        sys.executable, __file__, "--serve", mode, "--port", str(port), "--llm-port", str(args.llm_port),
+        "--generators", str(args.generators), "--processes", str(args.processes), "--sub-topics", str(args.sub_topics),
+        *(["--repair"] if args.repair else []),
+    ])
+    token = create_access_token({"sub": "bench-user", "email": "bench@example.com"})
+    latencies: dict[str, list[float]] = {"topic": [], "part-progress": []}
+    lessons, failures = [], 0
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=args.generators + args.probes + 4)
+    try:
+        await wait_until_up(f"http://127.0.0.1:{port}/syllabus/topics/1")
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+            # Warm up: worker processes import the app and open their first connection.
+            await asyncio.gather(*(
+                client.post("/learn/1", json={"user_level": "beginner", "focus_areas": [f"warm-up {i}"]})
+                for i in range(args.processes * 2)
+            ))
+            cpu_before = (await client.get("/bench/cpu")).json()["seconds"]
+            deadline = time.monotonic() + args.seconds
+
+            async def generator() -> None:
+                nonlocal failures
+                while time.monotonic() < deadline:
+                    started = time.monotonic()
+                    body = {"user_level": "advanced", "focus_areas": [f"case {next(counter)}"]}  # no shared flights
+                    response = await client.post("/learn/1", json=body)
+                    if response.status_code == 200:
+                        lessons.append(time.monotonic() - started)
+                    else:
+                        failures += 1
+
+            async def probe() -> None:
+                headers = {"Authorization": f"Bearer {token}"}
+                while time.monotonic() < deadline:
+                    for name, path in (("topic", "/syllabus/topics/1"), ("part-progress", "/syllabus/part-progress")):
+                        started = time.monotonic()
+                        response = await client.get(path, headers=headers)
+                        response.raise_for_status()
+                        latencies[name].append(time.monotonic() - started)
+                    await asyncio.sleep(args.probe_interval)
+
+            await asyncio.gather(*(generator() for _ in range(args.generators)), *(probe() for _ in range(args.probes)))
+            cpu = (await client.get("/bench/cpu")).json()["seconds"] - cpu_before
+    finally:
+        server.terminate()
+        server.wait()
+    return {"latencies": latencies, "lessons": lessons, "failures": failures, "cpu": cpu}
+
+
+def report(mode: str, result: dict, seconds: float) -> None:
+    for name, values in result["latencies"].items():
+        ms = [v * 1000 for v in values]
+        print(
+            f"{mode:<8} {name:<14} n={len(ms):5d}  p50 {percentile(ms, 50):7.1f}  p95 {percentile(ms, 95):7.1f}  "
+            f"p99 {percentile(ms, 99):7.1f}  max {max(ms, default=0):7.1f} ms"
+        )
+    lessons = result["lessons"]
+    print(
+        f"{mode:<8} {'lessons':<14} n={len(lessons):5d}  {len(lessons) / seconds:5.1f}/s  "
+        f"p50 {percentile(lessons, 50) * 1000:7.0f} ms  failures {result['failures']}"
+    )
+    print(
+        f"{mode:<8} {'API CPU':<14} {result['cpu'] * 1000 / max(len(lessons), 1):7.1f} ms per lesson  "
+        f"{result['cpu'] / seconds:5.0%} of a core"
+    )
+
+
+async def main() -> int:
+    global SUB_TOPICS
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20.0, help="load duration per mode")
+    parser.add_argument("--generators", type=int, default=24, help="concurrent lesson clients")
+    parser.add_argument("--probes", type=int, default=4, help="concurrent syllabus / auth clients")
+    parser.add_argument("--probe-interval", type=float, default=0.02, help="seconds between probe rounds")
+    parser.add_argument("--processes", type=int, default=settings.LLM_WORKER_PROCESSES, help="LLM_WORKER_PROCESSES")
+    parser.add_argument("--sub-topics", type=int, default=SUB_TOPICS, help="lesson size")
+    parser.add_argument("--ttft", type=float, default=0.2, help="fake LLM seconds to first token")
+    parser.add_argument("--tps", type=float, default=20000.0, help="fake LLM tokens per second")
+    parser.add_argument("--repair", action="store_true", help="truncate every answer and repair it in the API")
+    parser.add_argument("--modes", nargs="+", default=["inline", "process"], choices=llm_workers.MODES)
+    parser.add_argument("--serve", choices=llm_workers.MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--llm-port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    SUB_TOPICS = args.sub_topics
+    if args.serve:
+        await serve(args)
+        return 0
+
+    args.llm_port = free_port()
+    stub = subprocess.Popen([
+        sys.executable, "fake_llm_server.py", "--port", str(args.llm_port), "--ttft", str(args.ttft), "--tps", str(args.tps),
+        "--truncation-rate", "1.0" if args.repair else "0.0",
+    ])
+    try:
+        await wait_until_up(f"http://127.0.0.1:{args.llm_port}/v1/models")
+        print(f"{args.generators} lesson clients ({args.sub_topics} sub-topics), {args.probes} probes, "
+              f"{args.seconds:g} s per mode, {args.processes} worker processes, {os.cpu_count()} CPUs"
+              + (", every answer repaired" if args.repair else ""))
+        for mode in args.modes:
+            report(mode, await run_mode(mode, args), args.seconds)
+    finally:
+        stub.terminate()
+        stub.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,106 @@
+"""Exercise LLM admission control against a fake provider – no network or database needed.
+
+1. Priority: with one slot busy, queued background, quiz and interactive calls
+   must be admitted interactive → quiz → background.
+2. Queue timeout: a call that cannot get a slot in time raises AdmissionRejected.
+3. 429 backoff: a mock OpenAI-compatible endpoint rate-limits the first call with
+   Retry-After; the call must wait that long and then succeed through ChatOpenAI.
+
+Usage:  python debug_admission.py
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+from langchain_core.messages import HumanMessage
+from langchain_openai import ChatOpenAI
+
+from app.services import admission
+from app.services.admission import AdmissionController, AdmissionRejected, Priority
+from app.utils import metrics
+
+
+async def check_priority() -> bool:
+    controller = AdmissionController("fake", max_concurrency=1)
+    order: list[str] = []
+    release = asyncio.Event()
+
+    async def call(name: str, priority: Priority, hold: asyncio.Event | None = None):
+        async with controller.slot(priority):
+            order.append(name)
+            if hold:
+                await hold.wait()
+
+    first = asyncio.create_task(call("first", Priority.INTERACTIVE, release))
+    await asyncio.sleep(0.01)
+    queued = [
+        asyncio.create_task(call("background", Priority.BACKGROUND)),
+        asyncio.create_task(call("quiz", Priority.QUIZ)),
+        asyncio.create_task(call("interactive", Priority.INTERACTIVE)),
+    ]
+    await asyncio.sleep(0.01)
+    print(f"queued while busy: {controller.queued}")
+    release.set()
+    await asyncio.gather(first, *queued)
+    ok = order == ["first", "interactive", "quiz", "background"]
+    print(f"{'OK  ' if ok else 'FAIL'} admission order: {order}")
+    return ok
+
+
+async def check_timeout() -> bool:
+    controller = AdmissionController("fake-timeout", max_concurrency=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with controller.slot(Priority.BACKGROUND):
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    try:
+        async with controller.slot(Priority.INTERACTIVE, timeout=0.2):
+            pass
+        ok = False
+        print("FAIL queue timeout: call was admitted")
+    except AdmissionRejected as exc:
+        waited = time.perf_counter() - started
+        ok = 0.15 < waited < 0.5 and controller.active == 1 and controller.queued == 0
+        print(f"{'OK  ' if ok else 'FAIL'} queue timeout after {waited * 1000:.0f} ms, Retry-After {exc.retry_after}s")
+    release.set()
+    await holder
+    return ok and controller.active == 0
+
+
+async def check_rate_limit_backoff() -> bool:
+    attempts: list[float] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(time.perf_counter())
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"retry-after": "1"}, json={"error": {"message": "slow down"}})
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": "fake",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "hi"}}],
+        })
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    llm = ChatOpenAI(model="fake", api_key="x", base_url="http://fake/v1", max_retries=0, http_async_client=client)
+    response = await admission.call("fake-429", Priority.INTERACTIVE, lambda: llm.ainvoke([HumanMessage(content="hi")]))
+    await client.aclose()
+    gap = attempts[1] - attempts[0] if len(attempts) == 2 else 0
+    ok = response.content == "hi" and 0.95 < gap < 1.5
+    print(f"{'OK  ' if ok else 'FAIL'} 429 retried after {gap * 1000:.0f} ms (Retry-After: 1)")
+    return ok
+
+
+async def main() -> int:
+    results = [await check_priority(), await check_timeout(), await check_rate_limit_backoff()]
+    print(f"Metrics: {metrics.snapshot().get('admission')}")
+    print(f"Wait histograms: {sorted(k for k in metrics.histograms() if k.startswith('admission.'))}")
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,204 @@
+"""Check POST /learn/batch and /quiz/batch end to end – no database or real LLM needed.
+
+Serves the learn and quiz routers on a local port with the fake LLM provider,
+an in-memory lesson store and a stub syllabus (unit 1 = topics 1–6), and checks:
+
+1. a unit batch streams one NDJSON line per topic as each finishes, then a summary,
+   with at most BATCH_MAX_CONCURRENCY generations at once,
+2. a batch lesson equals the one POST /learn/{id} returns,
+3. a second batch is answered from the cache without LLM calls; duplicate ids are
+   sent once and unknown ids get a 404 line,
+4. quiz batches work the same way,
+5. bad requests are rejected (422 / 404 / 400) and a client that disconnects
+   cancels the generations still running.
+
+Usage:  python debug_batch.py
+"""
+import asyncio
+import contextlib
+import json
+import socket
+import sys
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.config import settings
+
+settings.LLM_PROVIDER = "fake"
+settings.FAKE_LLM_TTFT_SECONDS = 0.3
+settings.FAKE_LLM_TOKENS_PER_SECOND = 4000.0
+settings.BATCH_MAX_CONCURRENCY = 3
+settings.BATCH_MAX_TOPICS = 10
+
+from app.database import get_db  # noqa: E402
+from app.routers import learn, quiz  # noqa: E402
+from app.schemas.syllabus import SubTopicOut, TopicDetail  # noqa: E402
+from app.services import batch_service, content_service, lesson_service, llm_service, quiz_service, syllabus_service  # noqa: E402
+
+UNIT_TOPICS = [1, 2, 3, 4, 5, 6]
+store: dict[str, dict] = {}
+calls = {"in_flight": 0, "max_in_flight": 0, "lessons": 0}
+
+
+def topic(topic_id: int) -> TopicDetail:
+    return TopicDetail(
+        id=topic_id, number=f"1.{topic_id}", title=f"Topic {topic_id}", unit_name="Unit 1", main_topic_name="ML",
+        sub_topics=[SubTopicOut(id=topic_id * 10 + i, content=f"Idea {topic_id}.{i}") for i in range(1, 3)],
+    )
+
+
+async def fake_topic(session, topic_id):
+    return topic(topic_id) if topic_id in UNIT_TOPICS else None
+
+
+async def fake_topics(session, topic_ids):
+    return {t: topic(t) for t in topic_ids if t in UNIT_TOPICS}
+
+
+async def fake_unit(session, unit_id):
+    return UNIT_TOPICS if unit_id == 1 else None
+
+
+async def stored_lesson(session, key):
+    return store.get(key)
+
+
+async def stored_topics(session, topic_ids, body):
+    return {t for t in topic_ids if lesson_service.request_cache_key(t, body) in store}
+
+
+async def save(**kwargs):
+    store[kwargs["cache_key"]] = kwargs["content_json"]
+
+
+async def counted_lesson(**kwargs):
+    calls["lessons"] += 1
+    calls["in_flight"] += 1
+    calls["max_in_flight"] = max(calls["max_in_flight"], calls["in_flight"])
+    try:
+        return await llm_service.generate_lesson(**kwargs)
+    finally:
+        calls["in_flight"] -= 1
+
+
+async def bank_free_quiz(session, topic, num_questions, difficulty, sub_topic_id=None, refresh=False, **kwargs):
+    result = await llm_service.generate_quiz(topic.title, [s.content for s in topic.sub_topics], num_questions, difficulty)
+    return {k: v for k, v in result.items() if k != "usage"}
+
+
+async def no_bank(session, topic_ids, difficulty, num_questions):
+    return set()
+
+
+@contextlib.asynccontextmanager
+async def no_session():
+    yield None
+
+
+async def no_db():
+    yield None
+
+
+def check(ok: bool, label: str) -> bool:
+    print(f"{'OK  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+async def read_batch(client: httpx.AsyncClient, path: str, body: dict) -> tuple[list[dict], list[float], str]:
+    """Lines of an NDJSON batch response and the seconds at which each arrived."""
+    started, lines, times = time.monotonic(), [], []
+    async with client.stream("POST", path, json=body) as response:
+        async for line in response.aiter_lines():
+            if line:
+                lines.append(json.loads(line))
+                times.append(time.monotonic() - started)
+    return lines, times, response.headers["content-type"]
+
+
+async def main() -> int:
+    learn.syllabus_service.get_topic_detail = fake_topic
+    syllabus_service.get_topic_details = fake_topics
+    syllabus_service.list_unit_topic_ids = fake_unit
+    lesson_service.get_cached_lesson = stored_lesson
+    lesson_service.cached_topic_ids = stored_topics
+    lesson_service.generate_lesson = counted_lesson
+    content_service.save_content = save
+    quiz_service.get_or_generate_quiz = bank_free_quiz
+    quiz_service.cached_topic_ids = no_bank
+    batch_service.async_session = no_session
+
+    app = FastAPI()
+    app.include_router(learn.router)
+    app.include_router(quiz.router)
+    app.dependency_overrides[get_db] = no_db
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    ok = True
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        lines, times, media_type = await read_batch(client, "/learn/batch", {"unit_id": 1, "user_level": "advanced"})
+        topics = [line for line in lines if line["type"] == "topic"]
+        ok &= check(
+            media_type == "application/x-ndjson" and lines[-1]["type"] == "summary"
+            and sorted(t["topic_id"] for t in topics) == UNIT_TOPICS and all(t["status"] == "generated" for t in topics),
+            f"unit batch: {len(topics)} topics generated, summary {lines[-1]}",
+        )
+        ok &= check(times[0] < times[-1] - 0.5, f"lines streamed as they finish: first {times[0]:.2f} s, last {times[-1]:.2f} s")
+        ok &= check(calls["max_in_flight"] == settings.BATCH_MAX_CONCURRENCY,
+                    f"at most {calls['max_in_flight']} generations at once")
+
+        sync = (await client.post("/learn/3", json={"user_level": "advanced"})).json()
+        batch = next(t["result"] for t in topics if t["topic_id"] == 3)
+        ok &= check(batch == sync, "batch lesson equals POST /learn/3")
+
+        before = calls["lessons"]
+        lines, times, _ = await read_batch(
+            client, "/learn/batch", {"topic_ids": [2, 4, 2, 99, 4], "user_level": "advanced"}
+        )
+        statuses = {line["topic_id"]: line["status"] for line in lines if line["type"] == "topic"}
+        ok &= check(
+            statuses == {2: "cached", 4: "cached", 99: "failed"} and calls["lessons"] == before
+            and lines[-1]["cached"] == 2 and lines[-1]["failed"] == 1,
+            f"second batch: {statuses}, {calls['lessons'] - before} LLM calls, {times[-1] * 1000:.0f} ms",
+        )
+
+        lines, _, _ = await read_batch(client, "/quiz/batch", {"topic_ids": [1, 5], "num_questions": 3})
+        topics = [line for line in lines if line["type"] == "topic"]
+        ok &= check(
+            len(topics) == 2 and all(len(t["result"]["questions"]) == 3 for t in topics),
+            "quiz batch: 2 topics × 3 questions",
+        )
+
+        codes = [
+            (await client.post("/learn/batch", json={})).status_code,
+            (await client.post("/learn/batch", json={"topic_ids": [1], "unit_id": 1})).status_code,
+            (await client.post("/quiz/batch", json={"unit_id": 7})).status_code,
+            (await client.post("/learn/batch", json={"topic_ids": list(range(1, 12))})).status_code,
+        ]
+        ok &= check(codes == [422, 422, 404, 400], f"bad requests: {codes}")
+
+        before = calls["lessons"]
+        async with client.stream("POST", "/learn/batch", json={"unit_id": 1, "user_level": "beginner"}) as response:
+            async for line in response.aiter_lines():
+                break  # disconnect after the first topic
+        await asyncio.sleep(1.0)
+        ok &= check(calls["in_flight"] == 0 and calls["lessons"] - before < len(UNIT_TOPICS),
+                    f"disconnect: {calls['lessons'] - before} of {len(UNIT_TOPICS)} started, {calls['in_flight']} still running")
+
+    server.should_exit = True
+    await serving
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
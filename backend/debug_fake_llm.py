@@ -0,0 +1,109 @@
+"""Exercise llm_service end to end against the fake LLM provider – no model, network or database needed.
+
+Checks that with LLM_PROVIDER=fake:
+
+1. lessons, streamed lessons, quizzes and follow-ups are schema-valid and honour the requested quantities,
+2. the same prompt gives the same answer,
+3. truncated responses are completed by continuations,
+4. injected 429s are retried by admission control,
+5. fake_llm_server.py answers the same requests over real HTTP.
+
+Usage:  python debug_fake_llm.py
+"""
+import asyncio
+import json
+import socket
+import sys
+import time
+
+import uvicorn
+
+from app.config import settings
+
+settings.LLM_PROVIDER = "fake"
+settings.FAKE_LLM_TTFT_SECONDS = 0.05
+settings.FAKE_LLM_TOKENS_PER_SECOND = 2000.0
+
+from app.services import llm_router, llm_service  # noqa: E402
+from app.services.llm_clients import close_registry, init_registry  # noqa: E402
+from app.services.output_sizing import plan_lesson  # noqa: E402
+from app.utils import metrics  # noqa: E402
+from fake_llm_server import app as stub_app  # noqa: E402
+
+SUB_TOPICS = ["Gradient descent", "Learning rate", "Momentum"]
+LESSON = dict(main_topic="ML", unit_name="Unit 1", topic_title="Optimisation", sub_topics=SUB_TOPICS)
+
+
+def check(ok: bool, label: str) -> bool:
+    print(f"{'OK  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+async def run_checks(label: str) -> bool:
+    ok = True
+    plan = plan_lesson(len(SUB_TOPICS))
+    started = time.monotonic()
+    lesson = await llm_service.generate_lesson(**LESSON)
+    ok &= check(
+        len(lesson["quiz"]) == plan.quiz_per_sub_topic * len(SUB_TOPICS)
+        and len(lesson["code_examples"]) == plan.code_per_sub_topic * len(SUB_TOPICS)
+        and all(f"## {s}" in lesson["explanation"] for s in SUB_TOPICS),
+        f"{label} lesson: {len(lesson['quiz'])} quiz items, {lesson['usage']['completion_tokens']} tokens "
+        f"in {(time.monotonic() - started) * 1000:.0f} ms",
+    )
+    again = await llm_service.generate_lesson(**LESSON)
+    ok &= check(again["explanation"] == lesson["explanation"], f"{label} deterministic answer")
+
+    streamed = "".join([t async for t in llm_service.stream_lesson(**{**LESSON, "user_level": "advanced"})])
+    ok &= check(len(json.loads(streamed)["quiz"]) == len(lesson["quiz"]), f"{label} streamed lesson parses")
+
+    quiz = await llm_service.generate_quiz("Optimisation", SUB_TOPICS, num_questions=7)
+    ok &= check(
+        len(quiz["questions"]) == 7 and all(q["sub_topic"] in SUB_TOPICS for q in quiz["questions"]),
+        f"{label} quiz: 7 questions",
+    )
+    more = await llm_service.generate_more_context("Optimisation", lesson["explanation"], "Why use momentum?")
+    ok &= check(bool(more["explanation"]) and len(more["code_examples"]) == 1, f"{label} follow-up answer")
+    return ok
+
+
+async def main() -> int:
+    init_registry()
+    ok = await run_checks("in-process")
+
+    settings.FAKE_LLM_TRUNCATION_RATE = 1.0
+    before = metrics.snapshot().get("llm", {}).get("continuations", 0)
+    lesson = await llm_service.generate_lesson(**{**LESSON, "user_level": "intermediate"})
+    continued = metrics.snapshot()["llm"]["continuations"] - before
+    ok &= check(continued >= 1 and len(lesson["quiz"]) > 0, f"truncated lesson completed by {continued} continuation(s)")
+    settings.FAKE_LLM_TRUNCATION_RATE = 0.0
+
+    settings.FAKE_LLM_ERROR_RATE, settings.FAKE_LLM_ERROR_STATUS = 0.5, 429
+    settings.LLM_MAX_RETRIES, settings.LLM_BACKOFF_MAX_SECONDS = 10, 30.0
+    quizzes = await asyncio.gather(*(llm_service.generate_quiz(f"Topic {i}", SUB_TOPICS, 3) for i in range(4)))
+    retries = metrics.snapshot().get("admission", {}).get("fake.retries", 0)
+    ok &= check(all(len(q["questions"]) == 3 for q in quizzes) and retries > 0, f"429s retried ({retries} retries)")
+    settings.FAKE_LLM_ERROR_RATE = 0.0
+    await close_registry()
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stub_app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    settings.LLM_PROVIDER, settings.OLLAMA_BASE_URL = "ollama", f"http://127.0.0.1:{port}"
+    llm_router._router = None  # route to the new provider
+    init_registry()
+    ok &= await run_checks("stub server")
+    await close_registry()
+    server.should_exit = True
+    await serving
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
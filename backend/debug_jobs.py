@@ -0,0 +1,159 @@
+"""Check the asynchronous job API (``?async=true``) end to end – no database or real LLM needed.
+
+Serves the learn, quiz and jobs routers on a local port with the fake LLM
+provider (about two seconds per lesson) and checks that:
+
+1. POST /learn/{id}?async=true returns 202 with a job id and Location at once,
+2. the API stays responsive while the job runs,
+3. GET /jobs/{id}/events streams ``status`` events and then ``done`` with the lesson,
+4. GET /jobs/{id} returns the same lesson as the synchronous endpoint,
+5. quizzes work the same way, and a failing generation ends as ``failed`` with its error,
+6. with SSE_HEARTBEAT_SECONDS=0 the events stream sends no heartbeats (and does not spin),
+7. finished jobs beyond JOB_MAX_ENTRIES are pruned oldest first.
+
+Usage:  python debug_jobs.py
+"""
+import asyncio
+import json
+import socket
+import sys
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.config import settings
+
+settings.LLM_PROVIDER = "fake"
+settings.FAKE_LLM_TTFT_SECONDS = 0.2
+settings.FAKE_LLM_TOKENS_PER_SECOND = 2000.0
+
+from app.database import get_db  # noqa: E402
+from app.routers import jobs, learn, quiz  # noqa: E402
+from app.schemas.syllabus import SubTopicOut, TopicDetail  # noqa: E402
+from app.services import content_service, job_service, lesson_service, llm_service, quiz_service  # noqa: E402
+from app.services.job_store import Job  # noqa: E402
+
+
+async def fake_topic(session, topic_id):
+    return TopicDetail(
+        id=topic_id, number="1.1", title="Gradient descent", unit_name="Unit 1", main_topic_name="ML",
+        sub_topics=[SubTopicOut(id=1, content="Update rule"), SubTopicOut(id=2, content="Learning rate")],
+    )
+
+
+async def no_cache(session, key):
+    return None
+
+
+async def no_save(**kwargs):
+    return None
+
+
+async def bank_free_quiz(session, topic, num_questions, difficulty, sub_topic_id=None, refresh=False, **kwargs):
+    result = await llm_service.generate_quiz(topic.title, [s.content for s in topic.sub_topics], num_questions, difficulty)
+    return {k: v for k, v in result.items() if k != "usage"}
+
+
+async def no_db():
+    yield None
+
+
+def check(ok: bool, label: str) -> bool:
+    print(f"{'OK  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+async def main() -> int:
+    learn.syllabus_service.get_topic_detail = fake_topic
+    quiz.syllabus_service.get_topic_detail = fake_topic
+    lesson_service.get_cached_lesson = no_cache
+    content_service.save_content = no_save
+    quiz_service.get_or_generate_quiz = bank_free_quiz
+
+    app = FastAPI()
+    for router in (learn.router, quiz.router, jobs.router):
+        app.include_router(router)
+    app.dependency_overrides[get_db] = no_db
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    # The first LLM call in a process spends ~0.3 s setting up the client; keep it out of the timings.
+    await llm_service.generate_quiz("Warm-up", ["Warm-up"], num_questions=1)
+
+    ok = True
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        started = time.monotonic()
+        response = await client.post("/learn/1?async=true", json={"user_level": "beginner"})
+        accepted_ms = (time.monotonic() - started) * 1000
+        job = response.json()
+        ok &= check(
+            response.status_code == 202 and job["status"] == "queued" and response.headers["location"].endswith(job["id"]),
+            f"lesson job accepted in {accepted_ms:.0f} ms ({job['status']})",
+        )
+
+        started = time.monotonic()
+        status = (await client.get(f"/jobs/{job['id']}")).json()["status"]
+        ok &= check(time.monotonic() - started < 0.2 and status in ("queued", "running"),
+                    f"API responsive while the job is {status} ({(time.monotonic() - started) * 1000:.0f} ms)")
+
+        events = []
+        async with client.stream("GET", f"/jobs/{job['id']}/events") as stream:
+            async for line in stream.aiter_lines():
+                if line.startswith("event: "):
+                    events.append(line[7:])
+                elif line.startswith("data: ") and events[-1] == "done":
+                    pushed = json.loads(line[6:])
+        ok &= check(events[-1] == "done" and "status" in events and bool(pushed["result"]["explanation"]),
+                    f"events: {' → '.join(events)} after {(time.monotonic() - started) * 1000:.0f} ms")
+
+        polled = (await client.get(f"/jobs/{job['id']}")).json()
+        sync = (await client.post("/learn/1", json={"user_level": "beginner"})).json()
+        ok &= check(polled["status"] == "succeeded" and polled["result"] == sync,
+                    "polled result equals the synchronous response")
+
+        response = await client.post("/quiz/1?async=true&num_questions=4")
+        quiz_job = response.json()
+        async with client.stream("GET", f"/jobs/{quiz_job['id']}/events") as stream:
+            async for _ in stream.aiter_lines():
+                pass
+        polled = (await client.get(f"/jobs/{quiz_job['id']}")).json()
+        ok &= check(response.status_code == 202 and len(polled["result"]["questions"]) == 4, "quiz job: 4 questions")
+
+        settings.FAKE_LLM_ERROR_RATE, settings.FAKE_LLM_ERROR_STATUS = 1.0, 400
+        failing = (await client.post("/learn/1?async=true", json={"user_level": "advanced"})).json()
+        async with client.stream("GET", f"/jobs/{failing['id']}/events") as stream:
+            last = [line async for line in stream.aiter_lines() if line.startswith("event: ")][-1]
+        polled = (await client.get(f"/jobs/{failing['id']}")).json()
+        ok &= check(last == "event: error" and polled["status"] == "failed" and polled["error"]["status_code"] == 500,
+                    f"failing job: {polled['status']} ({polled['error']})")
+        ok &= check((await client.get("/jobs/unknown")).status_code == 404, "unknown job: 404")
+
+        settings.FAKE_LLM_ERROR_RATE, settings.SSE_HEARTBEAT_SECONDS = 0.0, 0
+        quiet = (await client.post("/learn/1?async=true", json={"user_level": "expert"})).json()
+        async with client.stream("GET", f"/jobs/{quiet['id']}/events") as stream:
+            lines = [line async for line in stream.aiter_lines() if line.strip()]
+        heartbeats = sum(1 for line in lines if line.startswith(":"))
+        ok &= check(heartbeats == 0 and lines[-2] == "event: done", f"heartbeats disabled: {len(lines)} lines, {heartbeats} heartbeats")
+
+    store = job_service.get_store()
+    store.max_entries = 3
+    for i in range(5):
+        await store.put(Job(kind="lesson", topic_id=i, status="succeeded", finished_at=time.time()))
+    ok &= check(store.stats()["jobs"] == 3 and [j.topic_id for j in store._jobs.values()] == [2, 3, 4],
+                f"pruned to the newest finished jobs: {[j.topic_id for j in store._jobs.values()]}")
+
+    server.should_exit = True
+    await serving
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
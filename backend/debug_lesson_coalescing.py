@@ -0,0 +1,120 @@
+"""Check that concurrent identical lesson misses share one generation and one save – no database needed.
+
+1. N concurrent identical POST /learn requests (service level) make one LLM
+   call and write one ``generated_contents`` row,
+2. every caller gets its own copy of the lesson,
+3. the next request is answered from the cache,
+4. a student request for a lesson that pre-generation is already waiting for
+   is queued at its own priority, not behind the background queue,
+5. concurrent quiz-bank fills of one slice make one LLM call, one save and
+   bank the questions once,
+6. concurrent identical follow-up questions make one LLM call and one save,
+   and every caller gets its own copy of the answer.
+
+Usage:  python debug_lesson_coalescing.py [N]
+"""
+import asyncio
+import sys
+
+from app.config import settings
+
+settings.LLM_PROVIDER = "fake"
+settings.FAKE_LLM_TTFT_SECONDS = 0.3
+settings.FAKE_LLM_TOKENS_PER_SECOND = 20000.0
+
+from app.schemas.content import LearnRequest  # noqa: E402
+from app.schemas.syllabus import SubTopicOut, TopicDetail  # noqa: E402
+from app.services import content_service, lesson_service, more_context_service, quiz_service  # noqa: E402
+from app.services.admission import Priority, get_controller  # noqa: E402
+from app.utils import metrics  # noqa: E402
+
+TOPIC = TopicDetail(
+    id=1, number="1.1", title="Gradient descent", unit_name="Unit 1", main_topic_name="ML",
+    sub_topics=[SubTopicOut(id=1, content="Update rule"), SubTopicOut(id=2, content="Learning rate")],
+)
+saved: list[dict] = []
+banked: list[list] = []
+
+
+async def save(**kwargs):
+    saved.append(kwargs)
+
+
+async def no_db_hit(session, key):
+    return None
+
+
+async def no_stored_answers(session, key, limit):
+    return []
+
+
+async def bank(session, topic, difficulty, questions, *args):
+    banked.append(questions)
+    return len(questions)
+
+
+def check(ok: bool, label: str) -> bool:
+    print(f"{'OK  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+async def main(n: int) -> int:
+    content_service.save_content = save
+    content_service.get_content_by_key = no_db_hit
+    body = LearnRequest(user_level="advanced")
+
+    results = await asyncio.gather(*(lesson_service.get_or_generate_lesson(None, TOPIC, body) for _ in range(n)))
+    upstream = metrics.snapshot().get("lesson_singleflight", {}).get("upstream_calls", 0)
+    ok = check(upstream == 1 and len(saved) == 1, f"{n} concurrent requests: {upstream} generation, {len(saved)} rows saved")
+    ok &= check(
+        all(r == results[0] for r in results) and len({id(r) for r in results}) == n and "usage" not in results[0],
+        "every caller gets an equal, separate copy without usage",
+    )
+    results[0]["explanation"] = "changed by one caller"
+    again = await lesson_service.get_or_generate_lesson(None, TOPIC, body)
+    ok &= check(again["explanation"] != "changed by one caller" and len(saved) == 1,
+                "next request served from the cache, unaffected by a caller's changes")
+
+    # One provider slot: a pre-generation job has two lessons queued when a student asks for the second one.
+    get_controller(settings.LLM_PROVIDER).max_concurrency = 1
+    finished: list[str] = []
+
+    async def learn(label: str, level: str, priority: Priority) -> None:
+        await lesson_service.get_or_generate_lesson(None, TOPIC, LearnRequest(user_level=level), priority=priority)
+        finished.append(label)
+
+    blocker = asyncio.create_task(learn("blocker", "beginner", Priority.INTERACTIVE))
+    await asyncio.sleep(0.05)
+    background = [asyncio.create_task(learn(f"background {level}", level, Priority.BACKGROUND))
+                  for level in ("intermediate", "expert")]
+    await asyncio.sleep(0.05)
+    await learn("student expert", "expert", Priority.INTERACTIVE)
+    await asyncio.gather(blocker, *background)
+    ok &= check(finished.index("student expert") < finished.index("background intermediate"),
+                f"student request admitted ahead of the background queue: {finished}")
+
+    saved.clear()
+    quiz_service.add_questions = bank
+    added = await asyncio.gather(*(quiz_service.fill_bank(TOPIC, "beginner", needed=3) for _ in range(n)))
+    upstream = metrics.snapshot().get("quiz_bank_singleflight", {}).get("upstream_calls", 0)
+    ok &= check(upstream == 1 and len(saved) == 1 and len(banked) == 1 and len(set(added)) == 1
+                and "usage" not in saved[0]["content_json"] and saved[0]["usage"] is not None,
+                f"{n} concurrent quiz fills: {upstream} generation, {len(saved)} saved, {len(banked)} banked")
+
+    saved.clear()
+    content_service.list_content_by_key = no_stored_answers
+    answers = await asyncio.gather(*(
+        more_context_service.get_or_generate_more_context(None, TOPIC, "Why a learning rate?", "Lesson text.")
+        for _ in range(n)
+    ))
+    upstream = metrics.snapshot().get("more_context_answer_singleflight", {}).get("upstream_calls", 0)
+    ok &= check(upstream == 1 and len(saved) == 1 and all(a == answers[0] for a in answers)
+                and len({id(a["code_examples"]) for a in answers}) == n and "usage" not in answers[0],
+                f"{n} concurrent follow-ups: {upstream} generation, {len(saved)} saved, separate copies")
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)))
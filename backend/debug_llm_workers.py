@@ -0,0 +1,146 @@
+"""Check LLM_WORKER_MODE=process with the fake LLM provider – no database or real LLM needed.
+
+1. lessons, quizzes and follow-up answers from the workers equal the inline ones,
+2. calls are spread over the worker processes; identical concurrent calls are
+   coalesced into one before they are sent,
+3. LLM_MAX_CONCURRENCY is split between the API process and the workers,
+4. a provider error comes back as LLMWorkerError, admission rejections as AdmissionRejected,
+5. a worker that dies fails its in-flight call – even while the other worker
+   keeps answering – and is restarted,
+6. a cancelled call is cancelled in the worker too.
+
+Usage:  python debug_llm_workers.py
+"""
+import asyncio
+import itertools
+import os
+import signal
+import sys
+import time
+
+from app.config import settings
+
+settings.LLM_PROVIDER = "fake"
+settings.FAKE_LLM_TTFT_SECONDS = 0.1
+settings.FAKE_LLM_TOKENS_PER_SECOND = 5000.0
+
+from app.services import admission, llm_service, llm_workers  # noqa: E402
+from app.services.admission import AdmissionRejected  # noqa: E402
+from app.services.llm_workers import LLMWorkerError  # noqa: E402
+from app.utils import metrics  # noqa: E402
+
+LESSON = dict(main_topic="ML", unit_name="Unit 1", topic_title="Gradient descent", sub_topics=["Update rule", "Learning rate"])
+
+
+def check(ok: bool, label: str) -> bool:
+    print(f"{'OK  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+def content(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k != "usage"}
+
+
+async def generate_all() -> list[dict]:
+    return [
+        await llm_service.generate_lesson(**LESSON),
+        await llm_service.generate_quiz("Gradient descent", LESSON["sub_topics"], num_questions=3),
+        await llm_service.generate_more_context("Gradient descent", "Gradient descent updates weights.", "Why a learning rate?"),
+    ]
+
+
+async def main() -> int:
+    ok = True
+    inline = await generate_all()
+
+    settings.LLM_WORKER_MODE, settings.LLM_WORKER_PROCESSES = "process", 2
+    pool = llm_workers.start_pool()
+    try:
+        started = time.monotonic()
+        offloaded = await generate_all()
+        ok &= check([content(r) for r in offloaded] == [content(r) for r in inline],
+                    f"lesson, quiz and more-context equal the inline results ({time.monotonic() - started:.1f} s incl. start-up)")
+
+        await asyncio.gather(*(llm_service.generate_lesson(**LESSON, focus_areas=[f"case {i}"]) for i in range(8)))
+        calls = pool.stats()["calls"]
+        ok &= check(all(n > 0 for n in calls.values()), f"calls per worker: {calls}")
+
+        before = sum(pool.stats()["calls"].values())
+        quizzes = await asyncio.gather(*(llm_service.generate_quiz("Coalescing", ["Same"], num_questions=2) for _ in range(4)))
+        dispatched = sum(pool.stats()["calls"].values()) - before
+        coalesced = metrics.snapshot()["llm_workers_singleflight"]["coalesced"]
+        ok &= check(dispatched == 1 and coalesced == 3 and all(q == quizzes[0] for q in quizzes),
+                    f"4 identical quizzes: {dispatched} worker call, {coalesced} coalesced")
+
+        workers = await llm_workers.stats()
+        lessons = [w["llm_usage"]["by_endpoint"].get("lesson", {}).get("calls", 0) for w in workers["workers"]]
+        ok &= check(sum(lessons) >= 9, f"usage is reported per worker: {lessons} lesson calls")
+        limits = [admission.get_controller("fake").max_concurrency] + [
+            w["llm_admission"]["fake"]["max_concurrency"] for w in workers["workers"]
+        ]
+        ok &= check(limits == [4, 2, 2], f"LLM_DEFAULT_MAX_CONCURRENCY 8 split as API process + workers: {limits}")
+
+        victim = pool._workers[0]
+        task = asyncio.create_task(pool.call("asyncio:sleep", (30,), {}))
+        await asyncio.sleep(0.5)
+
+        async def traffic() -> None:  # keeps results arriving from the other worker
+            for i in itertools.count():
+                try:
+                    await pool.call("asyncio:sleep", (0.05 + i * 1e-6,), {})
+                except LLMWorkerError:
+                    pass
+
+        busy = asyncio.create_task(traffic())
+        await asyncio.sleep(0.3)
+        os.kill(victim.process.pid, signal.SIGKILL)
+        killed_at = time.monotonic()
+        try:
+            await asyncio.wait_for(task, 10)
+            ok &= check(False, "killed worker: call did not fail")
+        except LLMWorkerError as exc:
+            ok &= check(True, f"killed worker under traffic: in-flight call failed after "
+                              f"{time.monotonic() - killed_at:.1f} s ({exc})")
+        except asyncio.TimeoutError:
+            ok &= check(False, "killed worker under traffic: in-flight call still hanging after 10 s")
+        busy.cancel()
+        await asyncio.sleep(1.5)
+        ok &= check(pool.stats()["alive"] == 2 and pool.restarts == 1, f"worker restarted: {pool.stats()}")
+
+        task = asyncio.create_task(pool.call("asyncio:sleep", (30,), {}))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        await asyncio.sleep(0.5)
+        in_flight = [w["in_flight"] for w in (await llm_workers.stats())["workers"]]
+        ok &= check(sum(in_flight) == 0, f"cancelled call stopped in the worker: in flight {in_flight}")
+
+        settings.FAKE_LLM_ERROR_RATE, settings.FAKE_LLM_ERROR_STATUS = 1.0, 400
+        await llm_workers.stop_pool()
+        pool = llm_workers.start_pool()  # workers take the settings at start
+        try:
+            await llm_service.generate_quiz("Gradient descent", ["Update rule"], num_questions=2)
+            ok &= check(False, "provider error: no exception")
+        except LLMWorkerError as exc:
+            ok &= check("BadRequestError" in str(exc), f"provider error: {exc}"[:100])
+
+        settings.FAKE_LLM_ERROR_RATE, settings.FAKE_LLM_ERROR_STATUS = 0.0, 500
+        settings.LLM_QUEUE_TIMEOUT_QUIZ, settings.LLM_MAX_CONCURRENCY = 0.2, {"fake": 3}
+        settings.FAKE_LLM_TTFT_SECONDS = 2.0
+        await llm_workers.stop_pool()
+        pool = llm_workers.start_pool()  # one slot for the API process and each worker
+        results = await asyncio.gather(
+            *(llm_service.generate_quiz("Gradient descent", [f"Part {i}"], num_questions=2) for i in range(6)),
+            return_exceptions=True,
+        )
+        rejected = [r for r in results if isinstance(r, AdmissionRejected)]
+        ok &= check(len(rejected) >= 2 and all(r.retry_after >= 1 for r in rejected),
+                    f"admission: {len(rejected)} of 6 rejected with retry_after")
+    finally:
+        await llm_workers.stop_pool()
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,115 @@
+"""Check model tiers and latency-SLO downgrades with the fake LLM provider – no database or real LLM needed.
+
+1. each endpoint is served by its tier's model and the result records the tier,
+2. lesson fan-out and streamed lessons record the tier too,
+3. a lesson p95 over its SLO downgrades lessons to the fast tier, and after
+   LLM_TIER_DOWNGRADE_SECONDS the primary tier is tried again,
+4. lesson cache keys follow the lesson tier's model (unchanged without tiers),
+5. a lesson served by the downgrade tier is saved under its own model's key
+   and not cached, so it is never served as the primary model's lesson.
+
+Usage:  python debug_model_tiers.py
+"""
+import asyncio
+import sys
+
+from app.config import settings
+
+settings.LLM_PROVIDER = "fake"
+settings.FAKE_LLM_TTFT_SECONDS = 0.05
+settings.FAKE_LLM_TOKENS_PER_SECOND = 50000.0
+
+from app.schemas.content import LearnRequest  # noqa: E402
+from app.schemas.syllabus import SubTopicOut, TopicDetail  # noqa: E402
+from app.services import content_service, lesson_service, llm_service, llm_usage, model_tiers  # noqa: E402
+from app.services.cache_service import lesson_cache, lesson_cache_key  # noqa: E402
+
+LESSON = dict(main_topic="ML", unit_name="Unit 1", topic_title="Gradient descent", sub_topics=["Update rule", "Learning rate"])
+TOPIC = TopicDetail(
+    id=1, number="1.1", title="Gradient descent", unit_name="Unit 1", main_topic_name="ML",
+    sub_topics=[SubTopicOut(id=1, content="Update rule")],
+)
+counter = iter(range(10_000))
+saved: list[dict] = []
+
+
+async def save(**kwargs):
+    saved.append(kwargs)
+
+
+async def no_db_hit(session, key):
+    return None
+
+
+def check(ok: bool, label: str) -> bool:
+    print(f"{'OK  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+async def lesson() -> dict:
+    return await llm_service.generate_lesson(**LESSON, focus_areas=[f"case {next(counter)}"])  # no shared flights
+
+
+async def main() -> int:
+    ok = True
+    default_key = lesson_cache_key(1, None, "beginner", None, True, True)
+    ok &= check(default_key == lesson_cache_key(1, None, "beginner", None, True, True, model=settings.LLM_MODEL),
+                "no tiers configured: lesson cache key unchanged")
+
+    settings.LLM_MODEL_TIERS = {"fast": {"fake": "fake-small"}, "large": {"fake": "fake-large"}}
+    settings.LLM_ENDPOINT_TIERS = {"lesson": "large", "quiz": "fast", "more_context": "fast"}
+
+    results = [
+        await lesson(),
+        await llm_service.generate_quiz("Gradient descent", LESSON["sub_topics"], num_questions=3),
+        await llm_service.generate_more_context("Gradient descent", "Gradient descent updates weights.", "Why a learning rate?"),
+    ]
+    served = [(r["model_used"], r["model_tier"], r["usage"]["tier"]) for r in results]
+    ok &= check(served == [("fake-large", "large", "large"), ("fake-small", "fast", "fast"), ("fake-small", "fast", "fast")],
+                f"lesson / quiz / more-context served by {served}")
+
+    fanout = await llm_service.generate_lesson_fanout(**LESSON, focus_areas=["fan-out"])
+    streamed: dict = {}
+    async for _ in llm_service.stream_lesson(**LESSON, on_usage=lambda u: streamed.update(u.to_dict())):
+        pass
+    ok &= check(fanout["model_tier"] == fanout["usage"]["tier"] == "large" and streamed["model"] == "fake-large",
+                f"fan-out tier {fanout['model_tier']}, stream {streamed['tier']} ({streamed['model']})")
+    ok &= check(lesson_cache_key(1, None, "beginner", None, True, True) != default_key,
+                "lesson cache key follows the lesson tier's model")
+
+    settings.LLM_TIER_SLO_P95_SECONDS = {"lesson": 0.4}
+    settings.LLM_TIER_SLO_MIN_CALLS, settings.LLM_TIER_SLO_WINDOW = 3, 5
+    settings.LLM_TIER_DOWNGRADE_SECONDS = 1.5
+    settings.FAKE_LLM_TTFT_SECONDS = 0.6  # every lesson now misses the SLO
+    tiers = [(await lesson())["model_tier"] for _ in range(4)]
+    stats = model_tiers.stats()["lesson"]
+    ok &= check(tiers == ["large", "large", "large", "fast"] and stats["downgraded"] and stats["downgrades"] == 1,
+                f"slow lessons {tiers}: downgraded after {settings.LLM_TIER_SLO_MIN_CALLS} calls – {stats}")
+    quiz = await llm_service.generate_quiz("Gradient descent", ["Update rule"], num_questions=2)
+    ok &= check(quiz["model_tier"] == "fast" and "downgraded" not in model_tiers.stats()["quiz"],
+                "other endpoints are not affected")
+
+    content_service.save_content, content_service.get_content_by_key = save, no_db_hit
+    body = LearnRequest(user_level="expert")
+    primary_key = lesson_service.request_cache_key(TOPIC.id, body)
+    downgraded = await lesson_service.get_or_generate_lesson(None, TOPIC, body)
+    ok &= check(downgraded["model_used"] == "fake-small" and saved[-1]["cache_key"] != primary_key
+                and lesson_cache.get(primary_key) is None,
+                "downgraded lesson saved under the fast model's key, not cached for the primary model")
+
+    settings.FAKE_LLM_TTFT_SECONDS = 0.05
+    await asyncio.sleep(settings.LLM_TIER_DOWNGRADE_SECONDS)
+    recovered = [(await lesson())["model_tier"] for _ in range(4)]
+    stats = model_tiers.stats()["lesson"]
+    ok &= check(recovered == ["large"] * 4 and not stats["downgraded"] and stats["calls"] == 4,
+                f"after the downgrade period: {recovered}, {stats}")
+
+    by_tier = {tier: agg["calls"] for tier, agg in llm_usage.summary()["by_tier"].items()}
+    ok &= check(set(by_tier) == {"large", "fast"}, f"usage per tier: {by_tier}")
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -19,7 +19,7 @@ print("\n=== TESTING OLLAMA CONNECTION ===")
 try:
     from app.services.llm_service import _get_llm
     
-    llm = _get_llm()
+    llm = _get_llm(settings.LLM_PROVIDER, settings.LLM_MODEL)
     print("OK: LLM Client created successfully")
     print(f"   Model: {llm.model_name}")
     
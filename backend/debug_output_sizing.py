@@ -0,0 +1,98 @@
+"""Check per-request output sizing against a mock OpenAI-compatible endpoint – no network needed.
+
+Prints the plan (quantities, estimate, max_tokens) for typical lessons and
+quizzes, then generates a few of them through the in-memory mock, which
+answers with exactly the number of quiz questions the prompt asks for. The
+script checks that:
+
+1. every request carries the planned max_tokens, below LLM_MAX_TOKENS for small outputs,
+2. the prompt asks for the planned number of quiz questions per sub-topic,
+3. lessons with more sub-topics ask for fewer questions so they fit LLM_MAX_TOKENS,
+4. the estimate is recorded next to the actual completion tokens.
+
+Usage:  python debug_output_sizing.py
+"""
+import asyncio
+import json
+import re
+import sys
+
+import httpx
+
+from app.config import settings
+from app.services import llm_service, llm_usage
+from app.services.llm_clients import init_registry
+from app.services.output_sizing import plan_lesson, plan_quiz
+
+sent: list[dict] = []
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    # langchain-openai sends max_tokens as max_completion_tokens
+    body["max_tokens"] = body.get("max_completion_tokens", body.get("max_tokens"))
+    sent.append(body)
+    prompt = body["messages"][-1]["content"]
+    sub_topics = [line[4:] for line in prompt.splitlines() if line.startswith("  - ")]
+    asked = re.search(r"generate (\d+) questions per sub-topic", prompt)
+    count = re.search(r"Generate (\d+) multiple-choice questions", prompt)
+    question = {"question": "Q?", "options": ["A", "B", "C", "D"], "correct_index": 0, "explanation": "Because A."}
+    if count:
+        content = {"questions": [{**question, "sub_topic": sub_topics[0]} for _ in range(int(count.group(1)))]}
+    else:
+        per = int(asked.group(1)) if asked else 0
+        content = {
+            "explanation": "\n\n".join(f"## {s}\n" + "Some explanation. " * 120 for s in sub_topics),
+            "key_points": ["Point"], "code_examples": [], "quiz": [question] * (per * len(sub_topics)),
+        }
+    text = json.dumps(content)
+    return httpx.Response(200, json={
+        "id": "x", "object": "chat.completion", "created": 0, "model": "mock",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": len(text) // 4, "total_tokens": 10 + len(text) // 4},
+    })
+
+
+async def main() -> int:
+    print(f"LLM_MAX_TOKENS {settings.LLM_MAX_TOKENS}, headroom ×{settings.LLM_MAX_TOKENS_HEADROOM}")
+    for n in (1, 3, 6, 10):
+        plan = plan_lesson(n)
+        print(f"lesson, {n:2d} sub-topics: {plan.quiz_per_sub_topic:2d} quiz / {plan.code_per_sub_topic} code "
+              f"per sub-topic, ~{plan.estimated_tokens} tokens, max_tokens {plan.max_tokens}")
+    for n in (5, 10):
+        plan = plan_quiz(n)
+        print(f"quiz, {n:2d} questions: ~{plan.estimated_tokens} tokens, max_tokens {plan.max_tokens}")
+
+    registry = init_registry()
+    registry._http_clients[settings.LLM_PROVIDER] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    ok = True
+    for n in (2, 10):
+        sent.clear()
+        sub_topics = [f"Sub-topic {i}" for i in range(n)]
+        plan = plan_lesson(n)
+        lesson = await llm_service.generate_lesson("ML", "Unit 1", f"Topic {n}", sub_topics)
+        good = (sent[0]["max_tokens"] == plan.max_tokens and len(lesson["quiz"]) == plan.quiz_per_sub_topic * n
+                and lesson["usage"]["estimated_tokens"] == plan.estimated_tokens)
+        ok &= good
+        print(f"{'OK  ' if good else 'FAIL'} lesson with {n} sub-topics: max_tokens {sent[0]['max_tokens']}, "
+              f"{len(lesson['quiz'])} quiz items, {lesson['usage']['completion_tokens']} of "
+              f"~{lesson['usage']['estimated_tokens']} estimated tokens")
+    # Six sub-topics fit one response with fewer questions; larger topics rely on fan-out or continuations.
+    ok &= plan_lesson(6).quiz_per_sub_topic < settings.LESSON_QUIZ_PER_SUB_TOPIC
+    ok &= plan_lesson(6).estimated_tokens <= settings.LLM_MAX_TOKENS
+
+    sent.clear()
+    quiz = await llm_service.generate_quiz("Topic", ["Sub-topic 0"], num_questions=5)
+    good = sent[0]["max_tokens"] == plan_quiz(5).max_tokens < settings.LLM_MAX_TOKENS and len(quiz["questions"]) == 5
+    ok &= good
+    print(f"{'OK  ' if good else 'FAIL'} quiz with 5 questions: max_tokens {sent[0]['max_tokens']}")
+
+    for endpoint, stats in llm_usage.summary()["by_endpoint"].items():
+        print(f"{endpoint}: actual / estimated p50 {stats['estimate_ratio_p50']}, p95 {stats['estimate_ratio_p95']}")
+    await registry.aclose()
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,124 @@
+"""Drive the multi-provider LLM router with local fake providers – no network or database needed.
+
+1. Routing: after sampling, most calls go to the faster of two healthy providers.
+2. Circuit breaker: a provider that always errors is taken out of rotation, and
+   calls still succeed via failover; after the open period a burst of concurrent
+   calls sends exactly one trial to it.
+3. Hedging: when the preferred provider occasionally stalls, a hedged second
+   request bounds the worst-case latency.
+4. Streaming: a provider that fails before its first chunk is skipped.
+
+Usage:  python debug_router.py
+"""
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+
+from app.services.llm_router import ProviderRouter
+
+random.seed(7)
+
+
+def fake_provider(latency: float, error_rate: float = 0.0, stall_rate: float = 0.0, stall: float = 2.0):
+    """Simulated provider call: sleeps ``latency`` (± 20 %), sometimes stalls or fails."""
+
+    async def call(prompt: str) -> str:
+        delay = latency * random.uniform(0.8, 1.2)
+        if random.random() < stall_rate:
+            delay = stall
+        await asyncio.sleep(delay)
+        if random.random() < error_rate:
+            raise RuntimeError("fake provider error")
+        return f"answer to {prompt}"
+
+    return call
+
+
+async def run_calls(router: ProviderRouter, providers: dict, n: int, hedge: bool = False) -> tuple[Counter, list[float]]:
+    served: Counter = Counter()
+    latencies: list[float] = []
+    for i in range(n):
+        started = time.perf_counter()
+        provider, _ = await router.call(lambda p: providers[p](f"q{i}"), hedge=hedge)
+        latencies.append(time.perf_counter() - started)
+        served[provider] += 1
+    return served, latencies
+
+
+def p(values: list[float], pct: float) -> float:
+    return sorted(values)[min(int(len(values) * pct), len(values) - 1)] * 1000
+
+
+async def check_routing() -> bool:
+    providers = {"ollama": fake_provider(0.06), "openrouter": fake_provider(0.02)}
+    router = ProviderRouter(list(providers))
+    served, _ = await run_calls(router, providers, 40)
+    ok = served["openrouter"] >= 30
+    print(f"{'OK  ' if ok else 'FAIL'} routing: {dict(served)} – {router.stats()}")
+    return ok
+
+
+async def check_circuit_breaker() -> bool:
+    providers = {"ollama_cloud": fake_provider(0.005, error_rate=1.0), "ollama": fake_provider(0.02)}
+    router = ProviderRouter(list(providers), failure_threshold=3, open_seconds=0.3)
+    served, _ = await run_calls(router, providers, 20)
+    opened = router.stats()["ollama_cloud"]["circuit"]
+    await asyncio.sleep(0.35)
+    trial = router.ranked()[0]
+    ok = served["ollama"] == 20 and opened == "open" and trial == "ollama_cloud"
+    print(f"{'OK  ' if ok else 'FAIL'} circuit breaker: {dict(served)}, circuit {opened}, "
+          f"retried after open period: {trial == 'ollama_cloud'}")
+
+    # The provider has recovered but answers slowly: a burst must not pile onto it before the trial resolves.
+    providers["ollama_cloud"] = fake_provider(0.2)
+    burst = await asyncio.gather(*(router.call(lambda p, i=i: providers[p](f"b{i}")) for i in range(10)))
+    served = Counter(provider for provider, _ in burst)
+    closed = router.stats()["ollama_cloud"]["circuit"]
+    trial_ok = served["ollama_cloud"] == 1 and closed == "closed"
+    print(f"{'OK  ' if trial_ok else 'FAIL'} half-open: burst of 10 served {dict(served)}, then circuit {closed}")
+    return ok and trial_ok
+
+
+async def check_hedging() -> bool:
+    results = {}
+    for hedge in (False, True):
+        random.seed(11)
+        providers = {
+            "ollama": fake_provider(0.02, stall_rate=0.1, stall=0.5),
+            "openrouter": fake_provider(0.03),
+        }
+        router = ProviderRouter(list(providers), hedge_min_delay=0.05)
+        _, latencies = await run_calls(router, providers, 60, hedge=hedge)
+        results[hedge] = (p(latencies, 0.5), p(latencies, 0.99))
+    ok = results[True][1] < results[False][1] / 2
+    print(f"{'OK  ' if ok else 'FAIL'} hedging: p50/p99 without {results[False][0]:.0f}/{results[False][1]:.0f} ms, "
+          f"with {results[True][0]:.0f}/{results[True][1]:.0f} ms")
+    return ok
+
+
+async def check_stream_failover() -> bool:
+    async def broken(provider: str):
+        raise RuntimeError("connection refused")
+        yield  # pragma: no cover – makes this an async generator
+
+    async def healthy(provider: str):
+        for token in ("Hello", " ", "world"):
+            await asyncio.sleep(0.005)
+            yield token
+
+    router = ProviderRouter(["ollama", "openrouter"])
+    chunks = [c async for c in router.stream(lambda p: broken(p) if p == "ollama" else healthy(p))]
+    ok = "".join(chunks) == "Hello world" and router.stats()["ollama"]["error_rate"] == 1.0
+    print(f"{'OK  ' if ok else 'FAIL'} stream failover: {''.join(chunks)!r}")
+    return ok
+
+
+async def main() -> int:
+    results = [await check_routing(), await check_circuit_breaker(), await check_hedging(), await check_stream_failover()]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,75 @@
+"""Replay typical follow-up questions against the more-context semantic cache – no LLM or database needed.
+
+The first question of each group is "answered" and stored; its paraphrases
+should be served from the cache, and the unrelated questions must miss.
+Looser paraphrases are only reported, to help choose the threshold.
+Prints per-question similarity, the hit rate and the lookup latency.
+
+Usage:  python debug_semantic_cache.py [threshold]
+"""
+import sys
+import time
+
+from app.config import settings
+from app.services.semantic_cache import SemanticCache
+
+GROUPS = [
+    ["Can you explain this with an example?", "can you explain this with an example"],
+    ["What is the intuition behind gradient descent?", "what's the intuition behind gradient descent"],
+    ["Give me a real world example", "give me a real-world example!"],
+    ["What is the difference between L1 and L2 regularization?", "What's the difference between L1 and L2 regularization"],
+    ["Show me the math behind backpropagation"],
+    ["Why do we need a learning rate?"],
+    ["What are common mistakes beginners make?"],
+]
+# Similar wording, different question – serving a stored answer here would be wrong.
+UNRELATED = [
+    "What is the intuition behind batch normalization?",
+    "Show me the code behind backpropagation",
+    "What is the difference between L2 and dropout?",
+    "What is a tensor?",
+]
+# Genuine paraphrases with more rewording; whether they hit depends on the threshold (reported, not checked).
+BORDERLINE = [
+    "Explain this with an example, please?",
+    "Why is a learning rate needed?",
+    "difference between l1 and l2 regularisation",
+]
+
+
+def main() -> int:
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else settings.MORE_CONTEXT_CACHE_THRESHOLD
+    cache = SemanticCache("debug_cache", threshold=threshold, max_per_scope=200, max_scopes=10)
+    for group in GROUPS:
+        cache.add("topic-1", group[0], f"answer to: {group[0]}")
+
+    ok = True
+    timings = []
+    for group in GROUPS:
+        for question in group[1:]:
+            started = time.perf_counter()
+            answer, similarity = cache.lookup("topic-1", question)
+            timings.append(time.perf_counter() - started)
+            good = answer == f"answer to: {group[0]}"
+            ok &= good
+            print(f"{'HIT ' if answer else 'MISS'} {similarity:.2f}  {question!r}{'' if good else '   <- expected a hit'}")
+    for question in UNRELATED:
+        answer, similarity = cache.lookup("topic-1", question)
+        ok &= answer is None
+        print(f"{'HIT ' if answer else 'MISS'} {similarity:.2f}  {question!r}{'   <- wrong answer served' if answer else ''}")
+    for question in BORDERLINE:
+        answer, similarity = cache.lookup("topic-1", question)
+        print(f"{'HIT ' if answer else 'MISS'} {similarity:.2f}  {question!r}   (borderline)")
+    answer, _ = cache.lookup("topic-2", GROUPS[0][1])
+    ok &= answer is None  # answers never cross topics
+
+    stats = cache.stats()
+    timings.sort()
+    print(f"threshold {threshold}: hit rate {stats['hit_rate']} over {stats['lookups']} lookups, "
+          f"median lookup {timings[len(timings) // 2] * 1e6:.0f} µs")
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Check that closing an SSE lesson stream aborts the upstream LLM call promptly.
+
+Serves the learn router with a slow fake provider (one token every 50 ms, for
+about a minute) on a local port. The script reads a few events, drops the
+connection and measures how long the fake provider keeps generating. Then
+checks that a provider failing mid-stream ends the response with an ``error``
+event instead of a dropped body. No database or LLM is needed.
+
+Usage:  python debug_stream_cancel.py
+"""
+import asyncio
+import socket
+import sys
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+from app.database import get_db
+from app.routers import learn
+from app.schemas.syllabus import SubTopicOut, TopicDetail
+from app.services import lesson_service
+from app.utils import metrics
+
+MAX_ABORT_SECONDS = 1.0
+upstream = {"tokens": 0, "aborted_at": None}
+
+
+async def fake_topic(session, topic_id):
+    return TopicDetail(
+        id=topic_id, number="1.1", title="Slow topic", unit_name="Unit", main_topic_name="Main",
+        sub_topics=[SubTopicOut(id=1, content="Sub-topic")],
+    )
+
+
+async def slow_stream_lesson(**kwargs):
+    """Fake provider: ~1,200 tokens at 20 tokens/sec."""
+    try:
+        yield '{"explanation": "'
+        for i in range(1200):
+            await asyncio.sleep(0.05)
+            upstream["tokens"] += 1
+            yield f"word{i} "
+        yield '"}'
+    finally:
+        upstream["aborted_at"] = time.perf_counter()
+
+
+async def failing_stream_lesson(**kwargs):
+    """Fake provider that fails after a few tokens."""
+    yield '{"explanation": "'
+    for i in range(5):
+        await asyncio.sleep(0.01)
+        yield f"word{i} "
+    raise RuntimeError("provider connection reset")
+
+
+async def no_cache(session, key):
+    return None
+
+
+async def no_db():
+    yield None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def main() -> int:
+    learn.syllabus_service.get_topic_detail = fake_topic
+    lesson_service.stream_lesson = slow_stream_lesson
+    lesson_service.get_cached_lesson = no_cache
+
+    app = FastAPI()
+    app.include_router(learn.router)
+    app.dependency_overrides[get_db] = no_db
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(timeout=10) as client:
+        async with client.stream("GET", f"http://127.0.0.1:{port}/learn/1/stream") as response:
+            events = 0
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    events += 1
+                if events >= 5:
+                    break
+        disconnected_at = time.perf_counter()
+
+        while upstream["aborted_at"] is None and time.perf_counter() - disconnected_at < 5:
+            await asyncio.sleep(0.01)
+
+        lesson_service.stream_lesson = failing_stream_lesson
+        response = await client.get(f"http://127.0.0.1:{port}/learn/2/stream")
+        names = [line.removeprefix("event: ") for line in response.text.splitlines() if line.startswith("event:")]
+
+    server.should_exit = True
+    await serve_task
+
+    if upstream["aborted_at"] is None:
+        print("FAIL: upstream still generating 5 s after disconnect")
+        return 1
+    delay = upstream["aborted_at"] - disconnected_at
+    print(f"Upstream aborted {delay * 1000:.0f} ms after disconnect (limit {MAX_ABORT_SECONDS * 1000:.0f} ms)")
+    print(f"Tokens generated before abort: {upstream['tokens']} of 1200")
+    print(f"Metrics: {metrics.snapshot()}")
+    if delay > MAX_ABORT_SECONDS:
+        print("FAIL: upstream abort too slow")
+        return 1
+    print(f"Events of a stream whose provider failed: {names}")
+    if not names or names[-1] != "error":
+        print("FAIL: provider failure did not end the stream with an error event")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,77 @@
+"""Check that a shared-stream subscription that is never read holds nothing – no database or LLM needed.
+
+1. subscribing registers no cursor until the first read,
+2. when the only reader leaves, the upstream is cancelled even though another
+   viewer subscribed and never read (e.g. its response body was never sent),
+3. a new stream that nobody starts reading is cancelled after the first-read
+   timeout,
+4. a subscriber that reads to the end still gets every token.
+
+Usage:  python debug_stream_subscribe.py
+"""
+import asyncio
+import sys
+import time
+
+from app.services.stream_hub import StreamHub
+
+FIRST_READ_TIMEOUT = 0.3
+
+
+def check(ok: bool, label: str) -> bool:
+    print(f"{'OK  ' if ok else 'FAIL'} {label}")
+    return ok
+
+
+def slow_source(state: dict, tokens: int = 100):
+    async def generate():
+        try:
+            for i in range(tokens):
+                await asyncio.sleep(0.02)
+                yield f"t{i} "
+        except asyncio.CancelledError:
+            state["cancelled_at"] = time.monotonic()
+            raise
+
+    return generate()
+
+
+async def main() -> int:
+    hub = StreamHub(max_backlog_chars=1 << 16, first_read_timeout_seconds=FIRST_READ_TIMEOUT)
+    ok = True
+
+    state: dict = {}
+    stream = hub.join("shared", lambda: slow_source(state))
+    reader, idle = stream.subscribe(), stream.subscribe()
+    ok &= check(not stream._cursors, "subscribing registers no cursor before the first read")
+    for _ in range(3):
+        await anext(reader)
+    await reader.aclose()
+    left_at = time.monotonic()
+    await asyncio.sleep(0.05)
+    ok &= check("cancelled_at" in state and state["cancelled_at"] - left_at < 0.05 and not stream._cursors,
+                "upstream cancelled when the only reader left, despite an unread subscription")
+    await idle.aclose()
+
+    state = {}
+    stream = hub.join("unread", lambda: slow_source(state))
+    never_read = stream.subscribe()
+    started = time.monotonic()
+    await asyncio.sleep(FIRST_READ_TIMEOUT + 0.1)
+    waited = state.get("cancelled_at", 0) - started
+    ok &= check("cancelled_at" in state and FIRST_READ_TIMEOUT <= waited < FIRST_READ_TIMEOUT + 0.1 and len(hub) == 0,
+                f"stream nobody read cancelled after {waited * 1000:.0f} ms")
+    del never_read
+
+    state = {}
+    stream = hub.join("complete", lambda: slow_source(state, tokens=20))
+    received = [t async for t in stream.subscribe()]
+    ok &= check(len(received) == 20 and "cancelled_at" not in state and not stream._cursors,
+                f"reader to the end: {len(received)} tokens, cursor released")
+
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
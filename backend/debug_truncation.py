@@ -0,0 +1,138 @@
+"""Check that lessons cut off at max_tokens are completed by continuation requests.
+
+A mock OpenAI-compatible endpoint (in-memory httpx transport, no network)
+returns a lesson in three slices with finish_reason "length" on all but the
+last, and repeats a little of the previous slice at the start of each
+continuation, as real models sometimes do. The script checks that:
+
+1. generate_lesson() returns the full lesson after two continuations,
+2. stream_lesson() streams the same complete JSON,
+3. with continuations disabled, JSON repair still salvages the partial lesson,
+   marked ``truncated``, and lesson_service neither saves nor caches it,
+4. token usage is summed over the original request and its continuations.
+
+Usage:  python debug_truncation.py
+"""
+import asyncio
+import json
+import sys
+
+import httpx
+
+from app.config import settings
+from app.schemas.content import LearnRequest
+from app.schemas.syllabus import SubTopicOut, TopicDetail
+from app.services import content_service, lesson_service, llm_service
+from app.services.llm_clients import init_registry
+from app.services.prompt_templates import CONTINUATION_PROMPT
+from app.utils import metrics
+
+LESSON = {
+    "explanation": "## Gradient descent\n" + " ".join(f"Step {i}: move against the gradient." for i in range(60)),
+    "key_points": [f"Key point {i}" for i in range(8)],
+    "code_examples": [{"language": "python", "code": "w -= lr * grad", "explanation": "One update step"}],
+    "quiz": [{"question": f"Question {i}?", "options": ["A", "B", "C", "D"], "correct_index": 0,
+              "explanation": "Because."} for i in range(6)],
+}
+FULL = json.dumps(LESSON)
+CUTS = [len(FULL) // 3, 2 * len(FULL) // 3, len(FULL)]
+OVERLAP = 25
+requests = {"n": 0}
+
+
+def next_slice(body: dict) -> tuple[str, str]:
+    """Text and finish_reason for this request, based on how much the client already has."""
+    requests["n"] += 1
+    messages = body["messages"]
+    if messages[-1]["content"] != CONTINUATION_PROMPT:
+        start = 0
+    else:
+        start = max(len(messages[-2]["content"]) - OVERLAP, 0)  # repeat a little on purpose
+    end = next(c for c in CUTS if c > start + OVERLAP)
+    return FULL[start:end], "stop" if end == len(FULL) else "length"
+
+
+def usage(text: str) -> dict:
+    return {"prompt_tokens": 10, "completion_tokens": len(text) // 4, "total_tokens": 10 + len(text) // 4}
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    text, finish = next_slice(body)
+    if not body.get("stream"):
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": "mock",
+            "choices": [{"index": 0, "finish_reason": finish, "message": {"role": "assistant", "content": text}}],
+            "usage": usage(text),
+        })
+    events = []
+    for i in range(0, len(text), 40):
+        delta = {"choices": [{"index": 0, "delta": {"content": text[i:i + 40]}, "finish_reason": None}]}
+        events.append(delta)
+    events.append({"choices": [{"index": 0, "delta": {}, "finish_reason": finish}]})
+    if body.get("stream_options", {}).get("include_usage"):
+        events.append({"choices": [], "usage": usage(text)})
+    sse = "".join(f"data: {json.dumps({'id': 'x', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'mock', **e})}\n\n"
+                  for e in events) + "data: [DONE]\n\n"
+    return httpx.Response(200, text=sse, headers={"content-type": "text/event-stream"})
+
+
+async def main() -> int:
+    registry = init_registry()
+    registry._http_clients[settings.LLM_PROVIDER] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    kwargs = dict(main_topic="ML", unit_name="Unit 1", topic_title="Gradient descent", sub_topics=["Updates"])
+    ok = True
+
+    # Tokens the mock reports for the three slices of one lesson, overlaps included.
+    expected_tokens = sum(len(FULL[max(start - OVERLAP, 0):end]) // 4 for start, end in zip([0, *CUTS], CUTS))
+
+    requests["n"] = 0
+    lesson = await llm_service.generate_lesson(**kwargs)
+    complete = {k: lesson.get(k) for k in LESSON} == LESSON and "truncated" not in lesson
+    counted = lesson["usage"]["completion_tokens"] == expected_tokens and lesson["usage"]["prompt_tokens"] == 30
+    ok &= complete and counted
+    print(f"{'OK  ' if complete and counted else 'FAIL'} generate_lesson: {requests['n']} requests, "
+          f"{len(lesson['quiz'])}/{len(LESSON['quiz'])} quiz items, usage {lesson['usage']}")
+
+    requests["n"] = 0
+    stream_usage = []
+    streamed = "".join([t async for t in llm_service.stream_lesson(**kwargs, on_usage=stream_usage.append)])
+    complete = streamed == FULL
+    counted = bool(stream_usage) and stream_usage[0].completion_tokens == expected_tokens
+    ok &= complete and counted
+    print(f"{'OK  ' if complete and counted else 'FAIL'} stream_lesson: {requests['n']} requests, "
+          f"{len(streamed)}/{len(FULL)} chars, usage {stream_usage[0] if stream_usage else None}")
+
+    settings.LLM_MAX_CONTINUATIONS = 0
+    requests["n"] = 0
+    partial = await llm_service.generate_lesson(**{**kwargs, "user_level": "advanced"})
+    repaired = partial["explanation"] == FULL[:CUTS[0]].split('"explanation": "', 1)[1].replace("\\n", "\n")
+    repaired &= partial.get("truncated") is True
+    ok &= repaired
+    print(f"{'OK  ' if repaired else 'FAIL'} no continuations: repaired partial lesson marked truncated "
+          f"({len(partial['explanation'])} chars of explanation kept)")
+
+    saved = []
+
+    async def save(**kwargs):
+        saved.append(kwargs)
+
+    async def no_db_hit(session, key):
+        return None
+
+    content_service.save_content, content_service.get_content_by_key = save, no_db_hit
+    topic = TopicDetail(id=1, number="1.1", title="Gradient descent", unit_name="Unit 1", main_topic_name="ML",
+                        sub_topics=[SubTopicOut(id=1, content="Updates")])
+    body = LearnRequest(user_level="intermediate", fanout=False)
+    served = [await lesson_service.get_or_generate_lesson(None, topic, body) for _ in range(2)]
+    not_kept = all(s.get("truncated") for s in served) and not saved and requests["n"] == 3
+    ok &= not_kept
+    print(f"{'OK  ' if not_kept else 'FAIL'} truncated lesson served but not saved or cached: "
+          f"{len(saved)} rows, {requests['n'] - 1} generations for 2 requests")
+    print(f"Metrics: {metrics.snapshot().get('llm')}")
+    await registry.aclose()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
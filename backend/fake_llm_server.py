@@ -0,0 +1,62 @@
+"""Standalone OpenAI-compatible stub server backed by the fake LLM (app/services/fake_llm.py).
+
+Serves ``POST /v1/chat/completions`` (plain and streaming) and ``GET /v1/models``
+with the same deterministic answers, timing and failures as ``LLM_PROVIDER=fake``,
+but over real HTTP – useful to load-test a deployed backend without a model, or
+to measure connection pooling and timeouts. Point the backend at it with e.g.
+
+    LLM_PROVIDER=ollama OLLAMA_BASE_URL=http://localhost:11500
+
+Usage:
+    python fake_llm_server.py                                   # port 11500, FAKE_LLM_* settings
+    python fake_llm_server.py --port 11500 --ttft 0.5 --tps 40 --error-rate 0.05 --truncation-rate 0.1
+"""
+import argparse
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.config import settings
+from app.services import fake_llm
+
+app = FastAPI(title="Fake LLM")
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": settings.FAKE_LLM_MODEL, "object": "model", "owned_by": "fake"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = fake_llm.error()
+    if failure is not None:
+        status, headers, payload = failure
+        return JSONResponse(payload, status_code=status, headers=headers)
+    if body.get("stream"):
+        return StreamingResponse(fake_llm.stream(body), media_type="text/event-stream")
+    return await fake_llm.completion(body)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft", type=float, help=f"seconds to first token (default: {settings.FAKE_LLM_TTFT_SECONDS})")
+    parser.add_argument("--tps", type=float, help=f"tokens per second (default: {settings.FAKE_LLM_TOKENS_PER_SECOND})")
+    parser.add_argument("--error-rate", type=float, help=f"(default: {settings.FAKE_LLM_ERROR_RATE})")
+    parser.add_argument("--error-status", type=int, help=f"(default: {settings.FAKE_LLM_ERROR_STATUS})")
+    parser.add_argument("--truncation-rate", type=float, help=f"(default: {settings.FAKE_LLM_TRUNCATION_RATE})")
+    args = parser.parse_args()
+    for option, name in (("ttft", "FAKE_LLM_TTFT_SECONDS"), ("tps", "FAKE_LLM_TOKENS_PER_SECOND"),
+                         ("error_rate", "FAKE_LLM_ERROR_RATE"), ("error_status", "FAKE_LLM_ERROR_STATUS"),
+                         ("truncation_rate", "FAKE_LLM_TRUNCATION_RATE")):
+        if getattr(args, option) is not None:
+            setattr(settings, name, getattr(args, option))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
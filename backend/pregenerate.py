@@ -0,0 +1,73 @@
+"""Pre-generate lessons and quizzes for every syllabus topic so student requests hit the cache.
+
+Already-cached items (same model and prompt version) are skipped, and finished
+items are checkpointed, so the command can be stopped and re-run at any time.
+Options default to the PREGEN_* settings.
+
+Usage:
+    python pregenerate.py                                  # all topics, all levels, lessons + quizzes
+    python pregenerate.py --kinds lesson --levels beginner --concurrency 2 --rpm 20
+    python pregenerate.py --topics 1 2 3 --limit 10
+    python pregenerate.py --fresh                          # ignore the checkpoint file
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from app.config import settings
+from app.database import create_tables, dispose_engine
+from app.models import *  # noqa: F401,F403 – register all models with Base.metadata
+from app.services import pregen_service
+from app.services.llm_clients import close_registry, init_registry
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", nargs="+", help=f"lesson levels (default: {settings.PREGEN_LEVELS})")
+    parser.add_argument("--kinds", nargs="+", choices=pregen_service.KINDS, help="what to generate (default: both)")
+    parser.add_argument("--quiz-difficulties", nargs="+", help=f"(default: {settings.PREGEN_QUIZ_DIFFICULTIES})")
+    parser.add_argument("--concurrency", type=int, help=f"parallel generations (default: {settings.PREGEN_CONCURRENCY})")
+    parser.add_argument("--rpm", type=float, help=f"max LLM requests per minute, 0 = unlimited "
+                                                  f"(default: {settings.PREGEN_REQUESTS_PER_MINUTE:g})")
+    parser.add_argument("--topics", nargs="+", type=int, help="only these topic ids")
+    parser.add_argument("--limit", type=int, help="stop after planning this many items")
+    parser.add_argument("--checkpoint", help=f"checkpoint file (default: {settings.PREGEN_CHECKPOINT_PATH_RESOLVED})")
+    parser.add_argument("--fresh", action="store_true", help="delete the checkpoint file before starting")
+    return parser.parse_args()
+
+
+async def main() -> int:
+    args = parse_args()
+    job = pregen_service.new_job(
+        levels=args.levels,
+        kinds=args.kinds,
+        quiz_difficulties=args.quiz_difficulties,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        checkpoint_path=args.checkpoint,
+        topic_ids=args.topics,
+        limit=args.limit,
+    )
+    if args.fresh and job.checkpoint_path is not None:
+        job.checkpoint_path.unlink(missing_ok=True)
+
+    await create_tables()
+    init_registry()
+    try:
+        progress = await job.run()
+    finally:
+        await close_registry()
+        await dispose_engine()
+
+    print(
+        f"{progress['state']}: {progress['generated']} generated, {progress['skipped']} already cached, "
+        f"{progress['failed']} failed of {progress['total']}"
+    )
+    if job.checkpoint_path is not None:
+        print(f"Checkpoint: {Path(job.checkpoint_path).resolve()}")
+    return 0 if progress["state"] == "finished" and not progress["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))